@@ -0,0 +1,71 @@
+import threading
+import time
+
+import requests
+from colorama import Fore
+
+import console
+from tools import LoginForm, fetch_login_form, submit_login_form
+
+DEFAULT_REAUTH_REFRESH = 120.0
+
+
+class Reauthenticator(threading.Thread):
+    """在后台保持一份最新的登录表单，使 Cookie 过期时只需一次 POST 即可重新登录
+
+    登录页面中的 execution 等字段有有效期，并且每份表单只能提交一次。
+    后台线程每隔 refresh_interval 秒重新获取并解析登录页面、预先加密密码；
+    表单被使用后立即在后台获取下一份。
+    """
+
+    def __init__(self, username: str, password: str, refresh_interval: float):
+        super().__init__(daemon=True)
+        self.username = username
+        self.password = password
+        self.refresh_interval = refresh_interval
+        self._form: LoginForm | None = None
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+
+    def run(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                form = fetch_login_form(self.username, self.password)
+                with self._lock:
+                    self._form = form
+            except (requests.RequestException, ValueError) as e:
+                console.notice(f"预取登录表单失败：{e}", Fore.YELLOW)
+            self._wakeup.wait(self.refresh_interval)
+            self._wakeup.clear()
+
+    def take_form(self) -> LoginForm | None:
+        """取出当前预取的登录表单，并通知后台线程获取下一份
+
+        Returns:
+            LoginForm | None: 未过期的登录表单，没有可用表单时返回 None
+        """
+        with self._lock:
+            form, self._form = self._form, None
+        self._wakeup.set()
+        if form is None or time.monotonic() - form.fetched_at > self.refresh_interval:
+            return None
+        return form
+
+    def login(self) -> str:
+        """使用预取的登录表单重新登录
+
+        没有可用的预取表单时退化为完整的登录流程。
+
+        Returns:
+            str: 教务系统 Cookie 字符串
+        """
+        form = self.take_form()
+        if form is None:
+            form = fetch_login_form(self.username, self.password)
+        return submit_login_form(form)
+
+    def stop(self) -> None:
+        """停止后台预取"""
+        self._stopped.set()
+        self._wakeup.set()
@@ -0,0 +1,439 @@
+import json
+import math
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+from contextlib import redirect_stdout
+from datetime import datetime
+
+import colorama
+import typer
+from colorama import Fore
+from typing_extensions import Annotated
+
+from mock_server import (
+    ACADEMIC_YEAR,
+    CATEGORIES,
+    TERM,
+    LatencyModel,
+    MockConfig,
+    MockServer,
+    RequestRecord,
+    build_catalog,
+)
+
+colorama.init()  # 初始化 colorama
+app = typer.Typer()
+HUNTER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "hunter.py")
+MOCK_SERVER_SCRIPT = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "mock_server.py"
+)
+
+
+def write_profile(
+    directory: str,
+    start_at: float,
+    courses: list[dict[str, str]],
+    extra_config: dict[str, str],
+) -> None:
+    """在临时目录中写入 hunter.py 使用的 .env 与 courses.json
+
+    Args:
+        directory (str): 临时目录
+        start_at (float): 开始时间（time.time）
+        courses (list[dict[str, str]]): 要抢的课程
+        extra_config (dict[str, str]): 额外的 .env 配置项
+    """
+    config = {
+        "USERNAME": "mock",
+        "PASSWORD": "mock",
+        # 一开始使用失效的 Cookie，覆盖开始前重新登录的流程
+        "COOKIES": "route=stale; JSESSIONID=stale",
+        "START_TIME": datetime.fromtimestamp(start_at).strftime("%H:%M:%S"),
+        **extra_config,
+    }
+    with open(os.path.join(directory, ".env"), "w") as f:
+        for key, value in config.items():
+            f.write(f'{key}="{value}"\n')
+    with open(os.path.join(directory, "courses.json"), "w") as f:
+        json.dump(courses, f, ensure_ascii=False)
+
+
+def summarize(
+    records: list[RequestRecord], open_at: float, course_ids: list[str]
+) -> dict:
+    """根据服务器记录计算一次抢课的指标
+
+    Args:
+        records (list[RequestRecord]): 服务器收到的请求
+        open_at (float): 选课开放时间
+        course_ids (list[str]): 要抢的课程 id
+
+    Returns:
+        dict: 包含 first_request、success（课程 id 到成功时刻的映射）、
+            requests 与 rps 的字典，时间均为相对开放时间的秒数
+    """
+    adds = [r for r in records if r.path == "/Xsxk/addGouwuche"]
+    success = {course_id: math.nan for course_id in course_ids}
+    for record in adds:
+        if record.message == "操作成功" and record.course_id in success:
+            success[record.course_id] = record.arrived_at - open_at
+    if not adds:
+        return {
+            "first_request": math.nan,
+            "success": success,
+            "requests": 0,
+            "rps": 0.0,
+        }
+
+    duration = adds[-1].arrived_at - adds[0].arrived_at
+    return {
+        "first_request": adds[0].arrived_at - open_at,
+        "success": success,
+        "requests": len(adds),
+        "rps": len(adds) / duration if duration > 0 else math.nan,
+    }
+
+
+def format_ms(seconds: float) -> str:
+    """将相对开放时间的秒数格式化为毫秒"""
+    return "—" if math.isnan(seconds) else f"{seconds * 1000:+.1f} ms"
+
+
+def run_once(
+    config: MockConfig,
+    course_count: int,
+    start_delay: float,
+    extra: dict[str, str],
+    hunter_args: list[str],
+    open_offset: float = 0.0,
+) -> dict:
+    """启动模拟服务器并运行一次完整的 hunter.py
+
+    Args:
+        config (MockConfig): 模拟服务器配置，open_at 会被覆盖为开始时间加上 open_offset
+        course_count (int): 要抢的课程数
+        start_delay (float): 距离开始时间的秒数，需要覆盖程序启动、对时与准备阶段
+        extra (dict[str, str]): 额外的 .env 配置项
+        hunter_args (list[str]): 传给 hunter.py 的命令行参数
+        open_offset (float): 实际开放时间比 START_TIME 晚多少秒，负数表示提前
+
+    Returns:
+        dict: summarize 的结果，时间相对实际开放时间
+    """
+    start_at = float(math.ceil(time.time() + start_delay))
+    config.open_at = start_at + open_offset
+    server = MockServer(config)
+    server.start()
+    code = CATEGORIES[0][0]
+    courses = [
+        {
+            "id": course["id"],
+            "name": course["kcmc"],
+            "information": "",
+            "code": code,
+            "academic_year": ACADEMIC_YEAR,
+            "term": TERM,
+        }
+        for course in server.state.catalog[code][:course_count]
+    ]
+    try:
+        run_hunter(server.base_url, start_at, courses, extra, hunter_args)
+    finally:
+        server.shutdown()
+        server.server_close()
+    return summarize(server.state.records, config.open_at, [c["id"] for c in courses])
+
+
+def run_hunter(
+    base_url: str,
+    start_at: float,
+    courses: list[dict[str, str]],
+    extra: dict[str, str],
+    hunter_args: list[str],
+) -> None:
+    """在临时目录中以子进程方式运行 hunter.py，连接到指定的本地服务器
+
+    Args:
+        base_url (str): 模拟或回放服务器地址
+        start_at (float): 开始时间（time.time）
+        courses (list[dict[str, str]]): 要抢的课程
+        extra (dict[str, str]): 额外的 .env 配置项
+        hunter_args (list[str]): 传给 hunter.py 的命令行参数
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        write_profile(directory, start_at, courses, extra)
+        env = dict(os.environ, JW_BASE_URL=base_url, IDS_BASE_URL=base_url)
+        subprocess.run(
+            [sys.executable, HUNTER_SCRIPT, "--quiet", *hunter_args],
+            cwd=directory,
+            env=env,
+            stdout=subprocess.DEVNULL,
+            timeout=start_at - time.time() + 120,
+        )
+
+
+def report_run(index: int, result: dict, course_count: int) -> None:
+    """输出一次运行的指标"""
+    succeeded = [t for t in result["success"].values() if not math.isnan(t)]
+    print(Fore.CYAN + f"\n第 {index + 1} 次运行" + Fore.RESET)
+    print(f"首个请求到达: {format_ms(result['first_request'])}")
+    print(f"成功课程: {len(succeeded)}/{course_count}")
+    for course_id, seconds in result["success"].items():
+        print(f"  {course_id}: {format_ms(seconds)}")
+    rps = "—" if math.isnan(result["rps"]) else f"{result['rps']:.1f} 次/秒"
+    print(f"选课请求数: {result['requests']}，请求速率: {rps}")
+
+
+def report_summary(results: list[dict], course_count: int) -> None:
+    """输出多次运行的汇总指标"""
+    first = [r["first_request"] for r in results if not math.isnan(r["first_request"])]
+    success = [t for r in results for t in r["success"].values() if not math.isnan(t)]
+    print(Fore.GREEN + "\n汇总" + Fore.RESET)
+    if first:
+        print(f"首个请求到达（中位数）: {format_ms(statistics.median(first))}")
+    if success:
+        print(f"成功时间（中位数）: {format_ms(statistics.median(success))}")
+    print(f"成功率: {len(success)}/{len(results) * course_count}")
+    rps = [r["rps"] for r in results if r["requests"] and not math.isnan(r["rps"])]
+    if rps:
+        print(f"请求速率（平均）: {statistics.fmean(rps):.1f} 次/秒")
+
+
+@app.command()
+def hunt(
+    runs: Annotated[int, typer.Option(help="重复运行次数")] = 3,
+    courses: Annotated[int, typer.Option(help="要抢的课程数")] = 10,
+    capacity: Annotated[int, typer.Option(help="每门课程的容量")] = 30,
+    competitor_rate: Annotated[
+        float, typer.Option(help="开放后其他学生每秒抢走的名额数（每门课程）")
+    ] = 10.0,
+    cookie_ttl: Annotated[
+        float, typer.Option(help="Cookie 有效期（秒），0 表示永不过期")
+    ] = 0.0,
+    throttle_interval: Annotated[
+        float, typer.Option(help="同一会话两次选课的最小间隔（秒）")
+    ] = 0.0,
+    release_interval: Annotated[
+        float,
+        typer.Option(help="开放后每隔多少秒每门课程退出一个名额，配合 --watch 使用"),
+    ] = 0.0,
+    latency: Annotated[
+        str, typer.Option(help="普通接口的延迟分布")
+    ] = "uniform:0.005,0.02",
+    add_latency: Annotated[
+        str, typer.Option(help="addGouwuche 的延迟分布")
+    ] = "lognormal:-3.5,0.6",
+    backends: Annotated[int, typer.Option(help="后端服务器数，配合 --routes 使用")] = 1,
+    slow_backend_delay: Annotated[
+        float, typer.Option(help="第一台后端服务器额外增加的处理时间（秒）")
+    ] = 0.0,
+    conflicts: Annotated[
+        int, typer.Option(help="前几门课程选课时总是返回时间冲突")
+    ] = 0,
+    start_delay: Annotated[float, typer.Option(help="启动后多少秒开始抢课")] = 8.0,
+    open_offset: Annotated[
+        float,
+        typer.Option(
+            help="实际开放时间比 START_TIME 晚多少秒，负数表示提前，配合 --detect-open 使用"
+        ),
+    ] = 0.0,
+    wait_time: Annotated[str, typer.Option(help="传给 hunter.py 的 WAIT_TIME")] = "1",
+    hunter_args: Annotated[
+        list[str] | None,
+        typer.Option("--hunter-arg", help="传给 hunter.py 的命令行参数，可重复"),
+    ] = None,
+) -> None:
+    """端到端抢课基准测试
+
+    在本地启动模拟教务系统，以子进程方式运行 hunter.py，
+    根据服务器端记录统计首个请求到达时间、每门课程的成功时间以及请求速率。
+    """
+    results = []
+    for i in range(runs):
+        config = MockConfig(
+            capacity=capacity,
+            competitor_rate=competitor_rate,
+            cookie_ttl=cookie_ttl,
+            throttle_interval=throttle_interval,
+            release_interval=release_interval,
+            latency=LatencyModel(latency),
+            add_latency=LatencyModel(add_latency),
+            backends=backends,
+            slow_backend_delay=slow_backend_delay,
+            conflicts=conflicts,
+        )
+        extra = {"WAIT_TIME": wait_time, "READY_TIME": "3", "CLOCK_SYNC_PROBES": "3"}
+        result = run_once(
+            config, courses, start_delay, extra, hunter_args or [], open_offset
+        )
+        results.append(result)
+        report_run(i, result, courses)
+    report_summary(results, courses)
+
+
+@app.command()
+def replay(
+    path: Annotated[str, typer.Argument(help="hunter.py --record 录制的磁带文件")],
+    runs: Annotated[int, typer.Option(help="重复运行次数")] = 3,
+    speed: Annotated[
+        float, typer.Option(help="回放延迟乘以的系数，0 表示不等待")
+    ] = 1.0,
+    start_delay: Annotated[float, typer.Option(help="启动后多少秒开始抢课")] = 8.0,
+    hunter_args: Annotated[
+        list[str] | None,
+        typer.Option("--hunter-arg", help="传给 hunter.py 的命令行参数，可重复"),
+    ] = None,
+) -> None:
+    """回放录制的真实选课流量，对抢课流程进行回归基准测试
+
+    每次运行启动一个回放服务器，按录制时的顺序与延迟返回响应，
+    要抢的课程从磁带中的选课请求还原，统计指标与 hunt 相同。
+    磁带应录制自定时开始的抢课（而不是 --now），回放时的流程才与录制时一致。
+    """
+    from cassette import ReplayServer, cassette_courses, load_cassette
+
+    exchanges = load_cassette(path)
+    courses = cassette_courses(exchanges)
+    if not courses:
+        print(Fore.RED + "磁带中没有选课请求" + Fore.RESET)
+        return
+    results = []
+    for i in range(runs):
+        start_at = float(math.ceil(time.time() + start_delay))
+        server = ReplayServer(exchanges, speed)
+        server.start()
+        extra = {"READY_TIME": "3", "CLOCK_SYNC_PROBES": "3"}
+        try:
+            run_hunter(server.base_url, start_at, courses, extra, hunter_args or [])
+        finally:
+            server.shutdown()
+            server.server_close()
+        result = summarize(server.records, start_at, [c["id"] for c in courses])
+        results.append(result)
+        report_run(i, result, len(courses))
+        if server.misses:
+            print(
+                Fore.YELLOW
+                + f"{server.misses} 个请求在磁带中没有对应的交互，"
+                + "请使用与录制时相同的 hunter.py 参数"
+                + Fore.RESET
+            )
+    report_summary(results, len(courses))
+
+
+def measure(send: Callable[[], object], requests: int) -> tuple[list[float], float]:
+    """重复调用 send，返回每次调用的耗时与总 CPU 时间（秒）"""
+    latencies = []
+    cpu_start = time.process_time()
+    for _ in range(requests):
+        start = time.perf_counter()
+        send()
+        latencies.append(time.perf_counter() - start)
+    return latencies, time.process_time() - cpu_start
+
+
+def report(name: str, latencies: list[float], cpu: float, batch: int = 1) -> None:
+    """输出一种发送方式的延迟分位数与 CPU 开销
+
+    Args:
+        name (str): 发送方式
+        latencies (list[float]): 每次调用的耗时（秒）
+        cpu (float): 总 CPU 时间（秒）
+        batch (int): 每次调用发送的请求数，CPU 开销按单个请求计算
+    """
+    quantiles = statistics.quantiles(latencies, n=100)
+    print(
+        f"{name:<12} p50 {quantiles[49] * 1000:7.3f} ms  "
+        f"p99 {quantiles[98] * 1000:7.3f} ms  "
+        f"CPU {cpu / (len(latencies) * batch) * 1e6:7.1f} µs/次"
+    )
+
+
+@app.command()
+def send(
+    requests: Annotated[int, typer.Option(help="每种方式发送的请求数")] = 1000,
+    batch: Annotated[int, typer.Option(help="流水线测试中同时发出的课程数")] = 10,
+) -> None:
+    """对比 requests 发送路径与快速发送通道的单次选课开销
+
+    模拟服务器不加延迟，测得的差异即为客户端自身的开销。
+    """
+    # 模拟服务器运行在子进程中，使测得的 CPU 时间只包含客户端开销
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            MOCK_SERVER_SCRIPT,
+            "--port",
+            str(port),
+            "--capacity",
+            "1000000",
+        ],
+        stdout=subprocess.DEVNULL,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    os.environ["JW_BASE_URL"] = base_url
+    os.environ["IDS_BASE_URL"] = base_url
+    # tools 在导入时读取 JW_BASE_URL，因此在设置环境变量之后再导入
+    from client import HunterSession
+    from fastpath import FastSender
+    from tools import add_course, fetch_login_form, submit_login_form
+
+    for _ in range(50):
+        try:
+            socket.create_connection(("127.0.0.1", port)).close()
+            break
+        except OSError:
+            time.sleep(0.1)
+
+    cookies = submit_login_form(fetch_login_form("mock", "mock"))
+    session = HunterSession(cookies, pool_size=batch)
+    code = CATEGORIES[0][0]
+    courses = [
+        {
+            "id": course["id"],
+            "name": course["kcmc"],
+            "information": "",
+            "code": code,
+            "academic_year": ACADEMIC_YEAR,
+            "term": TERM,
+        }
+        for course in build_catalog(MockConfig().courses_per_category)[code][:batch]
+    ]
+    sender = FastSender(session, batch)
+    sender.prepare(courses)
+    sender.warm_up()
+
+    try:
+        with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+            add_course(courses[0], session)  # 预热连接池
+            results = {
+                "requests": measure(lambda: add_course(courses[0], session), requests),
+                "fast": measure(lambda: sender.add_course(courses[0]), requests),
+                "pipeline": measure(
+                    lambda: sender.add_courses_pipelined(courses, 1),
+                    requests // len(courses),
+                ),
+            }
+    finally:
+        server.terminate()
+        server.wait()
+
+    print(Fore.CYAN + f"单次选课请求（共 {requests} 次）" + Fore.RESET)
+    report("requests", *results["requests"])
+    report("fast", *results["fast"])
+    # 延迟按每批统计，CPU 开销按单个请求统计，便于与上面两种方式比较
+    print(Fore.CYAN + f"单连接流水线发送 {len(courses)} 门课程" + Fore.RESET)
+    report("pipeline", *results["pipeline"], batch=len(courses))
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,363 @@
+import hashlib
+import json
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlparse
+
+import colorama
+import requests
+import typer
+from colorama import Fore
+from requests.adapters import HTTPAdapter
+from typing_extensions import Annotated
+
+from mock_server import RequestRecord
+from tools import IDS_BASE_URL, JW_BASE_URL
+
+CASSETTE_VERSION = 1
+REDACTED = "REDACTED"
+# 请求表单与查询参数中需要隐去的字段
+SECRET_FIELDS = ("username", "password", "ticket")
+# 回放时返回的响应头，Date 等由回放服务器重新生成
+REPLAY_HEADERS = ("Content-Type", "Location")
+# 与路径一起用于匹配录制的交互的表单字段
+KEY_FIELDS = ("p_id", "p_xkfsdm", "p_gjz", "pageNum")
+# 录制的地址中用于替代教务系统与统一身份认证地址的占位符
+BASE_URLS = {"{JW_BASE_URL}": JW_BASE_URL, "{IDS_BASE_URL}": IDS_BASE_URL}
+
+
+def redact_cookie(value: str) -> str:
+    """把 Cookie 值替换为不可还原、但相同值保持一致的占位符"""
+    return f"{REDACTED}-{hashlib.sha256(value.encode()).hexdigest()[:8]}"
+
+
+def redact_form(form: dict[str, list[str]]) -> dict[str, str]:
+    """隐去表单或查询参数中的用户名、密码与票据"""
+    return {
+        key: REDACTED if key in SECRET_FIELDS else values[0]
+        for key, values in form.items()
+    }
+
+
+def to_placeholder(url: str) -> str:
+    """把地址中的教务系统与统一身份认证地址替换为占位符，并隐去其中的票据"""
+    for placeholder, base_url in BASE_URLS.items():
+        if url.startswith(base_url):
+            url = placeholder + url[len(base_url) :]
+            break
+    parsed = urlparse(url)
+    if not parsed.query:
+        return url
+    query = urlencode(redact_form(parse_qs(parsed.query, keep_blank_values=True)))
+    return parsed._replace(query=query).geturl()
+
+
+def url_path(url: str) -> str:
+    """返回地址的路径部分，地址可以带有占位符"""
+    for placeholder in BASE_URLS:
+        url = url.replace(placeholder, "")
+    return urlparse(url).path
+
+
+def redact_set_cookie(header: str) -> str:
+    """隐去 Set-Cookie 中的 Cookie 值，保留名称与属性"""
+    name, _, rest = header.partition("=")
+    value, separator, attributes = rest.partition(";")
+    return f"{name}={redact_cookie(value.strip())}{separator}{attributes}"
+
+
+class Recorder:
+    """把所有 HTTP 交互及其耗时录制到磁带文件中
+
+    磁带是 JSONL 文件，第一行是元信息，之后每行是一次交互，包含请求方法、
+    地址、表单、发送时刻（相对录制开始的秒数）、首字节与总耗时、状态码、
+    响应头与响应体。请求中的 Cookie 不会保存，Set-Cookie 的值、
+    用户名、密码与登录票据都会被替换为占位符，响应体原样保存。
+    """
+
+    def __init__(self, path: str):
+        self._file = open(path, "w", encoding="utf-8")
+        self._lock = threading.Lock()
+        self._started_at = time.time()
+        self._original_send = None
+        self._write({"version": CASSETTE_VERSION, "recorded_at": self._started_at})
+
+    def _write(self, entry: dict) -> None:
+        line = json.dumps(entry, ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def record(
+        self,
+        method: str,
+        url: str,
+        body: str | bytes | None,
+        sent_at: float,
+        ttfb: float,
+        total: float,
+        status: int,
+        headers: list[tuple[str, str]],
+        content: bytes,
+    ) -> None:
+        """录制一次 HTTP 交互
+
+        Args:
+            method (str): 请求方法
+            url (str): 请求地址
+            body (str | bytes | None): 表单形式的请求体
+            sent_at (float): 发送时刻（time.time）
+            ttfb (float): 从发送到收到响应头的耗时
+            total (float): 从发送到读完响应体的耗时
+            status (int): 状态码
+            headers (list[tuple[str, str]]): 响应头，同名响应头可以出现多次
+            content (bytes): 响应体
+        """
+        if isinstance(body, bytes):
+            body = body.decode("utf-8", errors="replace")
+        response_headers = []
+        for name, value in headers:
+            if name.lower() == "set-cookie":
+                response_headers.append(("Set-Cookie", redact_set_cookie(value)))
+            elif name.lower() == "location":
+                response_headers.append(("Location", to_placeholder(value)))
+            elif name.lower() == "content-type":
+                response_headers.append(("Content-Type", value))
+        self._write(
+            {
+                "method": method,
+                "url": to_placeholder(url),
+                "form": redact_form(parse_qs(body or "", keep_blank_values=True)),
+                "sent_at": sent_at - self._started_at,
+                "ttfb": ttfb,
+                "total": total,
+                "status": status,
+                "headers": response_headers,
+                "body": content.decode("utf-8", errors="replace"),
+            }
+        )
+
+    def install(self) -> None:
+        """录制此后所有经过 requests 发出的请求，包括登录时使用的临时会话
+
+        为了保存响应体，流式请求的响应体会在返回前被完整读取。
+        """
+        original_send = HTTPAdapter.send
+        recorder = self
+
+        def send(adapter, request: requests.PreparedRequest, *args, **kwargs):
+            sent_at = time.time()
+            start = time.perf_counter()
+            response = original_send(adapter, request, *args, **kwargs)
+            ttfb = time.perf_counter() - start
+            content = response.content
+            raw_headers = getattr(response.raw, "headers", None)
+            headers = [
+                (name, value)
+                for name, value in response.headers.items()
+                if name.lower() != "set-cookie"
+            ]
+            if raw_headers is not None and hasattr(raw_headers, "getlist"):
+                headers += [
+                    ("Set-Cookie", value) for value in raw_headers.getlist("Set-Cookie")
+                ]
+            recorder.record(
+                request.method or "GET",
+                request.url or "",
+                request.body,
+                sent_at,
+                ttfb,
+                time.perf_counter() - start,
+                response.status_code,
+                headers,
+                content,
+            )
+            return response
+
+        self._original_send = original_send
+        HTTPAdapter.send = send
+
+    def close(self) -> None:
+        if self._original_send is not None:
+            HTTPAdapter.send = self._original_send
+            self._original_send = None
+        with self._lock:
+            self._file.close()
+
+
+def load_cassette(path: str) -> list[dict]:
+    """读取磁带中的全部交互
+
+    Raises:
+        ValueError: 当磁带版本不受支持时抛出
+    """
+    with open(path, encoding="utf-8") as f:
+        lines = [json.loads(line) for line in f if line.strip()]
+    if not lines or lines[0].get("version") != CASSETTE_VERSION:
+        raise ValueError(f"{path} 不是受支持的磁带文件")
+    return lines[1:]
+
+
+def exchange_key(method: str, url: str, form: dict[str, str]) -> tuple:
+    """返回用于匹配录制交互的键：请求方法、路径与关键表单字段"""
+    return (method, url_path(url), *(form.get(field) for field in KEY_FIELDS))
+
+
+def cassette_courses(exchanges: list[dict]) -> list[dict[str, str]]:
+    """从磁带中的 addGouwuche 请求还原课程列表，用于回放时生成 courses.json"""
+    courses: dict[str, dict[str, str]] = {}
+    for exchange in exchanges:
+        form = exchange["form"]
+        if url_path(exchange["url"]) == "/Xsxk/addGouwuche" and "p_id" in form:
+            courses.setdefault(
+                form["p_id"],
+                {
+                    "id": form["p_id"],
+                    "name": form["p_id"],
+                    "information": "",
+                    "code": form.get("p_xkfsdm", ""),
+                    "academic_year": form.get("p_xn", ""),
+                    "term": form.get("p_xq", ""),
+                },
+            )
+    return list(courses.values())
+
+
+class ReplayHandler(BaseHTTPRequestHandler):
+    """按录制顺序返回匹配的交互，并在返回前等待录制时的首字节耗时"""
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    server: "ReplayServer"
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+    def handle_request(self) -> None:
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length).decode("utf-8") if length else ""
+        form = redact_form(parse_qs(body, keep_blank_values=True))
+        record = RequestRecord(time.time(), urlparse(self.path).path, form.get("p_id"))
+        exchange = self.server.next_exchange(self.command, self.path, form)
+        if exchange is None:
+            self.server.record(record, missed=True)
+            self.reply(404, [("Content-Type", "text/plain")], b"Not Found")
+            return
+        time.sleep(exchange["ttfb"] * self.server.speed)
+        if "application/json" in dict(exchange["headers"]).get("Content-Type", ""):
+            try:
+                record.message = json.loads(exchange["body"]).get("message")
+            except (ValueError, AttributeError):
+                pass
+        self.server.record(record)
+        headers = [
+            (name, self.server.from_placeholder(value))
+            for name, value in exchange["headers"]
+            if name in REPLAY_HEADERS or name == "Set-Cookie"
+        ]
+        self.reply(exchange["status"], headers, exchange["body"].encode("utf-8"))
+
+    def reply(self, status: int, headers: list[tuple[str, str]], data: bytes) -> None:
+        self.send_response(status)
+        for name, value in headers:
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(data)
+
+    do_GET = do_POST = do_HEAD = handle_request
+
+
+class ReplayServer(ThreadingHTTPServer):
+    """在本地回放磁带的服务器
+
+    同一键（见 exchange_key）的请求按录制顺序依次返回对应的响应，
+    超出录制次数后重复最后一个响应；没有完全匹配的键时退而按请求方法与路径匹配。
+
+    Attributes:
+        speed (float): 回放延迟乘以的系数，0 表示不等待
+        records (list[RequestRecord]): 收到的请求，格式与模拟服务器相同
+        misses (int): 在磁带中找不到对应交互、返回了 404 的请求数
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        exchanges: list[dict],
+        speed: float = 1.0,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ):
+        super().__init__((host, port), ReplayHandler)
+        self.speed = speed
+        self.records: list[RequestRecord] = []
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._queues: dict[tuple, deque[dict]] = {}
+        self._by_path: dict[tuple, deque[dict]] = {}
+        for exchange in exchanges:
+            key = exchange_key(exchange["method"], exchange["url"], exchange["form"])
+            self._queues.setdefault(key, deque()).append(exchange)
+            path_key = (exchange["method"], url_path(exchange["url"]))
+            self._by_path.setdefault(path_key, deque()).append(exchange)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def from_placeholder(self, value: str) -> str:
+        """把录制时替换的占位符还原为回放服务器地址"""
+        for placeholder in BASE_URLS:
+            value = value.replace(placeholder, self.base_url)
+        return value
+
+    def next_exchange(self, method: str, url: str, form: dict[str, str]) -> dict | None:
+        """取出与请求匹配的下一个录制交互"""
+        with self._lock:
+            queue = self._queues.get(exchange_key(method, url, form))
+            if queue is None:
+                queue = self._by_path.get((method, url_path(url)))
+            if not queue:
+                return None
+            return queue.popleft() if len(queue) > 1 else queue[0]
+
+    def record(self, record: RequestRecord, missed: bool = False) -> None:
+        with self._lock:
+            self.records.append(record)
+            self.misses += missed
+
+    def start(self) -> threading.Thread:
+        """在后台线程中运行服务器"""
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+
+def main(
+    path: Annotated[str, typer.Argument(help="--record 录制的磁带文件")],
+    port: Annotated[int, typer.Option(help="监听端口")] = 8000,
+    speed: Annotated[
+        float, typer.Option(help="回放延迟乘以的系数，0 表示不等待")
+    ] = 1.0,
+) -> None:
+    """回放录制的磁带
+
+    启动后设置环境变量 JW_BASE_URL 与 IDS_BASE_URL 为输出的地址，
+    即可让 prepare.py 和 hunter.py 连接到回放服务器。
+    """
+    colorama.init()
+    server = ReplayServer(load_cassette(path), speed, port=port)
+    print(Fore.GREEN + f"回放服务器已启动：{server.base_url}" + Fore.RESET)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    typer.run(main)
@@ -0,0 +1,258 @@
+import math
+import os
+import pickle
+import threading
+import time
+from collections.abc import Generator, Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+
+from colorama import Fore
+
+from client import HunterSession
+from tools import get_courses, query_courses
+
+CACHE_DIR = ".cache"
+DEFAULT_CATALOG_TTL = 3600.0
+DEFAULT_PAGE_SIZE = 100
+# 预取时每个分页失败后的重试次数
+PREFETCH_RETRIES = 2
+
+
+def get_cache_path(category: dict[str, str], time_info: dict[str, str]) -> str:
+    """返回课程目录缓存文件路径，按学年、学期和类别代码区分
+
+    Args:
+        category (dict[str, str]): 包含课程类别代码和名称的字典
+        time_info (dict[str, str]): 学年学期信息字典
+
+    Returns:
+        str: 缓存文件路径
+    """
+    name = f"{time_info['academic_year']}-{time_info['term']}-{category['code']}"
+    return os.path.join(CACHE_DIR, f"{name}.pickle")
+
+
+def read_cache(path: str, ttl: float) -> list[dict[str, str]] | None:
+    """读取未过期的课程目录缓存
+
+    Args:
+        path (str): 缓存文件路径
+        ttl (float): 缓存有效期（秒）
+
+    Returns:
+        list[dict[str, str]] | None: 缓存的课程列表，不存在、已过期或损坏时返回 None
+    """
+    try:
+        with open(path, "rb") as f:
+            fetched_at, courses = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, ValueError):
+        return None
+    if time.time() - fetched_at > ttl:
+        return None
+    return courses
+
+
+def write_cache(path: str, courses: list[dict[str, str]]) -> None:
+    """写入课程目录缓存
+
+    先写入临时文件再替换，避免中断时留下损坏的缓存。
+
+    Args:
+        path (str): 缓存文件路径
+        courses (list[dict[str, str]]): 课程列表
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "wb") as f:
+        pickle.dump((time.time(), courses), f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temp_path, path)
+
+
+class StreamingCatalog:
+    """边下载边解析的课程目录，可以多次遍历
+
+    遍历时先返回已经解析出的课程，再继续从响应中解析后续课程，
+    因此第一次搜索无需等待整个类别下载完毕。
+    只有响应完整读取时才写入缓存，请求失败或被截断时不缓存不完整的目录。
+
+    Args:
+        courses (Generator[dict[str, str], None, bool]): tools.iter_courses
+            返回的生成器，其返回值表示响应是否完整读取
+        path (str): 缓存文件路径
+
+    Attributes:
+        complete (bool): 是否已经完整读取了整个类别
+    """
+
+    def __init__(self, courses: Generator[dict[str, str], None, bool], path: str):
+        self.courses: list[dict[str, str]] = []
+        self.complete = False
+        self._source: Generator[dict[str, str], None, bool] | None = courses
+        self._path = path
+
+    def __iter__(self) -> Iterator[dict[str, str]]:
+        index = 0
+        while True:
+            if index < len(self.courses):
+                yield self.courses[index]
+                index += 1
+                continue
+            if self._source is None:
+                return
+            try:
+                course = next(self._source)
+            except StopIteration as stop:
+                self._source = None
+                self.complete = bool(stop.value)
+                if self.complete and self.courses:
+                    write_cache(self._path, self.courses)
+                return
+            self.courses.append(course)
+
+
+def load_catalog(
+    category: dict[str, str],
+    time_info: dict[str, str],
+    session: HunterSession,
+    ttl: float = DEFAULT_CATALOG_TTL,
+    refresh: bool = False,
+    stream: bool = False,
+) -> list[dict[str, str]] | StreamingCatalog:
+    """获取某个类别下的全部课程，优先使用本地缓存
+
+    Args:
+        category (dict[str, str]): 包含课程类别代码和名称的字典
+        time_info (dict[str, str]): 学年学期信息字典
+        session (HunterSession): 包含 Cookie 的 HTTP 会话
+        ttl (float): 缓存有效期（秒）
+        refresh (bool): 是否忽略缓存重新获取
+        stream (bool): 没有缓存时是否返回边下载边解析的 StreamingCatalog
+
+    Returns:
+        list[dict[str, str]] | StreamingCatalog: 课程列表，格式与 get_courses 相同
+    """
+    path = get_cache_path(category, time_info)
+    if not refresh:
+        courses = read_cache(path, ttl)
+        if courses is not None:
+            print(Fore.GREEN + f"已从缓存加载`{category['name']}`类别" + Fore.RESET)
+            return courses
+
+    if stream:
+        return StreamingCatalog(
+            get_courses(category, time_info, session, "", stream=True), path
+        )
+    courses = get_courses(
+        category=category, time_info=time_info, session=session, keyword=""
+    )
+    if courses:
+        write_cache(path, courses)
+    return courses
+
+
+def search_courses(
+    courses: Iterable[dict[str, str]], keyword: str
+) -> Iterable[dict[str, str]]:
+    """在本地课程列表中按关键词搜索
+
+    关键词为空字符串时返回全部课程，否则返回名称或详细信息中包含关键词的课程。
+
+    Args:
+        courses (Iterable[dict[str, str]]): 课程列表或 StreamingCatalog
+        keyword (str): 搜索关键词
+
+    Returns:
+        Iterable[dict[str, str]]: 匹配的课程，输入为列表时返回列表，
+            否则返回随输入逐个产生结果的迭代器
+    """
+    matches = (
+        course
+        for course in courses
+        if keyword in course["name"] or keyword in course["information"]
+    )
+    if isinstance(courses, list):
+        return courses if keyword == "" else list(matches)
+    return matches
+
+
+def prefetch_catalog(
+    categories: list[dict[str, str]],
+    time_info: dict[str, str],
+    session: HunterSession,
+    workers: int,
+    page_size: int = DEFAULT_PAGE_SIZE,
+) -> dict[str, list[dict[str, str]]]:
+    """并发获取所有类别的所有分页，一次性建立本学期的课程目录缓存
+
+    先并发请求每个类别的第一页，根据返回的课程总数计算页数，
+    再并发请求剩余的分页。失败的分页最多重试 PREFETCH_RETRIES 次，
+    仍有分页失败的类别不写入缓存，之后按需重新获取；
+    其余类别按课程 id 去重后写入缓存。
+
+    Args:
+        categories (list[dict[str, str]]): 课程类别列表
+        time_info (dict[str, str]): 学年学期信息字典
+        session (HunterSession): 包含 Cookie 的 HTTP 会话
+        workers (int): 并发请求数
+        page_size (int): 每页课程数
+
+    Returns:
+        dict[str, list[dict[str, str]]]: 类别代码到课程列表的映射，
+            不完整的类别只包含获取成功的分页中的课程
+    """
+    print(Fore.CYAN + f"正在预取 {len(categories)} 个类别的全部课程..." + Fore.RESET)
+    request_count = 0
+    lock = threading.Lock()
+
+    def fetch(
+        task: tuple[dict[str, str], int],
+    ) -> tuple[list[dict[str, str]], int] | None:
+        nonlocal request_count
+        category, page_num = task
+        for _ in range(PREFETCH_RETRIES + 1):
+            with lock:
+                request_count += 1
+            page = query_courses(category, time_info, session, "", page_num, page_size)
+            if page is not None:
+                return page
+        return None
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        first_pages = list(executor.map(fetch, [(c, 1) for c in categories]))
+        rest_tasks = [
+            (category, page_num)
+            for category, page in zip(categories, first_pages)
+            if page is not None
+            for page_num in range(2, math.ceil(page[1] / page_size) + 1)
+        ]
+        rest_pages = list(executor.map(fetch, rest_tasks))
+
+    catalog: dict[str, dict[str, dict[str, str]]] = {c["code"]: {} for c in categories}
+    failed: set[str] = set()
+    pages = list(zip(categories, first_pages)) + [
+        (category, page) for (category, _), page in zip(rest_tasks, rest_pages)
+    ]
+    for category, page in pages:
+        if page is None:
+            failed.add(category["code"])
+            continue
+        for course in page[0]:
+            catalog[category["code"]].setdefault(course["id"], course)
+
+    result = {}
+    for category in categories:
+        courses = list(catalog[category["code"]].values())
+        if courses and category["code"] not in failed:
+            write_cache(get_cache_path(category, time_info), courses)
+        result[category["code"]] = courses
+
+    total = sum(len(courses) for courses in result.values())
+    print(Fore.GREEN + f"已预取 {total} 门课程（{request_count} 次请求）" + Fore.RESET)
+    if failed:
+        names = "、".join(c["name"] for c in categories if c["code"] in failed)
+        print(
+            Fore.YELLOW
+            + f"以下类别有分页获取失败，未写入缓存，选择时会重新获取：{names}"
+            + Fore.RESET
+        )
+    return result
@@ -0,0 +1,119 @@
+import socket
+import threading
+import time
+from collections.abc import Callable
+
+import requests
+from requests.adapters import HTTPAdapter
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36 Edg/131.0.0.0"
+DEFAULT_POOL_SIZE = 10
+DEFAULT_CONNECT_TIMEOUT = 3.05
+DEFAULT_READ_TIMEOUT = 10.0
+DEFAULT_DNS_CACHE_TTL = 300.0
+
+_original_getaddrinfo = socket.getaddrinfo
+_dns_cache: dict[tuple, tuple[float, list]] = {}
+_dns_lock = threading.Lock()
+_dns_cache_ttl = DEFAULT_DNS_CACHE_TTL
+
+
+def _cached_getaddrinfo(*args, **kwargs) -> list:
+    """带缓存的 socket.getaddrinfo
+
+    对相同参数的域名解析结果缓存 _dns_cache_ttl 秒，避免抢课时重复进行 DNS 查询。
+    """
+    key = (args, tuple(sorted(kwargs.items())))
+    now = time.monotonic()
+    with _dns_lock:
+        cached = _dns_cache.get(key)
+        if cached is not None and cached[0] > now:
+            return cached[1]
+
+    result = _original_getaddrinfo(*args, **kwargs)
+    with _dns_lock:
+        _dns_cache[key] = (now + _dns_cache_ttl, result)
+    return result
+
+
+def install_dns_cache(ttl: float) -> None:
+    """启用进程级 DNS 缓存
+
+    替换 socket.getaddrinfo，使所有连接（包括 urllib3 连接池新建的连接）共享解析结果。
+    重复调用只会更新缓存有效期。
+
+    Args:
+        ttl (float): 缓存有效期（秒），小于等于 0 时不启用缓存
+    """
+    global _dns_cache_ttl
+    if ttl <= 0:
+        return
+    _dns_cache_ttl = ttl
+    socket.getaddrinfo = _cached_getaddrinfo
+
+
+class HunterSession(requests.Session):
+    """抢课使用的 HTTP 会话
+
+    在 requests.Session 的基础上：
+    - 挂载可配置大小的 keep-alive 连接池，复用与教务系统之间的 TCP 连接
+    - 将 User-Agent 和 Cookie 保存在会话请求头中，无需每次重新构造
+    - 为所有未显式指定超时的请求设置默认超时
+    - 可通过 relogin 指定 Cookie 过期时的重新登录方式，refresh_lock 保证
+      多个线程同时发现 Cookie 过期时只重新登录一次（见 tools.refresh_cookies）
+    """
+
+    def __init__(
+        self,
+        cookies: str,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        timeout: tuple[float, float] = (DEFAULT_CONNECT_TIMEOUT, DEFAULT_READ_TIMEOUT),
+    ):
+        super().__init__()
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.relogin: Callable[[], str] | None = None
+        self.refresh_lock = threading.Lock()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.mount("http://", adapter)
+        self.mount("https://", adapter)
+        self.headers.update({"User-Agent": USER_AGENT, "Cookie": cookies})
+
+    @property
+    def cookies_string(self) -> str:
+        """当前会话使用的 Cookie 字符串"""
+        return str(self.headers["Cookie"])
+
+    @cookies_string.setter
+    def cookies_string(self, cookies: str) -> None:
+        self.headers["Cookie"] = cookies
+
+    def request(self, method, url, *args, **kwargs) -> requests.Response:
+        kwargs.setdefault("timeout", self.timeout)
+        return super().request(method, url, *args, **kwargs)
+
+
+def create_session(config: dict[str, str]) -> HunterSession:
+    """根据配置创建共享的 HTTP 会话
+
+    读取 .env 中的以下可选配置项：
+    - POOL_SIZE: 连接池大小，默认为 10
+    - CONNECT_TIMEOUT: 连接超时时间（秒），默认为 3.05
+    - READ_TIMEOUT: 读取超时时间（秒），默认为 10
+    - DNS_CACHE_TTL: DNS 缓存有效期（秒），默认为 300，设置为 0 关闭缓存
+
+    Args:
+        config (dict[str, str]): 配置信息字典，必须包含 COOKIES
+
+    Returns:
+        HunterSession: 已设置好请求头和连接池的会话
+    """
+    install_dns_cache(float(config.get("DNS_CACHE_TTL", DEFAULT_DNS_CACHE_TTL)))
+    return HunterSession(
+        cookies=config["COOKIES"],
+        pool_size=int(config.get("POOL_SIZE", DEFAULT_POOL_SIZE)),
+        timeout=(
+            float(config.get("CONNECT_TIMEOUT", DEFAULT_CONNECT_TIMEOUT)),
+            float(config.get("READ_TIMEOUT", DEFAULT_READ_TIMEOUT)),
+        ),
+    )
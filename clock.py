@@ -0,0 +1,101 @@
+import math
+import time
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+
+import requests
+from colorama import Fore
+
+from client import HunterSession
+from tools import JW_BASE_URL
+
+PROBE_URL = f"{JW_BASE_URL}/"
+DEFAULT_PROBES = 8
+
+
+@dataclass
+class ClockSync:
+    """服务器时钟同步结果
+
+    Attributes:
+        offset (float): 服务器时间减去本地时间（秒）
+        rtt (float): 观测到的最小往返时间（秒）
+        error (float): offset 的误差上界（秒）
+    """
+
+    offset: float = 0.0
+    rtt: float = 0.0
+    error: float = math.inf
+
+
+def probe_server_time(
+    session: HunterSession, url: str = PROBE_URL
+) -> tuple[float, float, float]:
+    """发送一次探测请求，读取服务器响应头中的 Date
+
+    Args:
+        session (HunterSession): 共享的 HTTP 会话
+        url (str): 探测使用的地址
+
+    Returns:
+        tuple[float, float, float]: 请求发出时的本地时间、收到响应时的本地时间、
+            服务器 Date 响应头对应的时间戳（精确到秒）
+
+    Raises:
+        ValueError: 响应中没有 Date 响应头时抛出
+    """
+    t0 = time.time()
+    response = session.head(url, allow_redirects=False)
+    t1 = time.time()
+    date = response.headers.get("Date")
+    if date is None:
+        raise ValueError("服务器响应中没有 Date 响应头")
+    return t0, t1, parsedate_to_datetime(date).timestamp()
+
+
+def sync_clock(
+    session: HunterSession, probes: int = DEFAULT_PROBES, url: str = PROBE_URL
+) -> ClockSync:
+    """估计本地时钟与服务器时钟的偏差
+
+    Date 响应头只精确到秒。服务器在 [t0, t1] 内的某一时刻生成该响应头，
+    此时服务器时间位于 [S, S + 1) 内，因此偏差满足
+    S - t1 <= offset < S + 1 - t0。
+    每次探测都会安排在当前估计的服务器整秒跳变时刻附近（以往返中点为准），
+    与已有区间取交集后，误差区间大约减半，类似 NTP 的中点估计与二分逼近。
+
+    Args:
+        session (HunterSession): 共享的 HTTP 会话
+        probes (int): 探测次数
+        url (str): 探测使用的地址
+
+    Returns:
+        ClockSync: 同步结果，探测全部失败时 offset 为 0
+    """
+    low, high = -math.inf, math.inf
+    rtt = math.inf
+    for _ in range(probes):
+        if math.isfinite(low) and math.isfinite(high):
+            # 让往返中点落在估计的下一个服务器整秒跳变时刻
+            estimate = (low + high) / 2
+            midpoint = math.ceil(time.time() + estimate + rtt) - estimate
+            delay = midpoint - rtt / 2 - time.time()
+            if delay > 0:
+                time.sleep(delay)
+        try:
+            t0, t1, server_time = probe_server_time(session, url)
+        except (requests.RequestException, ValueError) as e:
+            print(Fore.YELLOW + f"时钟同步探测失败：{e}" + Fore.RESET)
+            continue
+
+        rtt = min(rtt, t1 - t0)
+        probe_low, probe_high = server_time - t1, server_time + 1 - t0
+        if probe_low > high or probe_high < low:
+            # 网络抖动导致区间不相交，以本次探测为准重新开始
+            low, high = probe_low, probe_high
+        else:
+            low, high = max(low, probe_low), min(high, probe_high)
+
+    if not (math.isfinite(low) and math.isfinite(high)):
+        return ClockSync()
+    return ClockSync(offset=(low + high) / 2, rtt=rtt, error=(high - low) / 2)
@@ -0,0 +1,200 @@
+import queue
+import sys
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+from colorama import Cursor, Fore
+from colorama.ansi import clear_line
+
+DEFAULT_FPS = 10.0
+
+_renderer: "Renderer | None" = None
+_quiet = False
+_last_countdown: int | None = None
+# 最后一行是否为 status 输出的、尚未换行的状态行
+_status_line = False
+
+
+def set_quiet(quiet: bool) -> None:
+    """开启或关闭安静模式，安静模式下不输出任何抢课过程信息"""
+    global _quiet
+    _quiet = quiet
+
+
+def is_quiet() -> bool:
+    """是否处于安静模式"""
+    return _quiet
+
+
+def end_status() -> None:
+    """结束原地刷新的状态行，保留其最后的内容"""
+    global _status_line
+    if _status_line:
+        print()
+        _status_line = False
+
+
+def sending(course: dict[str, str]) -> None:
+    """报告即将发送一门课程的选课请求"""
+    if _quiet:
+        return
+    if _renderer is not None:
+        _renderer.events.put(("send", course["id"], course["name"]))
+        return
+    end_status()
+    print(
+        Fore.CYAN
+        + f"\n正在添加课程：{course['name']}\n{course['information']}"
+        + Fore.RESET
+    )
+
+
+def result(course: dict[str, str], message: str, color: str) -> None:
+    """报告一门课程的一次选课结果
+
+    Args:
+        course (dict[str, str]): 课程信息字典
+        message (str): 结果描述
+        color (str): 输出颜色
+    """
+    if _quiet:
+        return
+    if _renderer is not None:
+        _renderer.events.put(("result", course["id"], course["name"], message, color))
+        return
+    end_status()
+    print(color + message + Fore.RESET)
+
+
+def notice(message: str, color: str = Fore.CYAN) -> None:
+    """报告与具体课程无关的事件，例如速率调整"""
+    if _quiet:
+        return
+    if _renderer is not None:
+        _renderer.events.put(("notice", message, color))
+        return
+    end_status()
+    print(color + message + Fore.RESET)
+
+
+def status(message: str, color: str = Fore.CYAN) -> None:
+    """原地刷新一行状态信息，例如监视余量的查询轮数
+
+    之后的 notice 等输出会先换行，保留状态行最后的内容；
+    状态表已经显示了抢课进度，渲染期间不输出。
+    """
+    global _status_line
+    if _quiet or _renderer is not None:
+        return
+    print("\r" + clear_line() + color + message + Fore.RESET, end="", flush=True)
+    _status_line = True
+
+
+def countdown(remaining: float) -> None:
+    """刷新开始前的倒计时，秒数变化时才重新输出"""
+    global _last_countdown
+    seconds = int(remaining)
+    if _quiet or seconds == _last_countdown:
+        return
+    _last_countdown = seconds
+    print(
+        Fore.CYAN + f"\r距离开始还有 {seconds} 秒..." + Fore.RESET, end="", flush=True
+    )
+
+
+class Renderer(threading.Thread):
+    """在后台线程中以固定帧率绘制抢课状态表
+
+    发送请求的线程只把事件放入队列，不进行任何终端输出；
+    渲染线程每帧取出所有事件，把通知输出在状态表上方，然后原地重绘状态表，
+    终端再慢也不会拖慢请求。
+    """
+
+    def __init__(self, courses: list[dict[str, str]], fps: float = DEFAULT_FPS):
+        super().__init__(daemon=True)
+        self.events: queue.SimpleQueue[tuple] = queue.SimpleQueue()
+        self.interval = 1 / fps
+        # 课程 id -> [名称, 尝试次数, 最近结果, 颜色]
+        self.rows: dict[str, list] = {
+            course["id"]: [course["name"], 0, "等待中", Fore.RESET]
+            for course in courses
+        }
+        self.requests = 0
+        self.succeeded: set[str] = set()
+        self.started_at = time.perf_counter()
+        self._drawn = 0
+        self._stopped = threading.Event()
+
+    def run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            self.draw()
+        self.draw()
+
+    def stop(self) -> None:
+        """停止渲染，并绘制最后一帧"""
+        self._stopped.set()
+        self.join()
+
+    def draw(self) -> None:
+        """处理队列中的全部事件并重绘一帧"""
+        notices = []
+        while True:
+            try:
+                event = self.events.get_nowait()
+            except queue.Empty:
+                break
+            kind = event[0]
+            if kind == "notice":
+                notices.append(event[2] + event[1] + Fore.RESET)
+                continue
+            row = self.rows.setdefault(event[1], [event[2], 0, "", Fore.RESET])
+            if kind == "send":
+                self.requests += 1
+                row[1] += 1
+                row[2:] = ["发送中", Fore.CYAN]
+            else:
+                row[2:] = [event[3], event[4]]
+                if event[3].startswith("选课成功"):
+                    self.succeeded.add(event[1])
+
+        elapsed = time.perf_counter() - self.started_at
+        lines = [
+            Fore.CYAN
+            + f"已发送 {self.requests} 个请求，成功 {len(self.succeeded)}/"
+            + f"{len(self.rows)} 门，用时 {elapsed:.1f} 秒"
+            + Fore.RESET
+        ]
+        for name, attempts, message, color in self.rows.values():
+            lines.append(f"  {name}  第 {attempts} 次  {color}{message}{Fore.RESET}")
+
+        output = [Cursor.UP(self._drawn) + "\r" if self._drawn else ""]
+        for line in notices + lines:
+            output.append(clear_line() + line + "\n")
+        self._drawn = len(lines)
+        sys.stdout.write("".join(output))
+        sys.stdout.flush()
+
+
+@contextmanager
+def live(courses: list[dict[str, str]], fps: float = DEFAULT_FPS) -> Iterator[None]:
+    """在 with 语句块内用状态表代替逐行输出
+
+    安静模式、帧率不大于 0 或标准输出不是终端时不启用，仍按原样逐行输出。
+
+    Args:
+        courses (list[dict[str, str]]): 要显示的课程
+        fps (float): 每秒重绘次数
+    """
+    global _renderer
+    if _quiet or fps <= 0 or not sys.stdout.isatty():
+        yield
+        return
+    _renderer = Renderer(courses, fps)
+    _renderer.start()
+    try:
+        yield
+    finally:
+        renderer, _renderer = _renderer, None
+        renderer.stop()
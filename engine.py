@@ -0,0 +1,363 @@
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from collections.abc import Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+from typing import TYPE_CHECKING
+
+from colorama import Fore
+
+import console
+from client import HunterSession
+from tools import Outcome, add_course
+
+if TYPE_CHECKING:
+    from tracing import Tracer
+
+DEFAULT_INITIAL_RATE = 20.0
+DEFAULT_MIN_RATE = 0.5
+DEFAULT_MAX_RATE = 50.0
+DEFAULT_RATE_INCREASE = 1.0
+DEFAULT_RATE_BACKOFF = 0.5
+
+
+class RateLimiter:
+    """异步令牌桶限速器
+
+    每秒最多放行 rate 个请求，允许 burst 个请求的突发。
+    rate 小于等于 0 时不做任何限制。
+    令牌不足时按 priority 从小到大依次放行，priority 相同时先到先得。
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self._tokens = float(self.burst)
+        self._updated_at = time.monotonic()
+        self._waiters: list[tuple[tuple[int, ...], int, asyncio.Future]] = []
+        self._counter = itertools.count()
+        self._dispatcher: asyncio.Task | None = None
+
+    async def acquire(self, priority: tuple[int, ...] = ()) -> None:
+        """获取一个令牌，令牌不足时等待
+
+        Args:
+            priority (tuple[int, ...]): 优先级，越小越先获得令牌
+        """
+        if self.rate <= 0:
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._counter), future))
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        await future
+
+    async def _dispatch(self) -> None:
+        while self._waiters:
+            if self._waiters[0][2].cancelled():
+                heapq.heappop(self._waiters)
+                continue
+            now = time.monotonic()
+            if self.rate > 0:
+                self._tokens = min(
+                    self.burst, self._tokens + (now - self._updated_at) * self.rate
+                )
+            self._updated_at = now
+            if self.rate <= 0 or self._tokens >= 1:
+                self._tokens -= 1
+                heapq.heappop(self._waiters)[2].set_result(None)
+                continue
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class AdaptivePacer(RateLimiter):
+    """按 AIMD 策略自适应调整全局请求速率的限速器
+
+    从较高的速率开始，服务器返回限流响应时把速率乘以 backoff，
+    响应正常时每秒大约增加 increase 次/秒，速率始终在 [min_rate, max_rate] 之间。
+    同一时刻在途的多个请求可能同时被限流，因此一次降速后的一小段时间内
+    不再重复降速。
+    """
+
+    def __init__(
+        self,
+        initial_rate: float = DEFAULT_INITIAL_RATE,
+        min_rate: float = DEFAULT_MIN_RATE,
+        max_rate: float = DEFAULT_MAX_RATE,
+        increase: float = DEFAULT_RATE_INCREASE,
+        backoff: float = DEFAULT_RATE_BACKOFF,
+        burst: int = 1,
+    ):
+        super().__init__(min(max(initial_rate, min_rate), max_rate), burst)
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.backoff = backoff
+        self.tracer: Tracer | None = None
+        self._backed_off_at = -math.inf
+        self._logged_rate = self.rate
+
+    def observe(self, throttled: bool) -> None:
+        """根据一次 addGouwuche 响应调整速率
+
+        Args:
+            throttled (bool): 该响应是否表示被服务器限流
+        """
+        now = time.monotonic()
+        if throttled:
+            # 降速前发出的请求仍可能被限流，等这些请求返回后再考虑下一次降速
+            if now - self._backed_off_at < 1 / self.rate:
+                return
+            self._backed_off_at = now
+            self._set_rate(self.rate * self.backoff, "throttled")
+        else:
+            # 每个正常响应增加 increase / rate，相当于每秒增加 increase
+            self._set_rate(self.rate + self.increase / self.rate, "clean")
+
+    def _set_rate(self, rate: float, reason: str) -> None:
+        rate = min(max(rate, self.min_rate), self.max_rate)
+        if rate == self.rate:
+            return
+        self.rate = rate
+        if reason == "throttled":
+            console.notice(f"请求被限流，全局速率降至 {rate:.1f} 次/秒", Fore.YELLOW)
+        elif abs(rate - self._logged_rate) >= 1 or rate == self.max_rate:
+            console.notice(f"响应正常，全局速率升至 {rate:.1f} 次/秒")
+        else:
+            return
+        self._logged_rate = rate
+        if self.tracer is not None:
+            self.tracer.record("pace", time=time.time(), rate=rate, reason=reason)
+
+
+class CourseGroup:
+    """一组互为备选的课程，其中任意一门选课成功即满足该组
+
+    courses.json 中的课程可以带有以下可选字段：
+    - group: 组名，组名相同的课程互为备选，按在文件中的先后顺序决定偏好，
+      没有该字段的课程单独成组
+    - priority: 组的优先级，越小越优先，默认为 0，同组课程以第一门为准
+
+    同组课程发送请求前都要获取 lock，并持有到请求返回，因此同一时刻
+    组内最多只有一个请求在途，不会同时选上多门备选课程。
+    """
+
+    def __init__(self, name: str, courses: list[dict[str, str]], priority: int = 0):
+        self.name = name
+        self.courses = courses
+        self.priority = priority
+        self.satisfied = False
+        self.lock = asyncio.Lock()
+        self._waiting: set[asyncio.Task] = set()
+
+    def satisfy(self) -> None:
+        """标记该组已满足，并取消组内尚未发出的尝试"""
+        self.satisfied = True
+        for task in self._waiting:
+            task.cancel()
+
+    @contextmanager
+    def waiting(self) -> Iterator[None]:
+        """在此期间当前任务尚未发出请求，组被满足时可以直接取消"""
+        task = asyncio.current_task()
+        assert task is not None
+        self._waiting.add(task)
+        try:
+            yield
+        finally:
+            self._waiting.discard(task)
+
+
+class AttemptBudget:
+    """各课程之间共享的剩余尝试次数
+
+    因无法选上而提前放弃的课程把未使用的尝试次数归还到这里，
+    用完自身次数的课程可以继续借用。
+    所有课程运行在同一个事件循环中，不需要加锁。
+
+    Attributes:
+        spare (int): 可以借用的剩余次数
+    """
+
+    def __init__(self):
+        self.spare = 0
+
+    def release(self, unused: int) -> None:
+        """归还一门课程未使用的尝试次数"""
+        self.spare += max(unused, 0)
+
+    def borrow(self) -> bool:
+        """借用一次尝试，没有剩余次数时返回 False"""
+        if self.spare <= 0:
+            return False
+        self.spare -= 1
+        return True
+
+
+def group_courses(courses: list[dict[str, str]]) -> list[CourseGroup]:
+    """按 group 字段把课程分组，并按优先级排序
+
+    Args:
+        courses (list[dict[str, str]]): 课程列表
+
+    Returns:
+        list[CourseGroup]: 课程组列表，优先级相同时保持在文件中的先后顺序
+    """
+    groups: dict[str, CourseGroup] = {}
+    for course in courses:
+        name = course.get("group") or course["id"]
+        if name in groups:
+            groups[name].courses.append(course)
+        else:
+            groups[name] = CourseGroup(name, [course], int(course.get("priority", 0)))
+    return sorted(groups.values(), key=lambda group: group.priority)
+
+
+async def hunt_course(
+    course: dict[str, str],
+    send: Callable[[dict[str, str]], Outcome],
+    course_limiter: RateLimiter,
+    global_limiter: RateLimiter,
+    max_attempts: int,
+    initial_delay: float = 0.0,
+    group: CourseGroup | None = None,
+    priority: tuple[int, ...] = (),
+    budget: AttemptBudget | None = None,
+) -> Outcome:
+    """对单门课程按自身节奏重复尝试选课
+
+    被限流的请求没有被服务器处理，不计入尝试次数，但最多额外重试 max_attempts 次，
+    向 budget 借来的一次尝试在真正发出前一直有效，限流重试不会重复借用；
+    返回无法选上的结果（如时间冲突）时立即放弃，剩余次数归还给 budget。
+
+    Args:
+        course (dict[str, str]): 课程信息字典
+        send (Callable[[dict[str, str]], Outcome]): 发送一次选课请求的函数
+        course_limiter (RateLimiter): 该课程自身的限速器
+        global_limiter (RateLimiter): 所有课程共享的限速器
+        max_attempts (int): 最大尝试次数
+        initial_delay (float): 第一次尝试前等待的时间（秒）
+        group (CourseGroup | None): 课程所在的组，组被满足后不再尝试
+        priority (tuple[int, ...]): 获取全局令牌时的优先级
+        budget (AttemptBudget | None): 所有课程共享的尝试次数，
+            提供时用完自身次数后可以借用其他课程归还的次数
+
+    Returns:
+        Outcome: 最后一次尝试的结果，没有发出请求时为 TRANSIENT
+    """
+    if group is None:
+        group = CourseGroup(course["id"], [course])
+    outcome = Outcome.TRANSIENT
+    attempts = throttled = 0
+    limit = max_attempts
+    try:
+        with group.waiting():
+            if initial_delay > 0:
+                await asyncio.sleep(initial_delay)
+        while attempts < limit or (budget is not None and budget.borrow()):
+            if attempts >= limit:
+                limit += 1
+            with group.waiting():
+                # 等待组内其他课程的请求返回，确认失败后才轮到本课程，
+                # 在此之前不占用限速器的令牌
+                await group.lock.acquire()
+            try:
+                if group.satisfied:
+                    return outcome
+                with group.waiting():
+                    await course_limiter.acquire()
+                    await global_limiter.acquire(priority)
+                # 请求一旦发出就不再取消，以免丢失选课结果
+                outcome = await asyncio.to_thread(send, course)
+                if outcome is Outcome.SUCCESS:
+                    group.satisfy()
+            finally:
+                group.lock.release()
+            if outcome is Outcome.SUCCESS:
+                return outcome
+            if outcome is Outcome.PERMANENT:
+                if budget is not None:
+                    budget.release(limit - attempts - 1)
+                return outcome
+            if outcome is Outcome.THROTTLED and throttled < max_attempts:
+                throttled += 1
+                continue
+            attempts += 1
+    except asyncio.CancelledError:
+        if not group.satisfied:
+            raise
+    return outcome
+
+
+async def hunt(
+    courses: list[dict[str, str]],
+    session: HunterSession,
+    interval: float,
+    global_rate: float,
+    max_attempts: int,
+    send: Callable[..., Outcome] | None = None,
+    initial_delay: float = 0.0,
+    pacer: AdaptivePacer | None = None,
+) -> list[dict[str, str]]:
+    """并发地对所有课程发起选课请求
+
+    每门课程拥有独立的重试调度，同一课程两次尝试之间至少间隔 interval 秒，
+    所有课程的请求总速率不超过 global_rate 次/秒。
+    全局令牌优先分配给优先级高的组，同组内优先分配给靠前的课程；
+    同组课程的请求依次发出，上一个请求返回失败后才发出下一个；
+    某组中任意一门课程选课成功后，组内其他课程尚未发出的尝试会被立即取消。
+    无法选上的课程立即停止尝试，不再占用全局令牌，其剩余的尝试次数
+    留给仍有机会的课程。
+
+    Args:
+        courses (list[dict[str, str]]): 要选择的课程列表
+        session (HunterSession): 共享的 HTTP 会话
+        interval (float): 同一课程两次尝试之间的最小间隔（秒），0 表示不限制
+        global_rate (float): 全局请求速率上限（次/秒），0 表示不限制
+        max_attempts (int): 每门课程的最大尝试次数
+        send (Callable[..., Outcome] | None): 发送一次选课请求的函数，
+            默认使用 tools.add_course，需要接受 on_response 关键字参数
+        initial_delay (float): 每门课程第一次尝试前等待的时间（秒）
+        pacer (AdaptivePacer | None): 自适应限速器，提供时代替 global_rate
+            作为全局限速器，并根据每次响应调整速率
+
+    Returns:
+        list[dict[str, str]]: 未被满足的组中的全部课程
+    """
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(
+        ThreadPoolExecutor(max_workers=max(min(len(courses), session.pool_size), 1))
+    )
+    if send is None:
+        send = partial(add_course, session=session)
+    if pacer is not None:
+        send = partial(send, on_response=pacer.observe)
+        global_limiter: RateLimiter = pacer
+    else:
+        global_limiter = RateLimiter(global_rate, burst=max(int(global_rate), 1))
+    groups = group_courses(courses)
+    budget = AttemptBudget()
+    await asyncio.gather(
+        *(
+            hunt_course(
+                course,
+                send,
+                RateLimiter(1 / interval if interval > 0 else 0),
+                global_limiter,
+                max_attempts,
+                initial_delay,
+                group,
+                (group.priority, index),
+                budget,
+            )
+            for group in groups
+            for index, course in enumerate(group.courses)
+        )
+    )
+    return [
+        course for group in groups if not group.satisfied for course in group.courses
+    ]
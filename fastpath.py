@@ -0,0 +1,396 @@
+import json
+import queue
+import select
+import socket
+import ssl
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING
+from urllib.parse import urlencode, urlparse
+
+from colorama import Fore
+
+import console
+from client import USER_AGENT, HunterSession
+from tools import (
+    JW_BASE_URL,
+    MAX_RETRIES,
+    MaxRetriesExceededError,
+    Outcome,
+    classify_response,
+    describe_outcome,
+    get_add_data,
+    refresh_cookies,
+)
+
+if TYPE_CHECKING:
+    from cassette import Recorder
+    from tracing import Tracer
+
+ADD_COURSE_PATH = "/Xsxk/addGouwuche"
+
+
+class RawResponse:
+    """从原始连接中读取的 HTTP 响应
+
+    Attributes:
+        status (int): 状态码
+        headers (dict[str, str]): 响应头，键为小写
+        body (bytes): 响应体
+        first_byte_at (float): 读到状态行的时刻（time.perf_counter）
+        received_at (float): 读完响应体的时刻（time.perf_counter）
+    """
+
+    def __init__(
+        self,
+        status: int,
+        headers: dict[str, str],
+        body: bytes,
+        first_byte_at: float,
+        received_at: float,
+    ):
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.first_byte_at = first_byte_at
+        self.received_at = received_at
+
+
+class FastConnection:
+    """保持长连接的原始 HTTP/1.1 连接
+
+    直接向 socket 写入预先序列化好的请求字节，并用一个持久的缓冲读取器解析响应，
+    因此可以在同一连接上流水线发送多个请求后按顺序读取响应。
+    """
+
+    def __init__(self, host: str, port: int, use_tls: bool, timeout: float):
+        self.host = host
+        self.port = port
+        self.use_tls = use_tls
+        self.timeout = timeout
+        self.sock: socket.socket | None = None
+        self.reader = None
+        self.connect_time = 0.0
+
+    def connect(self) -> None:
+        """建立连接，关闭 Nagle 算法以减少小请求的发送延迟"""
+        start = time.perf_counter()
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if self.use_tls:
+            context = ssl.create_default_context()
+            sock = context.wrap_socket(sock, server_hostname=self.host)
+        self.sock = sock
+        self.reader = sock.makefile("rb")
+        self.connect_time += time.perf_counter() - start
+
+    def close(self) -> None:
+        if self.reader is not None:
+            self.reader.close()
+        if self.sock is not None:
+            self.sock.close()
+        self.sock = None
+        self.reader = None
+
+    def is_dropped(self) -> bool:
+        """空闲连接是否已被服务器关闭
+
+        空闲连接上不应有待读取的数据，可读说明收到了 FIN 或 RST。
+        """
+        if self.sock is None:
+            return False
+        readable, _, _ = select.select([self.sock], [], [], 0)
+        return bool(readable)
+
+    def send(self, data: bytes) -> None:
+        """写入请求字节，尚未连接或空闲连接已被关闭时先建立连接"""
+        if self.is_dropped():
+            self.close()
+        if self.sock is None:
+            self.connect()
+        assert self.sock is not None
+        self.sock.sendall(data)
+
+    def read_response(self, head: bool = False) -> RawResponse:
+        """读取一个完整的响应，支持 Content-Length 与 chunked 编码
+
+        Args:
+            head (bool): 是否为 HEAD 请求的响应，此时没有响应体
+
+        Raises:
+            ConnectionError: 连接在读取完整响应前被关闭时抛出
+        """
+        assert self.reader is not None
+        status_line = self.reader.readline()
+        first_byte_at = time.perf_counter()
+        if not status_line:
+            raise ConnectionError("连接已被服务器关闭")
+        status = int(status_line.split()[1])
+
+        headers = {}
+        while True:
+            line = self.reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            key, _, value = line.decode("latin-1").partition(":")
+            headers[key.strip().lower()] = value.strip()
+
+        if head:
+            body = b""
+        elif headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int(self.reader.readline().split(b";")[0], 16)
+                if size == 0:
+                    self.reader.readline()
+                    break
+                chunks.append(self.reader.read(size))
+                self.reader.readline()
+            body = b"".join(chunks)
+        else:
+            body = self.reader.read(int(headers.get("content-length", 0)))
+
+        if headers.get("connection", "").lower() == "close":
+            self.close()
+        return RawResponse(status, headers, body, first_byte_at, time.perf_counter())
+
+
+class FastSender:
+    """addGouwuche 的低开销发送通道
+
+    抢课开始前把每门课程的完整请求序列化为字节，之后每次尝试只需把这些字节写入
+    已经建立好的长连接。不经过 requests 的适配器、钩子与 Cookie 处理，
+    也不会使用系统代理。
+    """
+
+    def __init__(self, session: HunterSession, connections: int):
+        url = urlparse(JW_BASE_URL)
+        self.session = session
+        self.host = url.hostname or ""
+        self.use_tls = url.scheme == "https"
+        self.port = url.port or (443 if self.use_tls else 80)
+        self.timeout = session.timeout[1]
+        self._requests: dict[str, bytes] = {}
+        self._refresh_lock = threading.Lock()
+        self._courses: dict[str, dict[str, str]] = {}
+        self.tracer: Tracer | None = None
+        self.recorder: Recorder | None = None
+        self._idle: queue.LifoQueue[FastConnection] = queue.LifoQueue()
+        for _ in range(connections):
+            self._idle.put(
+                FastConnection(self.host, self.port, self.use_tls, self.timeout)
+            )
+
+    def serialize(self, course: dict[str, str]) -> bytes:
+        """把一门课程的选课请求序列化为 HTTP/1.1 请求字节"""
+        body = urlencode(get_add_data(course)).encode("ascii")
+        host = self.host if self.port in (80, 443) else f"{self.host}:{self.port}"
+        head = (
+            f"POST {ADD_COURSE_PATH} HTTP/1.1\r\n"
+            f"Host: {host}\r\n"
+            f"User-Agent: {USER_AGENT}\r\n"
+            f"Cookie: {self.session.cookies_string}\r\n"
+            "Content-Type: application/x-www-form-urlencoded\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            "Connection: keep-alive\r\n"
+            "\r\n"
+        )
+        return head.encode("utf-8") + body
+
+    def prepare(self, courses: list[dict[str, str]]) -> None:
+        """预先序列化所有课程的请求，Cookie 变化后需要重新调用"""
+        for course in courses:
+            self._courses[course["id"]] = course
+            self._requests[course["id"]] = self.serialize(course)
+
+    def warm_up(self) -> None:
+        """建立所有连接并发送一次 HEAD 请求，保持连接活跃"""
+        host = self.host if self.port in (80, 443) else f"{self.host}:{self.port}"
+        ping = f"HEAD / HTTP/1.1\r\nHost: {host}\r\nConnection: keep-alive\r\n\r\n"
+        connections = []
+        while not self._idle.empty():
+            connections.append(self._idle.get())
+        for connection in connections:
+            try:
+                connection.send(ping.encode("ascii"))
+                connection.read_response(head=True)
+            except OSError:
+                connection.close()
+            self._idle.put(connection)
+
+    def exchange(self, requests: list[bytes]) -> list[RawResponse]:
+        """在一个连接上流水线发送若干请求，并按顺序读取响应
+
+        只有请求没能完整写出时才会重新连接并重发一次；请求写出后读取响应失败
+        （包括超时）不会重发，因为服务器可能已经处理了请求，重发会重复提交。
+
+        Args:
+            requests (list[bytes]): 序列化好的请求
+
+        Returns:
+            list[RawResponse]: 与请求一一对应的响应
+        """
+        data = b"".join(requests)
+        connection = self._idle.get()
+        connection.connect_time = 0.0
+        sent_at = time.time()
+        start = time.perf_counter()
+        try:
+            try:
+                connection.send(data)
+            except OSError:
+                # 连接或写入失败，服务器没有收到完整的请求，重新连接后重发一次
+                connection.close()
+                connection.send(data)
+            responses = [connection.read_response() for _ in requests]
+        except OSError:
+            # 失败的连接上可能还有未读完的响应，不能再复用
+            connection.close()
+            raise
+        finally:
+            self._idle.put(connection)
+
+        if self.tracer is not None:
+            for request, response in zip(requests, responses):
+                self.tracer.record_exchange(
+                    JW_BASE_URL + ADD_COURSE_PATH,
+                    request.partition(b"\r\n\r\n")[2],
+                    sent_at,
+                    connection.connect_time,
+                    response.first_byte_at - start,
+                    response.received_at - start,
+                    response.status,
+                    response.headers.get("content-type", ""),
+                    response.body,
+                    "fast" if len(requests) == 1 else "pipeline",
+                )
+        if self.recorder is not None:
+            for request, response in zip(requests, responses):
+                self.recorder.record(
+                    "POST",
+                    JW_BASE_URL + ADD_COURSE_PATH,
+                    request.partition(b"\r\n\r\n")[2],
+                    sent_at,
+                    response.first_byte_at - start,
+                    response.received_at - start,
+                    response.status,
+                    list(response.headers.items()),
+                    response.body,
+                )
+        return responses
+
+    def handle_response(
+        self,
+        course: dict[str, str],
+        response: RawResponse,
+        on_response: Callable[[bool], None] | None = None,
+    ) -> Outcome | None:
+        """解析 addGouwuche 响应
+
+        Args:
+            course (dict[str, str]): 课程信息字典
+            response (RawResponse): 响应
+            on_response (Callable[[bool], None] | None): 与 tools.add_course 相同
+
+        Returns:
+            Outcome | None: 选课结果类别，Cookie 过期返回 None
+        """
+        if response.status != 200:
+            outcome = classify_response(response.status)
+            if on_response is not None:
+                on_response(outcome is Outcome.THROTTLED)
+            console.result(course, f"请求失败，状态码：{response.status}", Fore.RED)
+            return outcome
+        content_type = response.headers.get("content-type", "")
+        if "application/json" in content_type:
+            message = json.loads(response.body)["message"]
+            outcome = classify_response(response.status, message)
+            if on_response is not None:
+                on_response(outcome is Outcome.THROTTLED)
+            text, color = describe_outcome(outcome, message)
+            console.result(course, f"{text}：{course['name']}", color)
+            return outcome
+        if "text/html" in content_type:
+            return None
+        console.result(course, "响应内容不是有效的 JSON 格式", Fore.RED)
+        return Outcome.TRANSIENT
+
+    def refresh_cookies(self, expired_cookies: str) -> None:
+        """重新登录并用新的 Cookie 重新序列化所有请求
+
+        多个请求同时发现 Cookie 过期时只会重新登录一次，见 tools.refresh_cookies。
+
+        Args:
+            expired_cookies (str): 发送失败请求时使用的 Cookie
+        """
+        with self._refresh_lock:
+            if self.session.cookies_string == expired_cookies:
+                console.notice("Cookie 已过期，尝试重新获取...", Fore.YELLOW)
+            refresh_cookies(self.session, expired_cookies)
+            self.prepare(list(self._courses.values()))
+
+    def add_course(
+        self,
+        course: dict[str, str],
+        retry_count: int = 0,
+        on_response: Callable[[bool], None] | None = None,
+    ) -> Outcome:
+        """通过快速通道选课，行为与 tools.add_course 一致
+
+        Raises:
+            MaxRetriesExceededError: 当重试次数超过最大限制时抛出
+        """
+        if course["id"] not in self._requests:
+            self.prepare([course])
+        cookies = self.session.cookies_string
+        try:
+            (response,) = self.exchange([self._requests[course["id"]]])
+        except OSError as e:
+            console.result(course, f"请求异常：{e}", Fore.RED)
+            return Outcome.TRANSIENT
+        status = self.handle_response(course, response, on_response)
+        if status is None:
+            if retry_count >= MAX_RETRIES:
+                raise MaxRetriesExceededError(MAX_RETRIES)
+            self.refresh_cookies(cookies)
+            return self.add_course(course, retry_count + 1, on_response)
+        return status
+
+    def add_courses_pipelined(
+        self, courses: list[dict[str, str]], connections: int
+    ) -> list[Outcome]:
+        """把多门课程的请求分配到若干连接上，以流水线方式同时发出
+
+        Args:
+            courses (list[dict[str, str]]): 课程列表
+            connections (int): 使用的连接数
+
+        Returns:
+            list[Outcome]: 与课程一一对应的选课结果，Cookie 过期的课程会单独重试
+        """
+        self.prepare([c for c in courses if c["id"] not in self._requests])
+        batches = [courses[i::connections] for i in range(connections)]
+        batches = [batch for batch in batches if batch]
+        results: dict[str, Outcome] = {}
+
+        def run(batch: list[dict[str, str]]) -> None:
+            cookies = self.session.cookies_string
+            try:
+                responses = self.exchange([self._requests[c["id"]] for c in batch])
+            except OSError as e:
+                for course in batch:
+                    console.result(course, f"请求异常：{e}", Fore.RED)
+                    results[course["id"]] = Outcome.TRANSIENT
+                return
+            for course, response in zip(batch, responses):
+                status = self.handle_response(course, response)
+                if status is None:
+                    self.refresh_cookies(cookies)
+                    status = self.add_course(course, 1)
+                results[course["id"]] = status
+
+        with ThreadPoolExecutor(max_workers=len(batches) or 1) as executor:
+            list(executor.map(run, batches))
+        return [results[course["id"]] for course in courses]
@@ -0,0 +1,150 @@
+import statistics
+import threading
+import time
+from collections import deque
+from collections.abc import Callable
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import TYPE_CHECKING
+
+from colorama import Fore
+
+import console
+from tools import Outcome
+
+if TYPE_CHECKING:
+    from tracing import Tracer
+
+DEFAULT_HEDGE_PERCENTILE = 95
+DEFAULT_HEDGE_BUDGET = 10
+DEFAULT_HEDGE_DELAY = 0.3
+# 样本数达到该值之前使用固定的对冲延迟
+MIN_HEDGE_SAMPLES = 5
+HEDGE_WINDOW = 100
+
+
+class Hedger:
+    """对迟迟没有响应的选课请求发送对冲请求
+
+    请求发出后超过最近延迟的 percentile 分位数仍未返回时，
+    通过另一个连接或会话再发送一次相同的请求，采用先返回的结果。
+    先返回的结果是失败时会等待另一个请求，避免漏掉它选上的情况。
+    对冲请求不经过限速器，总数不超过 budget。
+
+    Args:
+        send (Callable[..., Outcome]): 发送一次选课请求的函数
+        hedge_send (Callable[..., Outcome]): 发送对冲请求的函数，应使用另一个连接或会话
+        percentile (int): 触发对冲的延迟分位数
+        budget (int): 对冲请求总数上限
+        initial_delay (float): 样本不足时的对冲延迟（秒）
+        workers (int): 同时进行的请求数
+
+    Attributes:
+        tracer (Tracer | None): 提供时记录每次对冲的胜出方
+        hedged (int): 已发送的对冲请求数
+        won (int): 采用了对冲请求结果的次数
+    """
+
+    def __init__(
+        self,
+        send: Callable[..., Outcome],
+        hedge_send: Callable[..., Outcome],
+        percentile: int = DEFAULT_HEDGE_PERCENTILE,
+        budget: int = DEFAULT_HEDGE_BUDGET,
+        initial_delay: float = DEFAULT_HEDGE_DELAY,
+        workers: int = 1,
+    ):
+        self.send = send
+        self.hedge_send = hedge_send
+        self.percentile = percentile
+        self.budget = budget
+        self.initial_delay = initial_delay
+        self.tracer: Tracer | None = None
+        self.hedged = 0
+        self.won = 0
+        self._latencies: deque[float] = deque(maxlen=HEDGE_WINDOW)
+        self._lock = threading.Lock()
+        # 每次尝试最多同时有主请求与对冲请求两个
+        self._executor = ThreadPoolExecutor(max_workers=workers * 2)
+
+    def delay(self) -> float:
+        """返回当前的对冲延迟（秒）"""
+        with self._lock:
+            latencies = list(self._latencies)
+        if len(latencies) < MIN_HEDGE_SAMPLES:
+            return self.initial_delay
+        return statistics.quantiles(latencies, n=100, method="inclusive")[
+            self.percentile - 1
+        ]
+
+    def _timed(self, send: Callable[..., Outcome], *args, **kwargs) -> Outcome:
+        start = time.perf_counter()
+        try:
+            return send(*args, **kwargs)
+        finally:
+            with self._lock:
+                self._latencies.append(time.perf_counter() - start)
+
+    def _take_budget(self) -> bool:
+        with self._lock:
+            if self.hedged >= self.budget:
+                return False
+            self.hedged += 1
+            return True
+
+    def add_course(
+        self,
+        course: dict[str, str],
+        on_response: Callable[[bool], None] | None = None,
+    ) -> Outcome:
+        """发送选课请求，必要时对冲，行为与 tools.add_course 一致
+
+        Raises:
+            MaxRetriesExceededError: 当重试次数超过最大限制时抛出
+        """
+        kwargs = {} if on_response is None else {"on_response": on_response}
+        primary = self._executor.submit(self._timed, self.send, course, **kwargs)
+        delay = self.delay()
+        done, _ = wait([primary], timeout=delay)
+        if done or not self._take_budget():
+            return primary.result()
+
+        hedged_at = time.time()
+        hedge = self._executor.submit(self._timed, self.hedge_send, course, **kwargs)
+        pending: set[Future] = {primary, hedge}
+        winner = None
+        status = Outcome.TRANSIENT
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.result() is Outcome.SUCCESS or winner is None:
+                    winner = future
+                    status = future.result()
+            if status is Outcome.SUCCESS:
+                break
+
+        won = winner is hedge
+        if won:
+            with self._lock:
+                self.won += 1
+        if self.tracer is not None:
+            self.tracer.record(
+                "hedge",
+                course_id=course["id"],
+                time=hedged_at,
+                delay=delay,
+                winner="hedge" if won else "primary",
+                status=status.value,
+            )
+        return status
+
+    def report(self) -> None:
+        """输出对冲请求的使用情况"""
+        if self.hedged:
+            console.notice(
+                f"共发送 {self.hedged}/{self.budget} 个对冲请求，"
+                + f"其中 {self.won} 次采用了对冲请求的结果",
+                Fore.CYAN,
+            )
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
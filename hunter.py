@@ -1,107 +1,906 @@
+import asyncio
+import math
+import multiprocessing
+import os
 import time
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+from multiprocessing.synchronize import Event as EventType
 
 import colorama
 import typer
 from colorama import Fore
+from dotenv import dotenv_values
 from typing_extensions import Annotated
 
+import console
+from auth import DEFAULT_REAUTH_REFRESH, Reauthenticator
+from client import HunterSession, create_session
+from clock import DEFAULT_PROBES, ClockSync, sync_clock
+from engine import (
+    DEFAULT_INITIAL_RATE,
+    DEFAULT_MAX_RATE,
+    DEFAULT_MIN_RATE,
+    DEFAULT_RATE_BACKOFF,
+    DEFAULT_RATE_INCREASE,
+    AdaptivePacer,
+    group_courses,
+    hunt,
+)
+from fastpath import FastSender
+from hedge import (
+    DEFAULT_HEDGE_BUDGET,
+    DEFAULT_HEDGE_DELAY,
+    DEFAULT_HEDGE_PERCENTILE,
+    Hedger,
+)
+from opening import DEFAULT_OPEN_BUDGET, DEFAULT_OPEN_WINDOW, OpeningDetector
+from profiling import CPUProfiler, PhaseTimer, report
+from readiness import (
+    DEFAULT_KEEP_ALIVE_INTERVAL,
+    DEFAULT_READY_TIME,
+    KeepAlive,
+    get_ready,
+)
+from routes import DEFAULT_ROUTES, RoutePool
+from state import DEFAULT_STATE_PATH, StateStore
 from tools import (
     MaxRetriesExceededError,
+    Outcome,
     add_course,
-    get_headers,
+    get_cookies,
+    get_start_timestamp,
     load_config,
     load_courses,
     save_results,
+    validate_time_format,
     wait_until_start,
 )
+from watch import (
+    DEFAULT_WATCH_INTERVAL,
+    DEFAULT_WATCH_MAX_INTERVAL,
+    DEFAULT_WATCH_MIN_INTERVAL,
+    watch_seats,
+)
 
 colorama.init()  # 初始化 colorama
 MAX_UNSUCCESSFUL_COURSE_RETRIES = 2
 
 
 def run_course_hunter(
-    courses: list[dict[str, str]], headers: dict[str, str], wait_time: int
+    courses: list[dict[str, str]],
+    session: HunterSession,
+    wait_time: float,
+    global_rate: float,
+    sender: FastSender | None = None,
+    pipeline: bool = False,
+    pacer: AdaptivePacer | None = None,
+    send: Callable[..., Outcome] | None = None,
+    store: StateStore | None = None,
 ) -> list[dict[str, str]]:
     """执行选课流程
 
+    所有课程并发抢课，每门课程独立重试，最多尝试
+    MAX_UNSUCCESSFUL_COURSE_RETRIES + 1 次。
+    同组的备选课程中任意一门选上后，其余课程不再尝试；
+    返回时间冲突等无法选上结果的课程立即停止，剩余次数留给其他课程，
+    但仍计入未选上的课程。
+
     Args:
         courses (list[dict[str, str]]): 要选择的课程列表
-        headers (dict[str, str]): HTTP 请求头
-        wait_time (int): 每次尝试选课之间的等待时间（秒）
+        session (HunterSession): 共享的 HTTP 会话
+        wait_time (float): 同一课程两次尝试之间的等待时间（秒）
+        global_rate (float): 所有课程合计每秒最多发送的请求数，0 表示不限制
+        sender (FastSender | None): 快速发送通道，为 None 时使用 requests
+        pipeline (bool): 是否以流水线方式发出第一轮请求，仅在使用快速通道时有效
+        pacer (AdaptivePacer | None): 自适应限速器，提供时忽略 global_rate
+        send (Callable[..., Outcome] | None): 发送一次选课请求的函数，
+            为 None 时通过 session 发送
+        store (StateStore | None): 提供时记录流水线发出的第一轮请求及其结果
 
     Returns:
-        list[dict[str, str]]: 选课失败的课程列表
+        list[dict[str, str]]: 未被满足的组中的全部课程
     """
-    unsuccessful_courses: list[dict[str, str]] = []
-    for course in courses:
-        status = add_course(course, headers)
-        if not status:
-            unsuccessful_courses.append(course)
-        for i in range(wait_time, 0, -1):
-            print(f"\r{Fore.CYAN}等待 {i} 秒后继续...{Fore.RESET}", end="")
-            time.sleep(1)
-        print("\r" + " " * 50 + "\r", end="")  # 清除倒计时行
-    return unsuccessful_courses
+    max_attempts = MAX_UNSUCCESSFUL_COURSE_RETRIES + 1
+    initial_delay = 0.0
+    failed: set[str] = set()
+    if sender is not None and pipeline:
+        # 第一轮只发出每组的首选课程，避免同时选上多门备选课程
+        groups = group_courses(courses)
+        primaries = [group.courses[0] for group in groups]
+        connections = max(min(len(primaries), session.pool_size), 1)
+        attempts = [store.begin(course) for course in primaries] if store else []
+        results = sender.add_courses_pipelined(primaries, connections)
+        for attempt, course, status in zip(attempts, primaries, results):
+            store.finish(attempt, course, status is Outcome.SUCCESS)
+        courses = [
+            course
+            for group, status in zip(groups, results)
+            if status is not Outcome.SUCCESS
+            for course in group.courses
+        ]
+        # 无法选上的首选课程不再尝试，只继续抢同组的备选课程
+        failed = {
+            course["id"]
+            for course, status in zip(primaries, results)
+            if status is Outcome.PERMANENT
+        }
+        max_attempts -= 1
+        initial_delay = wait_time if pacer is None else 1 / pacer.rate
+        if len(failed) == len(courses) or max_attempts == 0:
+            return courses
+
+    unsuccessful = asyncio.run(
+        hunt(
+            [course for course in courses if course["id"] not in failed],
+            session,
+            interval=wait_time,
+            global_rate=global_rate,
+            max_attempts=max_attempts,
+            send=send,
+            initial_delay=initial_delay,
+            pacer=pacer,
+        )
+    )
+    if not failed:
+        return unsuccessful
+    remaining = {course["id"] for course in unsuccessful} | failed
+    return [
+        course
+        for group in group_courses(courses)
+        if all(c["id"] in remaining for c in group.courses)
+        for course in group.courses
+    ]
+
+
+@dataclass
+class HuntResult:
+    """一个账号的抢课结果
+
+    Attributes:
+        courses (list[dict[str, str]]): 要抢的全部课程
+        unsuccessful (list[dict[str, str]]): 选课失败的课程
+        error (str | None): 中止抢课的错误信息
+    """
+
+    courses: list[dict[str, str]]
+    unsuccessful: list[dict[str, str]]
+    error: str | None = None
+
+
+@dataclass
+class StartTrigger:
+    """多账号模式下由主进程发出的信号
+
+    Attributes:
+        ready: 到达准备时间，各账号开始检查 Cookie 并预热连接
+        start: 到达开始时间，各账号立即开始抢课
+    """
+
+    ready: EventType
+    start: EventType
+
+
+def report_clock(clock: ClockSync) -> ClockSync:
+    """输出对时结果"""
+    if math.isfinite(clock.error):
+        print(
+            Fore.CYAN
+            + f"服务器时钟偏差: {clock.offset * 1000:+.1f} ms "
+            + f"(±{clock.error * 1000:.1f} ms)，"
+            + f"往返时间: {clock.rtt * 1000:.1f} ms"
+            + Fore.RESET
+        )
+    else:
+        print(Fore.YELLOW + "未能与服务器对时，使用本地时间" + Fore.RESET)
+    return clock
+
+
+def get_unsuccessful(
+    courses: list[dict[str, str]], store: StateStore | None
+) -> list[dict[str, str]]:
+    """抢课中途停止时，返回仍未选上的课程
+
+    没有状态数据库时无法得知哪些课程已经选上，视为全部未选上。
+    请求已发出但尚未返回的课程结果未知，同样视为未选上，下次运行时会重新尝试。
+    """
+    if store is None:
+        return courses
+    in_flight = store.in_flight()
+    if in_flight:
+        print(
+            Fore.YELLOW
+            + f"{len(in_flight)} 门课程的请求尚未返回，结果未知，下次运行时会重新尝试"
+            + Fore.RESET
+        )
+    return store.unsuccessful(courses)
+
+
+def hunt_account(
+    is_immediate_start: bool = False,
+    adaptive: bool = True,
+    initial_rate: float = DEFAULT_INITIAL_RATE,
+    min_rate: float = DEFAULT_MIN_RATE,
+    max_rate: float = DEFAULT_MAX_RATE,
+    rate_increase: float = DEFAULT_RATE_INCREASE,
+    rate_backoff: float = DEFAULT_RATE_BACKOFF,
+    wait_time: float = -1,
+    global_rate: float = -1,
+    lead_time: float = -1,
+    fast: bool = False,
+    pipeline: bool = False,
+    trace: str | None = None,
+    watch: bool = False,
+    watch_interval: float = DEFAULT_WATCH_INTERVAL,
+    watch_min_interval: float = DEFAULT_WATCH_MIN_INTERVAL,
+    watch_max_interval: float = DEFAULT_WATCH_MAX_INTERVAL,
+    watch_hours: float = 0.0,
+    profile: bool = False,
+    routes: int = DEFAULT_ROUTES,
+    quiet: bool = False,
+    fps: float = console.DEFAULT_FPS,
+    hedge: bool = False,
+    hedge_percentile: int = DEFAULT_HEDGE_PERCENTILE,
+    hedge_budget: int = DEFAULT_HEDGE_BUDGET,
+    hedge_delay: float = DEFAULT_HEDGE_DELAY,
+    record: str | None = None,
+    state: str = DEFAULT_STATE_PATH,
+    detect_open: bool = False,
+    open_budget: int = DEFAULT_OPEN_BUDGET,
+    open_window: float = DEFAULT_OPEN_WINDOW,
+    trigger: StartTrigger | None = None,
+) -> HuntResult:
+    """使用当前目录下的 .env 与 courses.json 为一个账号抢课
+
+    参数含义与 main 的同名选项相同，值为 -1 的选项从配置文件读取。
+
+    Args:
+        trigger (StartTrigger | None): 多账号模式下主进程的开始信号，
+            提供时忽略本账号的 START_TIME，由主进程决定准备与开始的时刻
+
+    Returns:
+        HuntResult: 抢课结果
+    """
+    config = None
+    session = None
+    keep_alive = None
+    authenticator = None
+    sender = None
+    tracer = None
+    pacer = None
+    pool = None
+    hedger = None
+    recorder = None
+    store = None
+    unsuccessful_courses = []
+    courses = None
+    error = None
+    # 只有正常结束时才清空状态数据库，其余情况下按数据库中的记录保存未选上的课程
+    completed = False
+    timer = PhaseTimer()
+    console.set_quiet(quiet)
+    profiler = CPUProfiler() if profile else None
+    if profiler is not None:
+        profiler.start()
+
+    try:
+        if record:
+            from cassette import Recorder
+
+            recorder = Recorder(record)
+            recorder.install()
+        with timer.phase("加载配置"):
+            courses = load_courses()
+            config = load_config(login=False)
+        if state:
+            store = StateStore(state)
+            # 数据库中的 Cookie 比 .env 中的更新
+            config["COOKIES"] = store.cookies() or config.get("COOKIES", "")
+        if not config.get("COOKIES"):
+            with timer.phase("登录"):
+                config["COOKIES"] = get_cookies()
+        session = create_session(config)
+        pending = courses
+        if store is not None:
+            store.save_cookies(session.cookies_string)
+            pending = store.resume(courses)
+            if len(pending) < len(courses):
+                print(
+                    Fore.YELLOW
+                    + "上次运行没有正常结束，"
+                    + f"已跳过其中选上的 {len(courses) - len(pending)} 门课程"
+                    + Fore.RESET
+                )
+            if not pending:
+                print(Fore.GREEN + "所有课程都已选上" + Fore.RESET)
+                completed = True
+                return HuntResult(courses, [])
+        username, password = config.get("USERNAME"), config.get("PASSWORD")
+        if username and password:
+            authenticator = Reauthenticator(
+                username,
+                password,
+                float(config.get("REAUTH_REFRESH", DEFAULT_REAUTH_REFRESH)),
+            )
+            authenticator.start()
+            session.relogin = authenticator.login
+        session.relogin = timer.wrap("登录", session.relogin or get_cookies)
+        if trace:
+            from tracing import Tracer
+
+            tracer = Tracer(trace)
+            tracer.install(session)
+        if wait_time == -1:
+            wait_time = float(config.get("WAIT_TIME", 3))
+        if global_rate == -1:
+            global_rate = float(config.get("GLOBAL_RATE", 0))
+        if lead_time == -1:
+            lead_time = float(config.get("LEAD_TIME", 0))
+        if adaptive:
+            pacer = AdaptivePacer(
+                initial_rate,
+                min_rate,
+                max_rate,
+                rate_increase,
+                rate_backoff,
+                # 第一轮先为每组放行一个请求
+                burst=len(group_courses(pending)),
+            )
+            pacer.tracer = tracer
+            wait_time = 0
+
+        connections = max(min(len(pending), session.pool_size), 1)
+        if fast or pipeline:
+            # 对冲请求需要额外的连接
+            sender = FastSender(session, connections * 2 if hedge else connections)
+            sender.tracer = tracer
+            sender.recorder = recorder
+            sender.prepare(pending)
+        if routes > 1 and sender is not None:
+            print(Fore.YELLOW + "快速通道只使用一个会话，忽略 --routes" + Fore.RESET)
+        elif routes > 1:
+            pool = RoutePool(session, routes)
+
+        send: Callable[..., Outcome]
+        if sender is not None:
+            send = hedge_send = sender.add_course
+        elif pool is not None:
+            send = pool.add_course
+            hedge_send = partial(pool.add_course, alternate=True)
+        else:
+            send = hedge_send = partial(add_course, session=session)
+        if hedge:
+            hedger = Hedger(
+                send,
+                hedge_send,
+                hedge_percentile,
+                hedge_budget,
+                hedge_delay,
+                connections,
+            )
+            hedger.tracer = tracer
+            send = hedger.add_course
+        if store is not None:
+            send = store.track(send, lambda: session.cookies_string)
+
+        keep_alive = KeepAlive(
+            session,
+            connections,
+            float(config.get("KEEP_ALIVE_INTERVAL", DEFAULT_KEEP_ALIVE_INTERVAL)),
+            sender.warm_up
+            if sender is not None
+            else pool.probe
+            if pool is not None
+            else None,
+        )
+
+        def prepare_routes() -> None:
+            # 尽量晚地登录，避免新会话的 Cookie 在开始前过期
+            pool.fill()
+            pool.probe()
+            if tracer is not None:
+                for route in pool.routes[1:]:
+                    tracer.install(route.session)
+
+        def wait_for_opening(expected_at: float | None) -> None:
+            nonlocal pending
+            probe_course = group_courses(pending)[0].courses[0]
+            detector = OpeningDetector(session, probe_course, open_budget)
+            opened = detector.wait(expected_at)
+            if tracer is not None:
+                tracer.record(
+                    "open",
+                    time=detector.opened_at or time.time(),
+                    expected_at=expected_at,
+                    probes=detector.probes,
+                    opened=opened,
+                )
+            if not detector.selected:
+                return
+            # 检测到开放的那次探测已经选上了该课程，同组课程不必再抢
+            console.result(probe_course, "选课成功", Fore.GREEN)
+            if store is not None:
+                store.finish(store.begin(probe_course), probe_course, True)
+            group = next(g for g in group_courses(pending) if probe_course in g.courses)
+            pending = [course for course in pending if course not in group.courses]
+            if sender is not None:
+                sender.prepare(pending)
+
+        def on_ready() -> None:
+            get_ready(session, connections)
+            if sender is not None:
+                # 准备阶段可能更新了 Cookie，需要重新序列化请求
+                sender.prepare(pending)
+                sender.warm_up()
+            if pool is not None:
+                prepare_routes()
+            keep_alive.start()
+
+        with timer.phase("等待开始"):
+            start_time = config.get("START_TIME")
+            if trigger is not None:
+                # 由主进程统一对时并在开始时刻发出信号
+                # 未设置 START_TIME 时两个信号同时到达，同样需要先检查 Cookie
+                trigger.ready.wait()
+                on_ready()
+                trigger.start.wait()
+                keep_alive.stop()
+            elif start_time and not is_immediate_start:
+                print(Fore.CYAN + f"计划开始时间: {start_time}" + Fore.RESET)
+                probes = int(config.get("CLOCK_SYNC_PROBES", DEFAULT_PROBES))
+                clock = report_clock(sync_clock(session, probes))
+                lead = clock.rtt / 2 + lead_time / 1000
+                wait_until_start(
+                    start_time,
+                    clock_offset=clock.offset,
+                    # 检测开放时提前 open_window 秒开始探测
+                    lead_time=lead + open_window if detect_open else lead,
+                    on_ready=on_ready,
+                    ready_time=float(config.get("READY_TIME", DEFAULT_READY_TIME)),
+                    message="开始检测选课是否开放..." if detect_open else "开始抢课！",
+                )
+                keep_alive.stop()
+                if detect_open:
+                    expected_at = get_start_timestamp(start_time) - clock.offset - lead
+                    wait_for_opening(expected_at)
+            elif detect_open:
+                print(Fore.CYAN + "开始检测选课是否开放..." + Fore.RESET)
+                if pool is not None:
+                    prepare_routes()
+                wait_for_opening(None)
+            else:
+                print(Fore.GREEN + "直接开始抢课" + Fore.RESET)
+                if pool is not None:
+                    prepare_routes()
+
+        if not pending:
+            completed = True
+            return HuntResult(courses, [])
+        if tracer is not None:
+            tracer.record("start", time=time.time())
+
+        # 多账号模式下各进程共用一个终端，只能逐行输出
+        with timer.phase("抢课"), console.live(pending, fps if trigger is None else 0):
+            unsuccessful_courses = run_course_hunter(
+                pending,
+                session,
+                wait_time,
+                global_rate,
+                sender,
+                pipeline,
+                pacer,
+                send,
+                store,
+            )
+        if watch and unsuccessful_courses:
+            with timer.phase("监视余量"):
+                unsuccessful_courses = watch_seats(
+                    unsuccessful_courses,
+                    session,
+                    send,
+                    watch_interval,
+                    watch_min_interval,
+                    watch_max_interval,
+                    watch_hours * 3600,
+                    sender,
+                )
+        completed = True
+
+    except (FileNotFoundError, ValueError) as e:
+        error = str(e)
+        print(Fore.RED + f"错误: {error}" + Fore.RESET)
+    except MaxRetriesExceededError:
+        error = "重复获取 Cookie 次数超过最大限制"
+        print(Fore.RED + error + Fore.RESET)
+    except KeyboardInterrupt:
+        print(Fore.YELLOW + "\n正在退出..." + Fore.RESET)
+    finally:
+        if not completed and courses:
+            # 包括未捕获的异常，此时仍会保存结果，但不能当作全部选上
+            unsuccessful_courses = get_unsuccessful(courses, store)
+        if keep_alive is not None:
+            keep_alive.stop()
+        if hedger is not None:
+            hedger.report()
+            hedger.close()
+        if authenticator is not None:
+            authenticator.stop()
+        if tracer is not None:
+            tracer.close()
+        if pool is not None:
+            print(Fore.CYAN + "各后端线路的延迟" + Fore.RESET)
+            pool.report()
+        if config and session:
+            save_results(config, session, unsuccessful_courses)
+            if store is not None and completed:
+                store.complete()
+        if store is not None:
+            store.close()
+        if recorder is not None:
+            recorder.close()
+        if profiler is not None:
+            report(timer, profiler.stop(), "hunter")
+    return HuntResult(courses or [], unsuccessful_courses, error)
 
 
 def main(
     is_immediate_start: Annotated[
         bool, typer.Option("--now", "-n", help="跳过等待开始时间，立即开始抢课")
     ] = False,
+    adaptive: Annotated[
+        bool,
+        typer.Option(
+            "--adaptive/--fixed",
+            help="根据限流响应自适应调整请求速率，--fixed 时使用 WAIT_TIME 与 GLOBAL_RATE",
+        ),
+    ] = True,
+    initial_rate: Annotated[
+        float, typer.Option(help="自适应限速的初始全局速率（次/秒）")
+    ] = DEFAULT_INITIAL_RATE,
+    min_rate: Annotated[
+        float, typer.Option(help="自适应限速的最低全局速率（次/秒）")
+    ] = DEFAULT_MIN_RATE,
+    max_rate: Annotated[
+        float, typer.Option(help="自适应限速的最高全局速率（次/秒）")
+    ] = DEFAULT_MAX_RATE,
+    rate_increase: Annotated[
+        float, typer.Option(help="响应正常时每秒增加的速率（次/秒）")
+    ] = DEFAULT_RATE_INCREASE,
+    rate_backoff: Annotated[
+        float, typer.Option(help="被限流时速率乘以的系数")
+    ] = DEFAULT_RATE_BACKOFF,
     wait_time: Annotated[
-        int,
+        float,
+        typer.Option(
+            help="--fixed 时同一课程两次抢课的间隔时间（秒），优先级高于配置文件",
+            show_default=False,
+        ),
+    ] = -1,
+    global_rate: Annotated[
+        float,
         typer.Option(
-            help="课程抢课间隔时间（秒），优先级高于配置文件", show_default=False
+            help="--fixed 时所有课程合计每秒最多发送的请求数，0 表示不限制，"
+            "优先级高于配置文件",
+            show_default=False,
         ),
     ] = -1,
+    lead_time: Annotated[
+        float,
+        typer.Option(
+            help="提前发送第一个请求的时间（毫秒），优先级高于配置文件",
+            show_default=False,
+        ),
+    ] = -1,
+    fast: Annotated[
+        bool,
+        typer.Option("--fast", help="使用预先序列化请求、直接写入长连接的快速发送通道"),
+    ] = False,
+    pipeline: Annotated[
+        bool,
+        typer.Option(
+            "--pipeline", help="快速通道下以 HTTP/1.1 流水线方式同时发出第一轮请求"
+        ),
+    ] = False,
+    trace: Annotated[
+        str | None,
+        typer.Option(
+            "--trace",
+            help="把每次 HTTP 交互记录到指定的 JSONL 文件，可用 tracing.py 汇总",
+            show_default=False,
+        ),
+    ] = None,
+    watch: Annotated[
+        bool,
+        typer.Option(
+            "--watch", "-w", help="抢课结束后持续监视未选上课程的余量，出现空位立即选课"
+        ),
+    ] = False,
+    watch_interval: Annotated[
+        float, typer.Option(help="监视余量的初始查询间隔（秒）")
+    ] = DEFAULT_WATCH_INTERVAL,
+    watch_min_interval: Annotated[
+        float, typer.Option(help="监视余量的最短查询间隔（秒）")
+    ] = DEFAULT_WATCH_MIN_INTERVAL,
+    watch_max_interval: Annotated[
+        float, typer.Option(help="监视余量的最长查询间隔（秒）")
+    ] = DEFAULT_WATCH_MAX_INTERVAL,
+    watch_hours: Annotated[
+        float, typer.Option(help="最长监视时间（小时），0 表示一直监视直到全部选上")
+    ] = 0.0,
+    profile: Annotated[
+        bool,
+        typer.Option(
+            "--profile", help="结束后输出导入耗时、各阶段耗时与 CPU 热点，用于性能分析"
+        ),
+    ] = False,
+    routes: Annotated[
+        int,
+        typer.Option(
+            help="登录多次以获得分配到不同后端服务器的会话，"
+            "每次请求通过当前最快的线路发送，1 表示不启用；不能与 --fast 同时使用"
+        ),
+    ] = DEFAULT_ROUTES,
+    quiet: Annotated[
+        bool,
+        typer.Option("--quiet", "-q", help="不输出抢课过程中的任何信息，用于基准测试"),
+    ] = False,
+    fps: Annotated[
+        float,
+        typer.Option(help="抢课状态表每秒的重绘次数，0 表示改为逐行输出"),
+    ] = console.DEFAULT_FPS,
+    hedge: Annotated[
+        bool,
+        typer.Option(
+            "--hedge",
+            help="请求迟迟没有响应时通过另一个连接或线路再发送一次，采用先返回的结果",
+        ),
+    ] = False,
+    hedge_percentile: Annotated[
+        int,
+        typer.Option(
+            min=1, max=99, help="超过最近选课请求延迟的该分位数仍未响应时发送对冲请求"
+        ),
+    ] = DEFAULT_HEDGE_PERCENTILE,
+    hedge_budget: Annotated[
+        int, typer.Option(help="对冲请求总数上限")
+    ] = DEFAULT_HEDGE_BUDGET,
+    hedge_delay: Annotated[
+        float, typer.Option(help="延迟样本不足时发送对冲请求前的等待时间（秒）")
+    ] = DEFAULT_HEDGE_DELAY,
+    record: Annotated[
+        str | None,
+        typer.Option(
+            "--record",
+            help="把所有 HTTP 交互及其耗时录制到指定的磁带文件，可用 cassette.py 回放",
+            show_default=False,
+        ),
+    ] = None,
+    state: Annotated[
+        str,
+        typer.Option(
+            help="实时保存抢课状态的 SQLite 数据库，程序意外退出后再次运行时"
+            "跳过已选上的课程，为空时不保存"
+        ),
+    ] = DEFAULT_STATE_PATH,
+    detect_open: Annotated[
+        bool,
+        typer.Option(
+            "--detect-open",
+            help="不完全依赖 START_TIME，从开始时间前 --open-window 秒起用第一门课程"
+            "反复探测，检测到选课开放后立即开始；没有 START_TIME 时按固定间隔探测",
+        ),
+    ] = False,
+    open_budget: Annotated[
+        int, typer.Option(help="检测开放时最多发送的探测请求数")
+    ] = DEFAULT_OPEN_BUDGET,
+    open_window: Annotated[
+        float, typer.Option(help="在开始时间前多少秒开始探测（秒）")
+    ] = DEFAULT_OPEN_WINDOW,
+    profiles: Annotated[
+        str | None,
+        typer.Option(
+            "--profiles",
+            help="账号目录，每个子目录包含一个账号的 .env 与 courses.json，"
+            "各账号在独立进程中同时抢课",
+            show_default=False,
+        ),
+    ] = None,
 ) -> None:
     """选课抢课工具：自动帮助您在选课系统中抢课
 
     根据配置文件设置运行课程抢课流程。程序将加载您的课程列表，
-    并在指定时间（如有设置）开始尝试选课。对于选课失败的课程，
-    将自动重试直到达到最大重试次数。
+    并在指定时间（如有设置）开始同时对所有课程尝试选课。
+    每门课程选课失败后会单独重试，直到达到最大重试次数，
+    指定 --watch 时之后会持续监视余量，出现空位立即选课。
+    默认从较高的请求速率开始，被服务器限流时成倍降速，响应正常时逐步提速。
+    指定 --profiles 时为目录下的每个账号启动一个进程，并在同一时刻开始。
     """
-    config = None
-    headers = None
-    unsuccessful_courses = []
-    courses = None
-    retry_count = 0
+    options = dict(
+        is_immediate_start=is_immediate_start,
+        adaptive=adaptive,
+        initial_rate=initial_rate,
+        min_rate=min_rate,
+        max_rate=max_rate,
+        rate_increase=rate_increase,
+        rate_backoff=rate_backoff,
+        wait_time=wait_time,
+        global_rate=global_rate,
+        lead_time=lead_time,
+        fast=fast,
+        pipeline=pipeline,
+        trace=trace,
+        watch=watch,
+        watch_interval=watch_interval,
+        watch_min_interval=watch_min_interval,
+        watch_max_interval=watch_max_interval,
+        watch_hours=watch_hours,
+        profile=profile,
+        routes=routes,
+        quiet=quiet,
+        fps=fps,
+        hedge=hedge,
+        hedge_percentile=hedge_percentile,
+        hedge_budget=hedge_budget,
+        hedge_delay=hedge_delay,
+        record=record,
+        state=state,
+        detect_open=detect_open,
+        open_budget=open_budget,
+        open_window=open_window,
+    )
+    if profiles is not None:
+        if detect_open:
+            print(
+                Fore.YELLOW
+                + "多账号模式由主进程统一开始，忽略 --detect-open"
+                + Fore.RESET
+            )
+        hunt_profiles(profiles, options)
+    else:
+        hunt_account(**options)
 
+
+_trigger: StartTrigger | None = None
+
+
+def _init_worker(ready: EventType, start: EventType) -> None:
+    global _trigger
+    _trigger = StartTrigger(ready, start)
+
+
+def run_profile(directory: str, options: dict) -> HuntResult:
+    """在工作进程中切换到账号目录并抢课"""
+    os.chdir(directory)
     try:
-        courses = load_courses()
-        config = load_config()
-        headers = get_headers(config["COOKIES"])
-        if wait_time == -1:
-            wait_time = int(config.get("WAIT_TIME", 3))
+        return hunt_account(**options, trigger=_trigger)
+    except SystemExit:
+        # 缺少用户名或密码时 load_credentials 会直接退出
+        return HuntResult([], [], "无法登录，请检查 .env 中的用户名和密码")
 
-        start_time = config.get("START_TIME")
-        if start_time and not is_immediate_start:
-            print(Fore.CYAN + f"计划开始时间: {start_time}" + Fore.RESET)
-            wait_until_start(start_time)
-        else:
-            print(Fore.GREEN + "直接开始抢课" + Fore.RESET)
 
-        while retry_count <= MAX_UNSUCCESSFUL_COURSE_RETRIES:
-            unsuccessful_courses = run_course_hunter(courses, headers, wait_time)
+def find_profiles(directory: str) -> list[str]:
+    """返回账号目录下所有包含 courses.json 的子目录
+
+    Raises:
+        FileNotFoundError: 当目录不存在时抛出
+        ValueError: 当目录下没有任何账号时抛出
+    """
+    if not os.path.isdir(directory):
+        raise FileNotFoundError(f"找不到账号目录 {directory}")
+    paths = sorted(
+        os.path.abspath(entry.path)
+        for entry in os.scandir(directory)
+        if entry.is_dir() and os.path.isfile(os.path.join(entry.path, "courses.json"))
+    )
+    if not paths:
+        raise ValueError(f"{directory} 下没有包含 courses.json 的账号目录")
+    return paths
+
+
+def get_shared_config(directory: str, paths: list[str]) -> dict[str, str]:
+    """读取所有账号共用的开始时间等配置
+
+    优先使用账号目录下的 .env，其中没有 START_TIME 时使用各账号中最早的 START_TIME。
+    """
+    config = dict(dotenv_values(os.path.join(directory, ".env")))
+    if not config.get("START_TIME"):
+        start_times = [
+            dotenv_values(os.path.join(path, ".env")).get("START_TIME")
+            for path in paths
+        ]
+        start_times = [t for t in start_times if t]
+        if len(set(start_times)) > 1:
+            print(
+                Fore.YELLOW + "各账号的 START_TIME 不一致，使用最早的时间" + Fore.RESET
+            )
+        if start_times:
+            config["START_TIME"] = min(start_times)
+    start_time = config.get("START_TIME")
+    if start_time and not validate_time_format(start_time):
+        raise ValueError("时间格式不正确，请检查 START_TIME 的值（格式：HH:MM:SS）")
+    return {k: v for k, v in config.items() if v is not None}
 
-            if not unsuccessful_courses:
-                return
 
-            courses = unsuccessful_courses
-            retry_count += 1
+def hunt_profiles(directory: str, options: dict) -> None:
+    """为账号目录下的每个账号启动一个进程，统一对时后同时开始抢课
 
+    各账号的登录、准备和抢课都在各自的进程中进行，
+    主进程只负责对时和发出准备与开始信号，不等待任何账号，
+    因此单个账号的登录或网络卡顿不会拖慢其他账号。
+
+    Args:
+        directory (str): 账号目录
+        options (dict): 传给 hunt_account 的选项
+    """
+    try:
+        paths = find_profiles(directory)
+        config = get_shared_config(directory, paths)
     except (FileNotFoundError, ValueError) as e:
         print(Fore.RED + f"错误: {str(e)}" + Fore.RESET)
         return
-    except MaxRetriesExceededError:
-        print(Fore.RED + "重复获取 Cookie 次数超过最大限制" + Fore.RESET)
+    print(Fore.CYAN + f"共 {len(paths)} 个账号" + Fore.RESET)
+
+    context = multiprocessing.get_context("spawn")
+    ready, start = context.Event(), context.Event()
+    executor = ProcessPoolExecutor(
+        max_workers=len(paths),
+        mp_context=context,
+        initializer=_init_worker,
+        initargs=(ready, start),
+    )
+    futures = [executor.submit(run_profile, path, options) for path in paths]
+    try:
+        start_time = config.get("START_TIME")
+        if start_time and not options["is_immediate_start"]:
+            print(Fore.CYAN + f"计划开始时间: {start_time}" + Fore.RESET)
+            session = create_session({**config, "COOKIES": ""})
+            probes = int(config.get("CLOCK_SYNC_PROBES", DEFAULT_PROBES))
+            clock = report_clock(sync_clock(session, probes))
+            lead_time = options["lead_time"]
+            if lead_time == -1:
+                lead_time = float(config.get("LEAD_TIME", 0))
+            wait_until_start(
+                start_time,
+                clock_offset=clock.offset,
+                lead_time=clock.rtt / 2 + lead_time / 1000,
+                on_ready=ready.set,
+                ready_time=float(config.get("READY_TIME", DEFAULT_READY_TIME)),
+            )
+        else:
+            print(Fore.GREEN + "直接开始抢课" + Fore.RESET)
     except KeyboardInterrupt:
-        print(Fore.YELLOW + "\n正在退出..." + Fore.RESET)
-        if courses:
-            unsuccessful_courses = courses
+        print(Fore.YELLOW + "\n正在等待各账号保存结果..." + Fore.RESET)
     finally:
-        if config and headers:
-            save_results(config, headers, unsuccessful_courses)
+        start.set()
+        ready.set()
+        executor.shutdown()
+
+    results = []
+    for future in futures:
+        try:
+            results.append(future.result())
+        except Exception as e:
+            results.append(HuntResult([], [], str(e)))
+    report_profiles(paths, results)
+
+
+def report_profiles(paths: list[str], results: list[HuntResult]) -> None:
+    """输出所有账号的汇总结果"""
+    print(Fore.CYAN + "\n各账号抢课结果" + Fore.RESET)
+    for path, result in zip(paths, results):
+        name = os.path.basename(path)
+        succeeded = len(result.courses) - len(result.unsuccessful)
+        if result.error:
+            print(Fore.RED + f"{name}: {result.error}" + Fore.RESET)
+        else:
+            color = Fore.GREEN if not result.unsuccessful else Fore.YELLOW
+            print(
+                color + f"{name}: 成功 {succeeded}/{len(result.courses)}" + Fore.RESET
+            )
+        for course in result.unsuccessful:
+            print(Fore.RED + f"  未选上：{course['name']}" + Fore.RESET)
 
 
 if __name__ == "__main__":
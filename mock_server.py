@@ -0,0 +1,484 @@
+import json
+import random
+import secrets
+import threading
+import time
+from base64 import b64decode
+from dataclasses import dataclass, field
+from http.cookies import SimpleCookie
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlparse
+
+import typer
+from Crypto.Cipher import AES
+from Crypto.Util.Padding import unpad
+from typing_extensions import Annotated
+
+ACADEMIC_YEAR = "2025-2026"
+TERM = "1"
+CATEGORIES = [("ty", "体育"), ("ts", "通识选修"), ("yy", "英语")]
+TEACHERS = ["张三", "李四", "王五", "赵六"]
+WEEKDAYS = ["一", "二", "三", "四", "五"]
+LOGIN_PAGE = """<html><body><div id="pwdLoginDiv"><form>
+<input id="_eventId" value="submit"><input id="cllt" value="userNameLogin">
+<input id="dllt" value="generalLogin"><input id="lt" value="">
+<input id="pwdEncryptSalt" value="{salt}"><input id="execution" value="{execution}">
+</form></div></body></html>"""
+EXPIRED_PAGE = "<html><body>请重新登录</body></html>"
+
+
+class LatencyModel:
+    """模拟服务器处理时间的分布
+
+    规格字符串格式：
+    - "const:0.05"：固定 50 毫秒
+    - "uniform:0.01,0.1"：10 到 100 毫秒均匀分布
+    - "lognormal:-3,0.5"：对数正态分布，参数为 mu 和 sigma
+    """
+
+    def __init__(self, spec: str = "const:0"):
+        kind, _, params = spec.partition(":")
+        values = [float(v) for v in params.split(",") if v]
+        samplers = {
+            "const": lambda: values[0],
+            "uniform": lambda: random.uniform(values[0], values[1]),
+            "lognormal": lambda: random.lognormvariate(values[0], values[1]),
+        }
+        if kind not in samplers:
+            raise ValueError(f"未知的延迟分布：{spec}")
+        self.spec = spec
+        self._sample = samplers[kind]
+
+    def sample(self) -> float:
+        """采样一次延迟（秒）"""
+        return max(self._sample(), 0.0)
+
+
+@dataclass
+class MockConfig:
+    """模拟服务器配置
+
+    Attributes:
+        username (str): 允许登录的用户名
+        password (str): 允许登录的密码
+        courses_per_category (int): 每个类别下的课程数
+        capacity (int): 每门课程的容量
+        competitor_rate (float): 开放后其他学生每秒抢走的名额数（每门课程）
+        open_at (float): 选课开放时间（time.time），开放前 addGouwuche 会被拒绝
+        cookie_ttl (float): 教务系统 Cookie 有效期（秒），0 表示永不过期
+        throttle_interval (float): 同一会话两次 addGouwuche 的最小间隔（秒）
+        release_interval (float): 开放后每隔多少秒每门课程有一个被其他学生占用的
+            名额被退出，0 表示不会退课
+        latency (LatencyModel): 普通接口的处理时间分布
+        add_latency (LatencyModel): addGouwuche 的处理时间分布
+        backends (int): 负载均衡后的后端服务器数，登录时随机分配并写入 route Cookie
+        slow_backend_delay (float): 第一台后端服务器处理每个教务请求额外增加的时间（秒）
+        conflicts (int): 每个类别中前几门课程选课时总是返回时间冲突
+    """
+
+    username: str = "mock"
+    password: str = "mock"
+    courses_per_category: int = 20
+    capacity: int = 30
+    competitor_rate: float = 0.0
+    open_at: float = 0.0
+    cookie_ttl: float = 0.0
+    throttle_interval: float = 0.0
+    release_interval: float = 0.0
+    latency: LatencyModel = field(default_factory=LatencyModel)
+    add_latency: LatencyModel = field(default_factory=LatencyModel)
+    backends: int = 1
+    slow_backend_delay: float = 0.0
+    conflicts: int = 0
+
+
+@dataclass
+class RequestRecord:
+    """服务器收到的一次请求
+
+    Attributes:
+        arrived_at (float): 请求到达的时间（time.time）
+        path (str): 请求路径
+        course_id (str | None): addGouwuche 请求的课程 id
+        message (str | None): 返回给客户端的 message
+    """
+
+    arrived_at: float
+    path: str
+    course_id: str | None = None
+    message: str | None = None
+
+
+def build_catalog(courses_per_category: int) -> dict[str, list[dict[str, str]]]:
+    """生成模拟的课程目录
+
+    Args:
+        courses_per_category (int): 每个类别下的课程数
+
+    Returns:
+        dict[str, list[dict[str, str]]]: 类别代码到 queryKxrw 课程条目列表的映射
+    """
+    catalog = {}
+    for code, name in CATEGORIES:
+        courses = []
+        for i in range(courses_per_category):
+            weekday = WEEKDAYS[i % len(WEEKDAYS)]
+            period = 2 * (i % 5) + 1
+            teacher = TEACHERS[i % len(TEACHERS)]
+            courses.append(
+                {
+                    "id": f"{code}{i:04d}",
+                    "kcmc": f"{name}课程{i}",
+                    "tyxmmc": "",
+                    "kcxx": (
+                        f"<div><p>[1-16周] 星期{weekday} 第{period}-{period + 1}节</p>"
+                        f"<p>T{i % 6 + 1}{i:03d}</p><p>{teacher}</p></div>"
+                    ),
+                }
+            )
+        catalog[code] = courses
+    return catalog
+
+
+class MockState:
+    """模拟服务器的共享状态"""
+
+    def __init__(self, config: MockConfig):
+        self.config = config
+        self.catalog = build_catalog(config.courses_per_category)
+        self.lock = threading.Lock()
+        self.executions: dict[str, str] = {}  # execution -> salt
+        self.tickets: set[str] = set()
+        self.sessions: dict[str, float] = {}  # JSESSIONID -> 创建时间
+        self.last_add: dict[str, float] = {}  # JSESSIONID -> 上次 addGouwuche 时间
+        self.selected: dict[str, set[str]] = {}  # course id -> 选中该课程的会话
+        self.records: list[RequestRecord] = []
+        self.routes = [secrets.token_hex(8) for _ in range(max(config.backends, 1))]
+
+    def new_session(self) -> str:
+        session_id = secrets.token_hex(16)
+        with self.lock:
+            self.sessions[session_id] = time.time()
+        return session_id
+
+    def is_valid(self, session_id: str | None) -> bool:
+        with self.lock:
+            created_at = self.sessions.get(session_id or "")
+        if created_at is None:
+            return False
+        ttl = self.config.cookie_ttl
+        return ttl <= 0 or time.time() - created_at < ttl
+
+    def remaining(self, course_id: str) -> int:
+        """返回课程剩余名额，已考虑其他学生的竞争与退课"""
+        capacity = self.config.capacity
+        selected = len(self.selected.get(course_id, ()))
+        elapsed = time.time() - self.config.open_at
+        others = 0
+        if self.config.competitor_rate > 0 and elapsed > 0:
+            others = min(int(elapsed * self.config.competitor_rate), capacity)
+            if self.config.release_interval > 0:
+                # 退课只会退出其他学生占用的名额
+                others = max(others - int(elapsed / self.config.release_interval), 0)
+            others = min(others, capacity - selected)
+        return max(capacity - selected - others, 0)
+
+    def add_course(self, session_id: str, course_id: str) -> str:
+        """处理一次选课请求，返回 message"""
+        now = time.time()
+        with self.lock:
+            if now < self.config.open_at:
+                return "选课尚未开始"
+            last = self.last_add.get(session_id)
+            self.last_add[session_id] = now
+            if last is not None and now - last < self.config.throttle_interval:
+                return "请求过于频繁，请稍后再试"
+            if not any(
+                c["id"] == course_id for cs in self.catalog.values() for c in cs
+            ):
+                return "课程不存在"
+            if int(course_id[-4:]) < self.config.conflicts:
+                return "所选课程与已选课程上课时间冲突"
+            if session_id in self.selected.get(course_id, ()):
+                return "该课程已在已选课程中"
+            if self.remaining(course_id) <= 0:
+                return "课容量已满"
+            self.selected.setdefault(course_id, set()).add(session_id)
+            return "操作成功"
+
+    def record(self, record: RequestRecord) -> None:
+        with self.lock:
+            self.records.append(record)
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    """模拟 jw.hitsz.edu.cn 与 ids.hit.edu.cn 中本工具使用到的接口"""
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    server: "MockServer"
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+    @property
+    def state(self) -> MockState:
+        return self.server.state
+
+    def read_form(self) -> dict[str, str]:
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length).decode("utf-8")
+        return {k: v[0] for k, v in parse_qs(body, keep_blank_values=True).items()}
+
+    def session_id(self) -> str | None:
+        cookie = SimpleCookie(self.headers.get("Cookie", ""))
+        morsel = cookie.get("JSESSIONID")
+        return morsel.value if morsel else None
+
+    def backend_delay(self) -> float:
+        """返回 route Cookie 对应的后端服务器额外增加的处理时间"""
+        morsel = SimpleCookie(self.headers.get("Cookie", "")).get("route")
+        if morsel is not None and morsel.value == self.state.routes[0]:
+            return self.state.config.slow_backend_delay
+        return 0.0
+
+    def reply(
+        self,
+        status: int,
+        body: str = "",
+        content_type: str = "text/html;charset=UTF-8",
+        headers: dict[str, str] | None = None,
+        cookies: dict[str, str] | None = None,
+    ) -> None:
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        for key, value in (cookies or {}).items():
+            self.send_header("Set-Cookie", f"{key}={value}; Path=/")
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(data)
+
+    def reply_json(self, payload: dict) -> None:
+        self.reply(200, json.dumps(payload, ensure_ascii=False), "application/json")
+
+    def do_HEAD(self) -> None:
+        self.reply(200)
+
+    def do_GET(self) -> None:
+        url = urlparse(self.path)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        if url.path == "/authserver/login":
+            salt = secrets.token_urlsafe(12)[:16]
+            execution = secrets.token_hex(16)
+            with self.state.lock:
+                self.state.executions[execution] = salt
+            self.reply(200, LOGIN_PAGE.format(salt=salt, execution=execution))
+        elif url.path == "/casLogin":
+            ticket = query.get("ticket", "")
+            with self.state.lock:
+                valid = ticket in self.state.tickets
+                self.state.tickets.discard(ticket)
+            if not valid:
+                self.reply(403, "无效的票据")
+                return
+            cookies = {
+                "route": random.choice(self.state.routes),
+                "JSESSIONID": self.state.new_session(),
+            }
+            self.reply(302, headers={"Location": "/"}, cookies=cookies)
+        else:
+            self.reply(200, "<html><body>mock</body></html>")
+
+    def do_POST(self) -> None:
+        url = urlparse(self.path)
+        form = self.read_form()
+        if url.path == "/authserver/login":
+            self.handle_login(form, parse_qs(url.query).get("service", [""])[0])
+            return
+
+        handler = {
+            "/Xsxk/queryXkdqXnxq": self.handle_time_info,
+            "/Xsxk/queryYxkc": self.handle_categories,
+            "/Xsxk/queryKxrw": self.handle_courses,
+            "/Xsxk/addGouwuche": self.handle_add_course,
+        }.get(url.path)
+        if handler is None:
+            self.reply(404, "Not Found")
+            return
+
+        record = RequestRecord(time.time(), url.path, form.get("p_id"))
+        session_id = self.session_id()
+        latency = self.state.config.latency
+        if url.path == "/Xsxk/addGouwuche":
+            latency = self.state.config.add_latency
+        time.sleep(latency.sample() + self.backend_delay())
+        if not self.state.is_valid(session_id):
+            self.state.record(record)
+            self.reply(200, EXPIRED_PAGE)
+            return
+        record.message = handler(form, session_id or "")
+        self.state.record(record)
+
+    def handle_login(self, form: dict[str, str], service: str) -> None:
+        with self.state.lock:
+            salt = self.state.executions.pop(form.get("execution", ""), None)
+        if salt is None:
+            self.reply(200, "登录页面已过期")
+            return
+        try:
+            cipher = AES.new(salt.encode(), AES.MODE_CBC, b"0" * 16)
+            plain = unpad(cipher.decrypt(b64decode(form["password"])), AES.block_size)
+            # IV 是随机的，只影响第一个分组，因此跳过 64 位随机前缀即可
+            password = plain[64:].decode("utf-8")
+        except (KeyError, ValueError):
+            password = None
+        if (
+            form.get("username") != self.state.config.username
+            or password != self.state.config.password
+        ):
+            self.reply(200, "用户名或密码错误")
+            return
+        ticket = f"ST-{secrets.token_hex(8)}"
+        with self.state.lock:
+            self.state.tickets.add(ticket)
+        location = f"{service}?{urlencode({'ticket': ticket})}"
+        self.reply(302, headers={"Location": location})
+
+    def handle_time_info(self, form: dict[str, str], session_id: str) -> str:
+        self.reply_json(
+            {
+                "p_dqxn": ACADEMIC_YEAR,
+                "p_dqxq": TERM,
+                "p_xn": ACADEMIC_YEAR,
+                "p_xq": TERM,
+            }
+        )
+        return "ok"
+
+    def handle_categories(self, form: dict[str, str], session_id: str) -> str:
+        self.reply_json(
+            {
+                "xkgzszList": [
+                    {"xkfsdm": code, "xkfsmc": name} for code, name in CATEGORIES
+                ]
+            }
+        )
+        return "ok"
+
+    def handle_courses(self, form: dict[str, str], session_id: str) -> str:
+        keyword = form.get("p_gjz", "")
+        courses = self.state.catalog.get(form.get("p_xkfsdm", ""))
+        if courses is None:
+            self.reply_json({"message": "选课类别不存在"})
+            return "选课类别不存在"
+        matched = [
+            dict(
+                course,
+                rl=self.state.config.capacity,
+                syrs=self.state.remaining(course["id"]),
+            )
+            for course in courses
+            if keyword in course["kcmc"]
+        ]
+        total = len(matched)
+        if "pageSize" in form:
+            page_size = int(form["pageSize"])
+            start = (int(form.get("pageNum", 1)) - 1) * page_size
+            matched = matched[start : start + page_size]
+        self.reply_json({"kxrwList": {"list": matched, "total": total}})
+        return "ok"
+
+    def handle_add_course(self, form: dict[str, str], session_id: str) -> str:
+        message = self.state.add_course(session_id, form.get("p_id", ""))
+        self.reply_json({"message": message})
+        return message
+
+
+class MockServer(ThreadingHTTPServer):
+    """在本地运行的模拟教务系统"""
+
+    daemon_threads = True
+
+    def __init__(self, config: MockConfig, host: str = "127.0.0.1", port: int = 0):
+        super().__init__((host, port), MockHandler)
+        self.state = MockState(config)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> threading.Thread:
+        """在后台线程中运行服务器"""
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+
+def main(
+    port: Annotated[int, typer.Option(help="监听端口")] = 8000,
+    username: Annotated[str, typer.Option(help="允许登录的用户名")] = "mock",
+    password: Annotated[str, typer.Option(help="允许登录的密码")] = "mock",
+    capacity: Annotated[int, typer.Option(help="每门课程的容量")] = 30,
+    competitor_rate: Annotated[
+        float, typer.Option(help="开放后其他学生每秒抢走的名额数")
+    ] = 0.0,
+    open_in: Annotated[float, typer.Option(help="多少秒后开放选课")] = 0.0,
+    cookie_ttl: Annotated[
+        float, typer.Option(help="Cookie 有效期（秒），0 表示永不过期")
+    ] = 0.0,
+    throttle_interval: Annotated[
+        float, typer.Option(help="同一会话两次选课的最小间隔（秒）")
+    ] = 0.0,
+    release_interval: Annotated[
+        float,
+        typer.Option(help="开放后每隔多少秒每门课程有一个名额被退出，0 表示不退课"),
+    ] = 0.0,
+    latency: Annotated[str, typer.Option(help="普通接口的延迟分布")] = "const:0",
+    add_latency: Annotated[
+        str, typer.Option(help="addGouwuche 的延迟分布")
+    ] = "const:0",
+    backends: Annotated[
+        int, typer.Option(help="负载均衡后的后端服务器数，登录时随机分配")
+    ] = 1,
+    slow_backend_delay: Annotated[
+        float, typer.Option(help="第一台后端服务器额外增加的处理时间（秒）")
+    ] = 0.0,
+    conflicts: Annotated[
+        int, typer.Option(help="每个类别中前几门课程选课时总是返回时间冲突")
+    ] = 0,
+) -> None:
+    """运行模拟教务系统
+
+    启动后设置环境变量 JW_BASE_URL 与 IDS_BASE_URL 为输出的地址，
+    即可让 prepare.py 和 hunter.py 连接到模拟服务器。
+    """
+    config = MockConfig(
+        username=username,
+        password=password,
+        capacity=capacity,
+        competitor_rate=competitor_rate,
+        open_at=time.time() + open_in,
+        cookie_ttl=cookie_ttl,
+        throttle_interval=throttle_interval,
+        release_interval=release_interval,
+        latency=LatencyModel(latency),
+        add_latency=LatencyModel(add_latency),
+        backends=backends,
+        slow_backend_delay=slow_backend_delay,
+        conflicts=conflicts,
+    )
+    server = MockServer(config, port=port)
+    print(f"模拟服务器已启动：{server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    typer.run(main)
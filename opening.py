@@ -0,0 +1,166 @@
+import time
+
+import requests
+from colorama import Fore
+
+import console
+from client import HunterSession
+from tools import (
+    JW_BASE_URL,
+    MAX_RETRIES,
+    MaxRetriesExceededError,
+    Outcome,
+    classify_response,
+    get_add_data,
+    is_not_open,
+    refresh_cookies,
+)
+
+DEFAULT_OPEN_BUDGET = 200
+DEFAULT_OPEN_WINDOW = 10.0
+DEFAULT_OPEN_MIN_INTERVAL = 0.0
+DEFAULT_OPEN_MAX_INTERVAL = 5.0
+# 轮询间隔与距离预计开放时间的比例
+POLL_RATIO = 0.1
+# 探测被限流后，下一次探测前至少等待的时间（秒）
+THROTTLED_INTERVAL = 0.5
+
+
+def poll_interval(
+    distance: float | None,
+    min_interval: float = DEFAULT_OPEN_MIN_INTERVAL,
+    max_interval: float = DEFAULT_OPEN_MAX_INTERVAL,
+) -> float:
+    """根据距离预计开放时间的秒数计算下一次探测前的间隔
+
+    间隔与距离成正比，越接近预计时间探测越密集；预计时间之后同样逐渐放宽，
+    因此无论提前还是推迟开放，探测次数都只随偏差的对数增长。
+
+    Args:
+        distance (float | None): 距离预计开放时间的秒数，已过为负，None 表示没有预计时间
+        min_interval (float): 最短间隔（秒），0 表示上一个探测返回后立即发送下一个
+        max_interval (float): 最长间隔（秒）
+
+    Returns:
+        float: 探测间隔（秒）
+    """
+    if distance is None:
+        return max_interval
+    return min(max(abs(distance) * POLL_RATIO, min_interval), max_interval)
+
+
+class OpeningDetector:
+    """轮询 addGouwuche 检测选课开放的时刻
+
+    用一门课程反复发送选课请求，服务器返回“尚未开始”之类的提示时视为未开放，
+    被限流或请求失败时无法判断，继续探测；返回其他结果（选上、名额已满、
+    时间冲突等）说明服务器已经处理了选课，此时这次请求本身就是该课程的第一次选课。
+    预计时间附近探测一个接一个地发送，开放后最多一个往返就能发现；
+    探测总数不超过 budget，用完时不再等待。
+
+    Args:
+        session (HunterSession): 包含 Cookie 的 HTTP 会话
+        course (dict[str, str]): 用于探测的课程，通常是最想选的课程
+        budget (int): 探测请求总数上限
+        min_interval (float): 最短探测间隔（秒）
+        max_interval (float): 最长探测间隔（秒）
+
+    Attributes:
+        probes (int): 已发送的探测请求数
+        message (str | None): 最后一次探测返回的 message
+        outcome (Outcome | None): 最后一次探测的结果类别
+        opened_at (float | None): 检测到开放的时刻（time.time）
+    """
+
+    def __init__(
+        self,
+        session: HunterSession,
+        course: dict[str, str],
+        budget: int = DEFAULT_OPEN_BUDGET,
+        min_interval: float = DEFAULT_OPEN_MIN_INTERVAL,
+        max_interval: float = DEFAULT_OPEN_MAX_INTERVAL,
+    ):
+        self.session = session
+        self.course = course
+        self.budget = budget
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.probes = 0
+        self.message: str | None = None
+        self.outcome: Outcome | None = None
+        self.opened_at: float | None = None
+        self._data = get_add_data(course)
+
+    @property
+    def selected(self) -> bool:
+        """检测到开放的那次探测是否已经选上了探测用的课程"""
+        return self.outcome is Outcome.SUCCESS
+
+    def probe(self, retry_count: int = 0) -> bool | None:
+        """发送一次探测
+
+        Returns:
+            bool | None: 已开放返回 True，未开放返回 False，
+                被限流或请求失败等无法判断时返回 None
+
+        Raises:
+            MaxRetriesExceededError: 当重新登录次数超过最大限制时抛出
+        """
+        self.probes += 1
+        self.outcome = None
+        cookies = self.session.cookies_string
+        try:
+            response = self.session.post(
+                f"{JW_BASE_URL}/Xsxk/addGouwuche", data=self._data
+            )
+        except requests.RequestException:
+            return None
+        content_type = response.headers.get("Content-Type", "")
+        if "text/html" in content_type:
+            if retry_count >= MAX_RETRIES:
+                raise MaxRetriesExceededError(MAX_RETRIES)
+            refresh_cookies(self.session, cookies)
+            return self.probe(retry_count + 1)
+        if response.status_code != 200 or "application/json" not in content_type:
+            self.outcome = classify_response(response.status_code)
+            return None
+        try:
+            self.message = response.json()["message"]
+        except (ValueError, KeyError):
+            return None
+        self.outcome = classify_response(response.status_code, self.message)
+        if self.outcome is Outcome.THROTTLED:
+            return None
+        return not is_not_open(self.message)
+
+    def wait(self, expected_at: float | None = None) -> bool:
+        """探测直到选课开放或用完探测预算
+
+        Args:
+            expected_at (float | None): 预计开放的本地时刻（time.time），
+                None 表示没有预计时间，按最长间隔探测
+
+        Returns:
+            bool: 检测到开放返回 True，用完预算返回 False
+
+        Raises:
+            MaxRetriesExceededError: 当重新登录次数超过最大限制时抛出
+        """
+        while self.probes < self.budget:
+            sent_at = time.time()
+            if self.probe():
+                self.opened_at = time.time()
+                console.notice(
+                    f"检测到选课已开放（第 {self.probes} 次探测）", Fore.GREEN
+                )
+                return True
+            distance = None if expected_at is None else expected_at - time.time()
+            interval = poll_interval(distance, self.min_interval, self.max_interval)
+            if self.outcome is Outcome.THROTTLED:
+                interval = max(interval, THROTTLED_INTERVAL)
+            # 探测本身的往返时间已经计入间隔
+            time.sleep(max(interval - (time.time() - sent_at), 0))
+        console.notice(
+            f"已用完 {self.budget} 次探测仍未检测到开放，直接开始抢课", Fore.YELLOW
+        )
+        return False
@@ -1,17 +1,28 @@
+import colorama
+import typer
+from colorama import Fore
+from typing_extensions import Annotated
+
+from catalog import (
+    DEFAULT_CATALOG_TTL,
+    load_catalog,
+    prefetch_catalog,
+    search_courses,
+)
+from client import HunterSession, create_session
+from search import SearchIndex
+from timetable import Timetable
 from tools import (
     MaxRetriesExceededError,
     display_categories,
-    get_headers,
-    get_time_info,
     get_course_categories,
-    get_courses,
+    get_time_info,
     handle_course_selection,
     load_config,
     load_existing_courses,
     save_results,
+    select_courses,
 )
-import colorama
-from colorama import Fore
 
 colorama.init()  # 初始化 colorama
 
@@ -19,10 +30,19 @@ colorama.init()  # 初始化 colorama
 def run_course_preparation(
     categories: list[dict[str, str]],
     time_info: dict[str, str],
-    headers: dict[str, str],
+    session: HunterSession,
     selected_courses: list[dict[str, str]],
+    catalog_ttl: float = DEFAULT_CATALOG_TTL,
+    hide_conflicts: bool = False,
 ) -> None:
-    """执行课程准备流程"""
+    """执行课程准备流程
+
+    每个类别的课程只在首次选择（或缓存过期、手动刷新）时从服务器获取，
+    并且边下载边解析，浏览全部课程时第一门课程到达后就开始询问；
+    关键词搜索在第一次搜索时建立的本地索引中进行，结果按相关度排列，
+    可以一次选择多门。
+    hide_conflicts 为 True 时不再列出与已选课程时间冲突的课程。
+    """
     while True:
         display_categories(categories)
         try:
@@ -31,61 +51,126 @@ def run_course_preparation(
                 break
 
             selected_category = categories[opt - 1]
+            catalog = load_catalog(
+                selected_category, time_info, session, catalog_ttl, stream=True
+            )
+            index = None
             while True:
                 keyword = input(
                     Fore.WHITE
-                    + "输入你想查找的课程的关键词 (q 返回上一级，直接回车查找全部) : "
+                    + "输入关键词或拼音首字母，可加上 周一、第3节、@教师 筛选 "
+                    + "(q 返回上一级，r 刷新课程列表，直接回车逐门浏览全部) : "
                     + Fore.RESET
                 )
                 if keyword == "q":
                     break
-
-                courses = get_courses(
-                    category=selected_category,
-                    time_info=time_info,
-                    headers=headers,
-                    keyword=keyword,
-                )
-
-                if handle_course_selection(courses, selected_courses):
-                    break
+                if keyword == "r":
+                    catalog = load_catalog(
+                        selected_category,
+                        time_info,
+                        session,
+                        catalog_ttl,
+                        refresh=True,
+                        stream=True,
+                    )
+                    index = None
+                    continue
+
+                if keyword == "":
+                    courses = search_courses(catalog, keyword)
+                    if handle_course_selection(
+                        courses, selected_courses, hide_conflicts
+                    ):
+                        break
+                    continue
+
+                if index is None:
+                    index = SearchIndex(catalog)
+                courses = index.search(keyword)
+                if hide_conflicts:
+                    timetable = Timetable(selected_courses)
+                    courses = [c for c in courses if not timetable.conflicts(c)]
+                select_courses(courses, selected_courses)
 
         except (ValueError, IndexError):
             print(Fore.RED + "无效输入，请重试。" + Fore.RESET)
             continue
 
 
-def main() -> None:
-    """主函数：程序入口"""
+def main(
+    prefetch: Annotated[
+        bool,
+        typer.Option(
+            "--prefetch", "-p", help="启动时并发预取所有类别的全部课程并写入缓存"
+        ),
+    ] = False,
+    workers: Annotated[
+        int,
+        typer.Option(help="预取时的并发请求数，默认为连接池大小", show_default=False),
+    ] = 0,
+    hide_conflicts: Annotated[
+        bool,
+        typer.Option("--hide-conflicts", help="不列出与已选课程上课时间冲突的课程"),
+    ] = False,
+    record: Annotated[
+        str | None,
+        typer.Option(
+            "--record",
+            help="把所有 HTTP 交互及其耗时录制到指定的磁带文件，可用 cassette.py 回放",
+            show_default=False,
+        ),
+    ] = None,
+) -> None:
+    """选课准备工具：浏览课程并生成 courses.json"""
     config = None
-    headers = None
+    session = None
+    recorder = None
     selected_courses = []
 
     try:
+        if record:
+            from cassette import Recorder
+
+            recorder = Recorder(record)
+            recorder.install()
         selected_courses = load_existing_courses()
         config = load_config()
-        headers = get_headers(config["COOKIES"])
+        session = create_session(config)
 
-        time_info = get_time_info(headers)
+        time_info = get_time_info(session)
         if not time_info:
             print(Fore.RED + "获取时间信息失败。" + Fore.RESET)
             return
 
-        categories = get_course_categories(time_info, headers)
+        categories = get_course_categories(time_info, session)
         if not categories:
             print(Fore.RED + "获取课程类别失败。" + Fore.RESET)
             return
 
-        run_course_preparation(categories, time_info, headers, selected_courses)
+        if prefetch:
+            prefetch_catalog(
+                categories, time_info, session, workers or session.pool_size
+            )
+
+        run_course_preparation(
+            categories,
+            time_info,
+            session,
+            selected_courses,
+            float(config.get("CATALOG_TTL", DEFAULT_CATALOG_TTL)),
+            hide_conflicts,
+        )
 
     except KeyboardInterrupt:
         print(Fore.YELLOW + "\n正在退出..." + Fore.RESET)
     except MaxRetriesExceededError:
         print(Fore.RED + "重复获取 Cookie 次数超过最大限制" + Fore.RESET)
     finally:
-        if config is not None and headers is not None:
-            save_results(config, headers, selected_courses)
+        if config is not None and session is not None:
+            save_results(config, session, selected_courses)
+        if recorder is not None:
+            recorder.close()
 
 
 if __name__ == "__main__":
-    main()
+    typer.run(main)
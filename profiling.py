@@ -0,0 +1,152 @@
+import cProfile
+import io
+import os
+import pstats
+import subprocess
+import sys
+import threading
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+
+from colorama import Fore
+
+DEFAULT_TOP = 20
+
+
+class PhaseTimer:
+    """累计各阶段的墙上时间
+
+    同一阶段可以多次进入，也可以在多个线程中同时进入，耗时累加。
+    """
+
+    def __init__(self):
+        self.durations: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def add(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self.durations[name] = self.durations.get(name, 0.0) + seconds
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """统计 with 语句块的耗时"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def wrap(self, name: str, func: Callable[[], str]) -> Callable[[], str]:
+        """返回统计每次调用耗时的 func，用于包装重新登录等回调"""
+
+        def timed() -> str:
+            with self.phase(name):
+                return func()
+
+        return timed
+
+
+class CPUProfiler:
+    """对主线程及之后启动的所有线程进行 cProfile 采样
+
+    Python 3.12 之前 cProfile 只能统计调用 enable 的线程，因此通过
+    threading.setprofile 在每个新线程第一次执行时为其创建并启用一个独立的 Profile；
+    3.12 起 cProfile 基于 sys.monitoring，一个 Profile 即可覆盖所有线程。
+    计时使用线程 CPU 时间，等待网络和锁的时间不计入。
+    """
+
+    def __init__(self):
+        self._profiles: list[cProfile.Profile] = []
+        self._lock = threading.Lock()
+
+    def _start_thread(self, frame, event, arg) -> None:
+        profile = cProfile.Profile(time.thread_time)
+        with self._lock:
+            self._profiles.append(profile)
+        profile.enable()
+
+    def start(self) -> None:
+        if sys.version_info < (3, 12):
+            threading.setprofile(self._start_thread)
+        self._start_thread(None, None, None)
+
+    def stop(self) -> pstats.Stats:
+        """停止采样并合并所有线程的统计结果"""
+        if sys.version_info < (3, 12):
+            threading.setprofile(None)
+        with self._lock:
+            profiles = list(self._profiles)
+        # 主线程的 Profile 最先创建，disable 只对当前线程有效
+        profiles[0].disable()
+        stats = pstats.Stats(profiles[0], stream=io.StringIO())
+        for profile in profiles[1:]:
+            stats.add(profile)
+        return stats
+
+
+def measure_imports(module: str) -> tuple[float, list[tuple[str, float]]]:
+    """在新的解释器中导入模块，测量导入耗时
+
+    Args:
+        module (str): 模块名
+
+    Returns:
+        tuple[float, list[tuple[str, float]]]: 导入总耗时（秒），
+            以及按累计耗时排序的顶层依赖及其耗时
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    total = 0.0
+    top_level: list[tuple[str, float]] = []
+    children: list[tuple[str, float]] = []
+    # 子模块先于父模块输出，名称前每层缩进两个空格
+    for line in result.stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        name, seconds = parts[2], int(parts[1]) / 1e6
+        depth = (len(name) - len(name.lstrip(" ")) - 1) // 2
+        if depth == 1:
+            children.append((name.strip(), seconds))
+        elif depth == 0:
+            if name.strip() == module:
+                total, top_level = seconds, children
+            children = []
+    top_level.sort(key=lambda item: item[1], reverse=True)
+    return total, top_level
+
+
+def report(
+    timer: PhaseTimer,
+    stats: pstats.Stats,
+    module: str,
+    top: int = DEFAULT_TOP,
+) -> None:
+    """输出导入耗时、各阶段耗时与 CPU 热点
+
+    Args:
+        timer (PhaseTimer): 各阶段耗时
+        stats (pstats.Stats): CPU 采样结果
+        module (str): 测量导入耗时的入口模块
+        top (int): 输出的条目数
+    """
+    print(Fore.CYAN + "\n========== 性能分析 ==========" + Fore.RESET)
+    total, imports = measure_imports(module)
+    print(Fore.CYAN + f"导入 {module}: {total * 1000:.1f} ms" + Fore.RESET)
+    for name, seconds in imports[:5]:
+        print(f"  {name:<24}{seconds * 1000:8.1f} ms")
+
+    print(Fore.CYAN + "各阶段耗时" + Fore.RESET)
+    for name, seconds in timer.durations.items():
+        print(f"  {name:<24}{seconds * 1000:8.1f} ms")
+
+    print(Fore.CYAN + f"CPU 热点（按累计时间排序，前 {top} 项）" + Fore.RESET)
+    output = io.StringIO()
+    stats.stream = output
+    stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(top)
+    print(output.getvalue().strip())
@@ -0,0 +1,139 @@
+import threading
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from colorama import Fore
+
+import console
+from client import HunterSession
+from clock import PROBE_URL
+from tools import (
+    JW_BASE_URL,
+    MAX_RETRIES,
+    MaxRetriesExceededError,
+    refresh_cookies,
+)
+
+DEFAULT_READY_TIME = 60.0
+DEFAULT_KEEP_ALIVE_INTERVAL = 15.0
+
+
+def check_session(session: HunterSession) -> bool:
+    """检查会话 Cookie 是否仍然有效
+
+    使用开销最小的 queryXkdqXnxq 接口，Cookie 失效时教务系统会返回登录页面。
+
+    Args:
+        session (HunterSession): 共享的 HTTP 会话
+
+    Returns:
+        bool: Cookie 有效返回 True，否则返回 False
+    """
+    try:
+        response = session.post(
+            f"{JW_BASE_URL}/Xsxk/queryXkdqXnxq", data={"mxpylx": "1"}
+        )
+    except requests.RequestException:
+        return False
+    return response.status_code == 200 and "application/json" in response.headers.get(
+        "Content-Type", ""
+    )
+
+
+def ensure_session(session: HunterSession) -> None:
+    """确保会话 Cookie 有效，失效时提前重新登录
+
+    Args:
+        session (HunterSession): 共享的 HTTP 会话
+
+    Raises:
+        MaxRetriesExceededError: 当重试次数超过最大限制时抛出
+    """
+    for _ in range(MAX_RETRIES):
+        cookies = session.cookies_string
+        if check_session(session):
+            return
+        console.notice("Cookie 已过期，提前重新获取...", Fore.YELLOW)
+        refresh_cookies(session, cookies)
+    if not check_session(session):
+        raise MaxRetriesExceededError(MAX_RETRIES)
+
+
+def warm_up(session: HunterSession, connections: int) -> int:
+    """预先建立并保持与教务系统之间的连接
+
+    同时发送 connections 个轻量请求，使连接池中存在足够多的空闲 keep-alive 连接，
+    抢课时无需再进行 TCP 握手。
+
+    Args:
+        session (HunterSession): 共享的 HTTP 会话
+        connections (int): 需要预热的连接数
+
+    Returns:
+        int: 成功预热的连接数
+    """
+
+    def ping(_: int) -> bool:
+        try:
+            session.head(PROBE_URL, allow_redirects=False)
+            return True
+        except requests.RequestException:
+            return False
+
+    with ThreadPoolExecutor(max_workers=connections) as executor:
+        return sum(executor.map(ping, range(connections)))
+
+
+class KeepAlive(threading.Thread):
+    """在后台定期预热连接，防止空闲连接被服务器关闭"""
+
+    def __init__(
+        self,
+        session: HunterSession,
+        connections: int,
+        interval: float,
+        extra: Callable[[], None] | None = None,
+    ):
+        super().__init__(daemon=True)
+        self.session = session
+        self.connections = connections
+        self.interval = interval
+        self.extra = extra
+        self._stopped = threading.Event()
+
+    def run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            warm_up(self.session, self.connections)
+            if self.extra is not None:
+                self.extra()
+
+    def stop(self) -> None:
+        """停止后台预热，并等待正在进行的一轮结束
+
+        预热会占用 FastSender 的空闲连接，等它归还后再开始抢课，
+        第一个请求就不会卡在取连接上。
+        """
+        self._stopped.set()
+        if self.is_alive():
+            self.join()
+
+
+def get_ready(session: HunterSession, connections: int) -> None:
+    """执行开始前的准备工作并报告状态
+
+    Args:
+        session (HunterSession): 共享的 HTTP 会话
+        connections (int): 需要预热的连接数
+
+    Raises:
+        MaxRetriesExceededError: 当重新登录次数超过最大限制时抛出
+    """
+    if not console.is_quiet():
+        print("\r" + " " * 50 + "\r", end="")  # 清除倒计时行
+    console.notice("正在进行开始前准备...")
+    ensure_session(session)
+    console.notice("Cookie 有效", Fore.GREEN)
+    warmed = warm_up(session, connections)
+    color = Fore.GREEN if warmed == connections else Fore.YELLOW
+    console.notice(f"已预热 {warmed}/{connections} 个连接，准备就绪", color)
@@ -0,0 +1,202 @@
+import threading
+import time
+from collections.abc import Callable
+from http.cookies import SimpleCookie
+
+import requests
+from colorama import Fore
+
+import console
+from client import HunterSession
+from readiness import ensure_session
+from tools import JW_BASE_URL, Outcome, add_course, get_cookies, refresh_cookies
+
+DEFAULT_ROUTES = 1
+DEFAULT_ROUTE_PROBES = 3
+MAX_ROUTE_FAILURES = 2
+# 延迟指数滑动平均中新样本的权重
+LATENCY_SMOOTHING = 0.3
+# 负载均衡器通过该 Cookie 把会话固定到某台后端服务器
+ROUTE_COOKIE = "route"
+
+
+def get_route(cookies: str) -> str | None:
+    """从 Cookie 字符串中读取后端服务器标识
+
+    Args:
+        cookies (str): 教务系统 Cookie 字符串
+
+    Returns:
+        str | None: route Cookie 的值，不存在时返回 None
+    """
+    morsel = SimpleCookie(cookies).get(ROUTE_COOKIE)
+    return morsel.value if morsel else None
+
+
+class Route:
+    """固定在某台后端服务器上的会话及其延迟统计
+
+    Attributes:
+        session (HunterSession): 该线路使用的 HTTP 会话
+        latency (float): 请求耗时的指数滑动平均（秒），尚未测量时为 0
+        failures (int): 连续没有收到响应的请求数
+        requests (int): 已测量的请求数
+        healthy (bool): 是否仍然可用
+    """
+
+    def __init__(self, session: HunterSession):
+        self.session = session
+        self.latency = 0.0
+        self.failures = 0
+        self.healthy = True
+        self.requests = 0
+
+    @property
+    def name(self) -> str:
+        """route Cookie 的值，用于输出"""
+        return get_route(self.session.cookies_string) or "未知"
+
+    def observe(self, elapsed: float) -> None:
+        """记录一次收到响应的请求耗时"""
+        if self.requests == 0:
+            self.latency = elapsed
+        else:
+            self.latency += LATENCY_SMOOTHING * (elapsed - self.latency)
+        self.requests += 1
+        self.failures = 0
+
+
+class RoutePool:
+    """分布在不同后端服务器上的一组会话
+
+    教务系统前的负载均衡器按 route Cookie 把会话固定到某台后端服务器，
+    各服务器的负载并不相同。登录多次以获得 route 不同的会话，
+    测量每条线路的延迟后，每次选课都通过当前最快的可用线路发送；
+    连续 MAX_ROUTE_FAILURES 个请求超时或连接失败的线路会被停用。
+    """
+
+    def __init__(self, session: HunterSession, size: int):
+        self.session = session
+        self.size = size
+        self.routes = [Route(session)]
+        self._lock = threading.Lock()
+
+    def fill(self) -> None:
+        """重新登录，直到获得 size 条 route 不同的线路
+
+        同一服务器上的会话没有意义，route 重复时丢弃该会话，最多登录 size * 2 次。
+        原会话的 Cookie 可能已经过期，会先确保其有效，以得到它实际所在的 route。
+
+        Raises:
+            MaxRetriesExceededError: 当重新登录次数超过最大限制时抛出
+        """
+        ensure_session(self.session)
+        relogin = self.session.relogin if self.session.relogin else get_cookies
+        seen = {route.name for route in self.routes}
+        attempts = 0
+        while len(self.routes) < self.size and attempts < self.size * 2:
+            attempts += 1
+            cookies = relogin()
+            name = get_route(cookies)
+            if name is None or name in seen:
+                continue
+            seen.add(name)
+            session = HunterSession(
+                cookies, self.session.pool_size, self.session.timeout
+            )
+            session.relogin = self.session.relogin
+            self.routes.append(Route(session))
+        color = Fore.GREEN if len(self.routes) == self.size else Fore.YELLOW
+        console.notice(f"已获得 {len(self.routes)}/{self.size} 条不同的后端线路", color)
+
+    def probe(self, count: int = DEFAULT_ROUTE_PROBES) -> None:
+        """用 queryXkdqXnxq 测量每条可用线路的延迟，同时保持其连接活跃
+
+        Args:
+            count (int): 每条线路的测量次数
+        """
+        for route in [route for route in self.routes if route.healthy]:
+            for _ in range(count):
+                start = time.perf_counter()
+                cookies = route.session.cookies_string
+                try:
+                    response = route.session.post(
+                        f"{JW_BASE_URL}/Xsxk/queryXkdqXnxq", data={"mxpylx": "1"}
+                    )
+                except requests.RequestException:
+                    self._fail(route)
+                    break
+                if "text/html" in response.headers.get("Content-Type", ""):
+                    refresh_cookies(route.session, cookies)
+                    continue
+                with self._lock:
+                    route.observe(time.perf_counter() - start)
+
+    def best(self, alternate: bool = False) -> Route:
+        """返回延迟最低的可用线路，全部停用时返回连续失败最少的线路
+
+        Args:
+            alternate (bool): 是否返回延迟第二低的可用线路，只有一条可用线路时返回该线路
+        """
+        with self._lock:
+            healthy = sorted(
+                (route for route in self.routes if route.healthy),
+                key=lambda route: route.latency,
+            )
+            if healthy:
+                return healthy[1] if alternate and len(healthy) > 1 else healthy[0]
+            return min(self.routes, key=lambda route: route.failures)
+
+    def _fail(self, route: Route) -> None:
+        with self._lock:
+            route.failures += 1
+            if not route.healthy or route.failures < MAX_ROUTE_FAILURES:
+                return
+            route.healthy = False
+        console.notice(
+            f"线路 {route.name} 连续 {route.failures} 次没有响应，已停用", Fore.YELLOW
+        )
+
+    def add_course(
+        self,
+        course: dict[str, str],
+        on_response: Callable[[bool], None] | None = None,
+        alternate: bool = False,
+    ) -> Outcome:
+        """通过当前最快的线路选课，行为与 tools.add_course 一致
+
+        Args:
+            alternate (bool): 是否改用第二快的线路，用于发送对冲请求
+
+        Raises:
+            MaxRetriesExceededError: 当重试次数超过最大限制时抛出
+        """
+        route = self.best(alternate)
+        cookies = route.session.cookies_string
+        elapsed = None
+        start = time.perf_counter()
+
+        def observe(throttled: bool) -> None:
+            nonlocal elapsed
+            if elapsed is None:
+                elapsed = time.perf_counter() - start
+            if on_response is not None:
+                on_response(throttled)
+
+        status = add_course(course, route.session, on_response=observe)
+        if elapsed is None:
+            self._fail(route)
+        elif route.session.cookies_string == cookies:
+            # 重新登录的耗时不计入线路延迟
+            with self._lock:
+                route.observe(elapsed)
+        return status
+
+    def report(self) -> None:
+        """输出各线路的延迟与状态"""
+        for route in self.routes:
+            latency = f"{route.latency * 1000:.1f} ms" if route.requests else "未测量"
+            state = "可用" if route.healthy else "已停用"
+            print(
+                f"  线路 {route.name:<20}{latency:>12}  {route.requests:>5} 次  {state}"
+            )
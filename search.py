@@ -0,0 +1,222 @@
+import re
+from bisect import bisect_right
+from collections import Counter, defaultdict
+from collections.abc import Iterable
+from functools import lru_cache
+
+from timetable import (
+    DAYS_PER_WEEK,
+    MAX_WEEKS,
+    PERIODS_PER_DAY,
+    WEEKDAYS,
+    parse_timetable,
+    slot_bit,
+)
+
+# GB2312 一级汉字按拼音排序，每个声母的第一个汉字的区位码
+PINYIN_BOUNDARIES = [
+    (0xB0A1, "a"),
+    (0xB0C5, "b"),
+    (0xB2C1, "c"),
+    (0xB4EE, "d"),
+    (0xB6EA, "e"),
+    (0xB7A2, "f"),
+    (0xB8C1, "g"),
+    (0xB9FE, "h"),
+    (0xBBF7, "j"),
+    (0xBFA6, "k"),
+    (0xC0AC, "l"),
+    (0xC2E8, "m"),
+    (0xC4C3, "n"),
+    (0xC5B6, "o"),
+    (0xC5BE, "p"),
+    (0xC6DA, "q"),
+    (0xC8BB, "r"),
+    (0xC8F6, "s"),
+    (0xCBFA, "t"),
+    (0xCDDA, "w"),
+    (0xCEF4, "x"),
+    (0xD1B9, "y"),
+    (0xD4D1, "z"),
+]
+PINYIN_CODES = [code for code, _ in PINYIN_BOUNDARIES]
+# GB2312 一级汉字的最后一个区位码，之后的二级汉字按部首排序
+LAST_LEVEL_ONE_CODE = 0xD7F9
+# 匹配的查询片段比例低于该值的课程不会出现在结果中
+MIN_SCORE = 0.5
+DEFAULT_LIMIT = 30
+
+FILTER_PATTERN = re.compile(
+    r"(?:星期|周)(?P<day>[一二三四五六日天])|第(?P<period>\d+)节|@(?P<teacher>\S+)"
+)
+
+
+@lru_cache(maxsize=None)
+def pinyin_initial(char: str) -> str | None:
+    """返回常用汉字拼音的首字母
+
+    利用 GB2312 一级汉字按拼音排序的特点查表，不需要拼音库；
+    多音字只能得到其中一个读音，二级汉字与非汉字返回 None。
+    """
+    try:
+        encoded = char.encode("gb2312")
+    except UnicodeEncodeError:
+        return None
+    if len(encoded) != 2:
+        return None
+    code = (encoded[0] << 8) | encoded[1]
+    if not PINYIN_CODES[0] <= code <= LAST_LEVEL_ONE_CODE:
+        return None
+    return PINYIN_BOUNDARIES[bisect_right(PINYIN_CODES, code) - 1][1]
+
+
+def initials(text: str) -> str:
+    """把文本中的汉字替换为拼音首字母，保留字母与数字，去掉其余字符"""
+    result = []
+    for char in text.lower():
+        if char.isascii():
+            if char.isalnum():
+                result.append(char)
+        else:
+            initial = pinyin_initial(char)
+            if initial is not None:
+                result.append(initial)
+    return "".join(result)
+
+
+def grams(text: str) -> set[str]:
+    """返回文本的单字与相邻两字片段，忽略空白"""
+    text = "".join(text.lower().split())
+    return set(text) | {text[i : i + 2] for i in range(len(text) - 1)}
+
+
+def query_grams(text: str) -> set[str]:
+    """返回查询的片段
+
+    中文查询同时使用单字与两字片段，“高数”这样的简称也能匹配；
+    拼音首字母与英文的单个字母过于常见，只使用两字片段。
+    """
+    text = "".join(text.lower().split())
+    pairs = {text[i : i + 2] for i in range(len(text) - 1)}
+    if len(text) <= 1 or not text.isascii():
+        return pairs | set(text)
+    return pairs
+
+
+def parse_query(text: str) -> tuple[str, int | None, int | None, str | None]:
+    """从输入中拆出关键词与筛选条件
+
+    支持的筛选条件：星期一（或周一）、第3节、@教师姓名，其余部分作为关键词。
+
+    Args:
+        text (str): 用户输入
+
+    Returns:
+        tuple[str, int | None, int | None, str | None]:
+            关键词、星期（1-7）、节次与教师，没有对应条件时为 None
+    """
+    day = period = teacher = None
+    for match in FILTER_PATTERN.finditer(text):
+        if match["day"]:
+            day = WEEKDAYS.index(match["day"].replace("天", "日")) + 1
+        elif match["period"]:
+            period = int(match["period"])
+        else:
+            teacher = match["teacher"]
+    return FILTER_PATTERN.sub(" ", text).strip(), day, period, teacher
+
+
+@lru_cache(maxsize=None)
+def time_mask(day: int | None, period: int | None) -> int:
+    """返回所有周中指定星期与节次的位集，未指定的一项视为全部"""
+    days = [day] if day else range(1, DAYS_PER_WEEK + 1)
+    periods = [period] if period else range(1, PERIODS_PER_DAY + 1)
+    mask = 0
+    for week in range(1, MAX_WEEKS + 1):
+        for d in days:
+            for p in periods:
+                if 1 <= d <= DAYS_PER_WEEK and 1 <= p <= PERIODS_PER_DAY:
+                    mask |= slot_bit(week, d, p)
+    return mask
+
+
+class SearchIndex:
+    """课程目录的本地模糊搜索索引
+
+    为每门课程的名称与详细信息（包括教师与上课地点）建立单字与两字片段的倒排索引，
+    并为其拼音首字母建立同样的索引，因此“高数”“gdsx”都能找到“高等数学”。
+    按匹配的查询片段比例排序，名称中完整包含关键词的课程排在前面，
+    少打或打错一两个字仍能找到。
+
+    Args:
+        courses (Iterable[dict[str, str]]): 课程列表，格式与 get_courses 相同
+    """
+
+    def __init__(self, courses: Iterable[dict[str, str]]):
+        self.courses = list(courses)
+        self._postings: dict[str, set[int]] = defaultdict(set)
+        self._initial_postings: dict[str, set[int]] = defaultdict(set)
+        self._names = [course["name"].lower() for course in self.courses]
+        self._name_initials = [initials(course["name"]) for course in self.courses]
+        self._slots = [parse_timetable(c["information"]) for c in self.courses]
+        for index, course in enumerate(self.courses):
+            for field in (course["name"], course["information"]):
+                for gram in grams(field):
+                    self._postings[gram].add(index)
+                for gram in grams(initials(field)):
+                    self._initial_postings[gram].add(index)
+
+    def _score(self, index: int, keyword: str, hits: int, total: int) -> float:
+        score = hits / total
+        if keyword in self._names[index]:
+            score += 1.0
+        elif keyword in self._name_initials[index]:
+            score += 0.8
+        return score
+
+    def search(
+        self,
+        text: str,
+        limit: int = DEFAULT_LIMIT,
+    ) -> list[dict[str, str]]:
+        """按输入搜索课程，输入格式见 parse_query
+
+        Args:
+            text (str): 关键词与筛选条件，只有筛选条件时返回所有满足条件的课程
+            limit (int): 最多返回的课程数，0 表示不限制
+
+        Returns:
+            list[dict[str, str]]: 按相关度从高到低排列的课程
+        """
+        keyword, day, period, teacher = parse_query(text)
+        keyword = "".join(keyword.lower().split())
+        if keyword:
+            keyword_grams = query_grams(keyword)
+            hits: Counter[int] = Counter()
+            for gram in keyword_grams:
+                matched = self._postings.get(gram, set())
+                if keyword.isascii():
+                    matched = matched | self._initial_postings.get(gram, set())
+                hits.update(matched)
+            total = len(keyword_grams)
+            ranked = sorted(
+                (-self._score(index, keyword, count, total), index)
+                for index, count in hits.items()
+                if count >= MIN_SCORE * total
+            )
+            candidates = [index for _, index in ranked]
+        else:
+            candidates = list(range(len(self.courses)))
+
+        mask = time_mask(day, period) if day or period else 0
+        results = []
+        for index in candidates:
+            course = self.courses[index]
+            if mask and not self._slots[index] & mask:
+                continue
+            if teacher and teacher not in course["information"]:
+                continue
+            results.append(course)
+            if limit and len(results) >= limit:
+                break
+        return results
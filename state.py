@@ -0,0 +1,231 @@
+import json
+import sqlite3
+import threading
+import time
+from collections.abc import Callable
+from functools import wraps
+
+from engine import group_courses
+from tools import Outcome
+
+DEFAULT_STATE_PATH = "state.db"
+PENDING = "pending"
+SENDING = "sending"
+SUCCEEDED = "succeeded"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS courses (
+    id TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    status TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS attempts (
+    id INTEGER PRIMARY KEY,
+    course_id TEXT NOT NULL,
+    sent_at REAL NOT NULL,
+    finished_at REAL,
+    succeeded INTEGER
+);
+CREATE TABLE IF NOT EXISTS session (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+class StateStore:
+    """保存抢课状态的 SQLite 数据库
+
+    每门课程的状态、每次选课尝试的发送与返回时刻，以及当前会话的 Cookie
+    都在发生变化时立即以一个小事务写入，程序被强制结束也不会丢失已有的结果。
+    courses.json 与 .env 仍只在程序正常结束时更新，之后数据库中的课程与 Cookie
+    会被清空；再次运行时如果数据库中仍有课程，说明上次运行没有正常结束，
+    已经选上的课程不再重新抢。
+
+    数据库使用 WAL 模式且 synchronous=NORMAL，提交时不等待刷盘，
+    写入一次状态只需几十微秒，可以放在发送请求的路径上；
+    这种模式能保证进程崩溃后数据完整，但不保证断电时最后几个事务不丢失。
+
+    课程的状态为 pending（尚未选上）、sending（请求已发出但未返回）
+    或 succeeded（已选上）。对冲与同组备选课程可能使同一门课程同时有多个
+    尝试在途，因此 succeeded 一旦写入就不再改变；某个尝试失败时，
+    只有该课程没有其他未返回的尝试才回到 pending。
+    """
+
+    def __init__(self, path: str = DEFAULT_STATE_PATH):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        self._cookies = self.cookies()
+
+    def _execute(self, sql: str, parameters: tuple = ()) -> sqlite3.Cursor:
+        with self._lock, self._conn:
+            return self._conn.execute(sql, parameters)
+
+    def resume(self, courses: list[dict[str, str]]) -> list[dict[str, str]]:
+        """从上次未正常结束的运行中恢复，返回仍需抢的课程
+
+        courses 中新增的课程记为 pending，已记录的课程保留原有状态；
+        已选上的课程及其同组的备选课程不再需要抢。
+
+        Args:
+            courses (list[dict[str, str]]): courses.json 中的课程列表
+
+        Returns:
+            list[dict[str, str]]: 仍需抢的课程，保持原有顺序
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            # 上次运行中没有返回的尝试不会再返回，结果记为未知
+            self._conn.execute(
+                "UPDATE attempts SET finished_at = ? WHERE finished_at IS NULL", (now,)
+            )
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO courses VALUES (?, ?, ?, ?)",
+                [
+                    (course["id"], json.dumps(course, ensure_ascii=False), PENDING, now)
+                    for course in courses
+                ],
+            )
+        return self.unsuccessful(courses)
+
+    def statuses(self) -> dict[str, str]:
+        """返回所有已记录课程的状态"""
+        with self._lock:
+            rows = self._conn.execute("SELECT id, status FROM courses").fetchall()
+        return dict(rows)
+
+    def unsuccessful(self, courses: list[dict[str, str]]) -> list[dict[str, str]]:
+        """返回 courses 中没有任何一门课程选上的组中的全部课程
+
+        Args:
+            courses (list[dict[str, str]]): 课程列表
+
+        Returns:
+            list[dict[str, str]]: 未被满足的组中的全部课程，保持原有顺序
+        """
+        statuses = self.statuses()
+        satisfied = {
+            course["id"]
+            for group in group_courses(courses)
+            if any(statuses.get(c["id"]) == SUCCEEDED for c in group.courses)
+            for course in group.courses
+        }
+        return [course for course in courses if course["id"] not in satisfied]
+
+    def begin(self, course: dict[str, str]) -> int:
+        """记录即将发送一次选课请求
+
+        Args:
+            course (dict[str, str]): 课程信息字典
+
+        Returns:
+            int: 尝试的编号，请求返回后传给 finish
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE courses SET status = ?, updated_at = ? "
+                + "WHERE id = ? AND status != ?",
+                (SENDING, now, course["id"], SUCCEEDED),
+            )
+            cursor = self._conn.execute(
+                "INSERT INTO attempts (course_id, sent_at) VALUES (?, ?)",
+                (course["id"], now),
+            )
+        assert cursor.lastrowid is not None
+        return cursor.lastrowid
+
+    def finish(self, attempt: int, course: dict[str, str], succeeded: bool) -> None:
+        """记录一次选课请求的结果
+
+        Args:
+            attempt (int): begin 返回的尝试编号
+            course (dict[str, str]): 课程信息字典
+            succeeded (bool): 是否选课成功
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE attempts SET finished_at = ?, succeeded = ? WHERE id = ?",
+                (now, succeeded, attempt),
+            )
+            if succeeded:
+                self._conn.execute(
+                    "UPDATE courses SET status = ?, updated_at = ? WHERE id = ?",
+                    (SUCCEEDED, now, course["id"]),
+                )
+                return
+            self._conn.execute(
+                "UPDATE courses SET status = CASE WHEN EXISTS ("
+                + "SELECT 1 FROM attempts WHERE course_id = ? AND finished_at IS NULL"
+                + ") THEN ? ELSE ? END, updated_at = ? WHERE id = ? AND status != ?",
+                (course["id"], SENDING, PENDING, now, course["id"], SUCCEEDED),
+            )
+
+    def track(
+        self, send: Callable[..., Outcome], cookies: Callable[[], str]
+    ) -> Callable[..., Outcome]:
+        """包装发送选课请求的函数，记录每次尝试及其结果
+
+        每次请求返回后，如果会话的 Cookie 发生了变化（例如重新登录）也一并保存。
+
+        Args:
+            send (Callable[..., Outcome]): 发送一次选课请求的函数
+            cookies (Callable[[], str]): 返回当前 Cookie 字符串的函数
+
+        Returns:
+            Callable[..., Outcome]: 与 send 用法相同的函数
+        """
+
+        @wraps(send)
+        def tracked(course: dict[str, str], *args, **kwargs) -> Outcome:
+            attempt = self.begin(course)
+            status = Outcome.TRANSIENT
+            try:
+                status = send(course, *args, **kwargs)
+                return status
+            finally:
+                self.finish(attempt, course, status is Outcome.SUCCESS)
+                self.save_cookies(cookies())
+
+        return tracked
+
+    def cookies(self) -> str | None:
+        """返回上次运行保存的 Cookie，没有时返回 None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM session WHERE key = 'cookies'"
+            ).fetchone()
+        return row[0] if row else None
+
+    def save_cookies(self, cookies: str) -> None:
+        """保存当前会话的 Cookie，与上次保存的相同时不写入"""
+        if cookies == self._cookies:
+            return
+        self._cookies = cookies
+        self._execute(
+            "INSERT OR REPLACE INTO session VALUES ('cookies', ?)", (cookies,)
+        )
+
+    def in_flight(self) -> list[str]:
+        """返回请求已发出但尚未返回的课程 id"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id FROM courses WHERE status = ?", (SENDING,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def complete(self) -> None:
+        """courses.json 与 .env 已经保存，清空课程状态与 Cookie，保留尝试记录"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM courses")
+            self._conn.execute("DELETE FROM session")
+        self._cookies = None
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
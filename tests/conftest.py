@@ -0,0 +1,45 @@
+import os
+
+import pytest
+
+from mock_server import ACADEMIC_YEAR, TERM, MockConfig, MockServer, MockState
+
+# tools 在导入时读取 JW_BASE_URL 与 IDS_BASE_URL，因此模拟服务器要在导入
+# 任何测试模块之前启动，所有测试共用这一个服务器
+_server = MockServer(MockConfig())
+_server.start()
+os.environ["JW_BASE_URL"] = _server.base_url
+os.environ["IDS_BASE_URL"] = _server.base_url
+
+
+@pytest.fixture
+def mock() -> MockServer:
+    """每个测试使用全新状态的模拟服务器，测试可以修改 mock.state.config"""
+    _server.state = MockState(MockConfig())
+    return _server
+
+
+@pytest.fixture
+def session(mock: MockServer):
+    """已登录模拟服务器的 HTTP 会话"""
+    from client import HunterSession
+    from tools import fetch_login_form, submit_login_form
+
+    config = mock.state.config
+    cookies = submit_login_form(fetch_login_form(config.username, config.password))
+    session = HunterSession(cookies)
+    session.relogin = lambda: submit_login_form(
+        fetch_login_form(config.username, config.password)
+    )
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def time_info() -> dict[str, str]:
+    return {
+        "current_academic_year": ACADEMIC_YEAR,
+        "current_term": TERM,
+        "academic_year": ACADEMIC_YEAR,
+        "term": TERM,
+    }
@@ -0,0 +1,60 @@
+import os
+
+import pytest
+
+from catalog import StreamingCatalog, get_cache_path, prefetch_catalog, read_cache
+from mock_server import MockHandler
+
+TIME_INFO = {"academic_year": "2025-2026", "term": "1"}
+CATEGORY = {"code": "ty", "name": "体育"}
+
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    """缓存目录是相对路径，每个测试在独立的临时目录中运行"""
+    monkeypatch.chdir(tmp_path)
+
+
+def stream(courses: list[dict[str, str]], complete: bool):
+    yield from courses
+    return complete
+
+
+def test_streaming_catalog_caches_complete_stream():
+    path = get_cache_path(CATEGORY, TIME_INFO)
+    catalog = StreamingCatalog(stream([{"id": "1"}, {"id": "2"}], True), path)
+    assert [c["id"] for c in catalog] == ["1", "2"]
+    assert catalog.complete
+    assert read_cache(path, 60) == [{"id": "1"}, {"id": "2"}]
+    # 再次遍历只读取已经解析出的课程
+    assert [c["id"] for c in catalog] == ["1", "2"]
+
+
+def test_streaming_catalog_skips_cache_for_truncated_stream():
+    path = get_cache_path(CATEGORY, TIME_INFO)
+    catalog = StreamingCatalog(stream([{"id": "1"}], False), path)
+    assert [c["id"] for c in catalog] == ["1"]
+    assert not catalog.complete
+    assert not os.path.exists(path)
+
+
+def test_prefetch_does_not_cache_category_with_failed_page(
+    session, time_info, monkeypatch
+):
+    handle_courses = MockHandler.handle_courses
+
+    def fail_second_page(handler, form, session_id):
+        if form.get("p_xkfsdm") == "ty" and form.get("pageNum") == "2":
+            handler.reply(500, "Internal Server Error")
+            return "error"
+        return handle_courses(handler, form, session_id)
+
+    monkeypatch.setattr(MockHandler, "handle_courses", fail_second_page)
+    categories = [CATEGORY, {"code": "yy", "name": "英语"}]
+    catalog = prefetch_catalog(categories, time_info, session, 4, page_size=8)
+
+    # 失败的分页重试后仍然失败，只返回获取到的部分且不写入缓存
+    assert len(catalog["ty"]) == 12
+    assert read_cache(get_cache_path(CATEGORY, time_info), 60) is None
+    assert len(catalog["yy"]) == 20
+    assert len(read_cache(get_cache_path(categories[1], time_info), 60) or []) == 20
@@ -0,0 +1,137 @@
+import asyncio
+import time
+
+from engine import AdaptivePacer, AttemptBudget, CourseGroup, RateLimiter, hunt_course
+from tools import Outcome
+
+
+def scripted(outcomes: dict[str, list[Outcome]], sent: list[str], delay: float = 0.0):
+    """按课程依次返回预设结果的 send，结果用完后一直返回 TRANSIENT"""
+
+    def send(course: dict[str, str]) -> Outcome:
+        sent.append(course["id"])
+        time.sleep(delay)
+        remaining = outcomes.get(course["id"])
+        return remaining.pop(0) if remaining else Outcome.TRANSIENT
+
+    return send
+
+
+def test_rate_limiter_releases_by_priority():
+    order = []
+
+    async def main():
+        limiter = RateLimiter(50)
+        await limiter.acquire()  # 用掉突发令牌，之后的请求需要排队
+
+        async def take(name: str, priority: tuple[int, ...]):
+            await limiter.acquire(priority)
+            order.append(name)
+
+        await asyncio.gather(take("low", (1,)), take("high", (0,)))
+
+    asyncio.run(main())
+    assert order == ["high", "low"]
+
+
+def test_rate_limiter_spaces_requests():
+    async def main() -> float:
+        limiter = RateLimiter(20)
+        start = time.monotonic()
+        for _ in range(5):
+            await limiter.acquire()
+        return time.monotonic() - start
+
+    # 第一个令牌是突发令牌，之后每个间隔 1 / 20 秒
+    assert asyncio.run(main()) >= 4 / 20 * 0.9
+
+
+def test_adaptive_pacer_backs_off_once_per_interval():
+    pacer = AdaptivePacer(initial_rate=20, min_rate=1, max_rate=40, backoff=0.5)
+    pacer.observe(True)
+    assert pacer.rate == 10
+    # 同一批在途请求的限流响应不会连续降速
+    pacer.observe(True)
+    assert pacer.rate == 10
+
+
+def test_adaptive_pacer_stays_within_bounds():
+    pacer = AdaptivePacer(initial_rate=100, min_rate=1, max_rate=5, increase=100)
+    assert pacer.rate == 5
+    pacer.observe(False)
+    assert pacer.rate == 5
+    pacer = AdaptivePacer(initial_rate=1, min_rate=1, max_rate=5)
+    pacer.observe(True)
+    assert pacer.rate == 1
+
+
+def test_hunt_course_stops_on_permanent_and_returns_budget():
+    sent = []
+    send = scripted({"a": [Outcome.PERMANENT]}, sent)
+    budget = AttemptBudget()
+    outcome = asyncio.run(
+        hunt_course({"id": "a"}, send, RateLimiter(0), RateLimiter(0), 3, budget=budget)
+    )
+    assert outcome is Outcome.PERMANENT
+    assert sent == ["a"]
+    assert budget.spare == 2
+
+
+def test_throttled_retries_do_not_drain_budget():
+    sent = []
+    outcomes = [Outcome.TRANSIENT] * 3 + [Outcome.THROTTLED] * 2
+    send = scripted({"a": outcomes}, sent)
+    budget = AttemptBudget()
+    budget.release(2)
+    asyncio.run(
+        hunt_course({"id": "a"}, send, RateLimiter(0), RateLimiter(0), 3, budget=budget)
+    )
+    # 借来的第一次尝试被限流两次后仍然有效，两次借用都换来了真正的尝试
+    assert len(sent) == 3 + 2 + 2
+    assert budget.spare == 0
+
+
+def test_group_sends_alternate_only_after_failure():
+    sent = []
+    send = scripted({"a": [Outcome.TRANSIENT], "b": [Outcome.SUCCESS]}, sent, 0.02)
+    a, b = {"id": "a"}, {"id": "b"}
+    group = CourseGroup("g", [a, b])
+
+    async def main():
+        limiter = RateLimiter(0)
+        return await asyncio.gather(
+            *(
+                hunt_course(course, send, RateLimiter(0), limiter, 3, group=group)
+                for course in (a, b)
+            )
+        )
+
+    asyncio.run(main())
+    assert sent == ["a", "b"]
+    assert group.satisfied
+
+
+def test_waiting_alternate_does_not_take_global_tokens():
+    """排在组锁后面的备选课程不应占用全局令牌"""
+    sent = []
+    send = scripted({}, sent, 0.2)
+    a, b = {"id": "a"}, {"id": "b"}
+    group = CourseGroup("g", [a, b])
+
+    async def main():
+        limiter = RateLimiter(10)
+        tasks = [
+            asyncio.create_task(
+                hunt_course(course, send, RateLimiter(0), limiter, 1, group=group)
+            )
+            for course in (a, b)
+        ]
+        await asyncio.sleep(0.01)
+        # a 在途、b 在等组锁，下一个全局令牌应当直接分给其他组的请求
+        start = time.monotonic()
+        await limiter.acquire()
+        waited = time.monotonic() - start
+        await asyncio.gather(*tasks)
+        return waited
+
+    assert asyncio.run(main()) < 0.15
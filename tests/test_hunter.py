@@ -0,0 +1,70 @@
+import json
+
+import pytest
+import requests
+
+import hunter
+from mock_server import ACADEMIC_YEAR, TERM
+from state import StateStore
+
+COURSES = [
+    {
+        "id": f"ty{i:04d}",
+        "name": f"体育课程{i}",
+        "information": "",
+        "code": "ty",
+        "academic_year": ACADEMIC_YEAR,
+        "term": TERM,
+    }
+    for i in range(2)
+]
+
+
+@pytest.fixture
+def account(mock, tmp_path, monkeypatch):
+    """在临时目录中准备一个账号的 .env 与 courses.json"""
+    monkeypatch.chdir(tmp_path)
+    config = mock.state.config
+    (tmp_path / ".env").write_text(
+        f'USERNAME="{config.username}"\nPASSWORD="{config.password}"\n'
+    )
+    (tmp_path / "courses.json").write_text(json.dumps(COURSES, ensure_ascii=False))
+    return tmp_path
+
+
+def hunt() -> hunter.HuntResult:
+    return hunter.hunt_account(is_immediate_start=True, quiet=True, fps=0)
+
+
+def test_normal_run_saves_results_and_clears_state(account):
+    result = hunt()
+    assert result.unsuccessful == []
+    assert json.loads((account / "courses.json").read_text()) == []
+    store = StateStore("state.db")
+    assert store.statuses() == {}
+    store.close()
+
+
+def test_crash_keeps_unfinished_courses_and_state(account, monkeypatch):
+    def crash(courses, session, *args):
+        send = args[5]
+        send(courses[0])
+        raise requests.ConnectionError("连接被重置")
+
+    monkeypatch.setattr(hunter, "run_course_hunter", crash)
+    with pytest.raises(requests.ConnectionError):
+        hunt()
+
+    # 已经选上的课程照常移除，其余课程与状态数据库都保留给下次运行
+    saved = json.loads((account / "courses.json").read_text())
+    assert [course["id"] for course in saved] == ["ty0001"]
+    store = StateStore("state.db")
+    assert store.resume(COURSES) == [COURSES[1]]
+    store.close()
+
+
+def test_config_error_keeps_courses(account):
+    (account / ".env").write_text('START_TIME="not a time"\n')
+    result = hunt()
+    assert result.error is not None
+    assert json.loads((account / "courses.json").read_text()) == COURSES
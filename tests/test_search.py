@@ -0,0 +1,51 @@
+import pytest
+
+from search import SearchIndex, initials, parse_query
+
+COURSES = [
+    {"id": "1", "name": "高等数学A", "information": "[1-16周] 星期一 第1-2节\n张三"},
+    {"id": "2", "name": "大学物理", "information": "[1-16周] 星期三 第3-4节\n李四"},
+    {"id": "3", "name": "线性代数", "information": "[1-16周] 星期一 第5-6节\n李四"},
+    {"id": "4", "name": "数学建模", "information": "[1-16周] 星期五 第1-2节\n王五"},
+]
+
+
+@pytest.fixture(scope="module")
+def index() -> SearchIndex:
+    return SearchIndex(COURSES)
+
+
+def ids(courses: list[dict[str, str]]) -> list[str]:
+    return [course["id"] for course in courses]
+
+
+def test_initials():
+    assert initials("高等数学A") == "gdsxa"
+
+
+def test_parse_query_extracts_filters():
+    assert parse_query("数学 周一 第2节 @张三") == ("数学", 1, 2, "张三")
+    assert parse_query("星期日") == ("", 7, None, None)
+
+
+def test_search_by_pinyin_initials(index):
+    assert ids(index.search("gdsx")) == ["1"]
+
+
+def test_search_ranks_name_matches_first(index):
+    assert ids(index.search("数学"))[:2] == ["1", "4"]
+
+
+def test_search_tolerates_a_typo(index):
+    assert ids(index.search("大学物力"))[0] == "2"
+
+
+def test_search_filters_by_day_period_and_teacher(index):
+    assert ids(index.search("周一")) == ["1", "3"]
+    assert ids(index.search("周一 第5节")) == ["3"]
+    assert ids(index.search("@李四")) == ["2", "3"]
+    assert ids(index.search("数学 @王五")) == ["4"]
+
+
+def test_search_limit(index):
+    assert len(index.search("", limit=2)) == 2
@@ -0,0 +1,89 @@
+import pytest
+
+from state import PENDING, SUCCEEDED, StateStore
+from tools import Outcome
+
+A = {"id": "a", "name": "A", "group": "g"}
+B = {"id": "b", "name": "B", "group": "g"}
+C = {"id": "c", "name": "C"}
+
+
+@pytest.fixture
+def path(tmp_path) -> str:
+    return str(tmp_path / "state.db")
+
+
+@pytest.fixture
+def store(path):
+    store = StateStore(path)
+    store.resume([A, B, C])
+    yield store
+    store.close()
+
+
+def test_round_trip_skips_satisfied_group(store, path):
+    store.finish(store.begin(B), B, True)
+    store.finish(store.begin(C), C, False)
+    store.save_cookies("JSESSIONID=1")
+    store.close()
+
+    reopened = StateStore(path)
+    assert reopened.cookies() == "JSESSIONID=1"
+    assert reopened.resume([A, B, C]) == [C]
+    assert reopened.statuses() == {"a": PENDING, "b": SUCCEEDED, "c": PENDING}
+    reopened.close()
+
+
+def test_success_is_final_with_overlapping_attempts(store):
+    first, second = store.begin(A), store.begin(A)
+    store.finish(second, A, True)
+    store.finish(first, A, False)
+    assert store.statuses()["a"] == SUCCEEDED
+    store.begin(A)
+    assert store.statuses()["a"] == SUCCEEDED
+
+
+def test_failure_keeps_sending_while_another_attempt_is_in_flight(store):
+    first, second = store.begin(C), store.begin(C)
+    store.finish(first, C, False)
+    assert store.in_flight() == ["c"]
+    store.finish(second, C, False)
+    assert store.statuses()["c"] == PENDING
+
+
+def test_resume_forgets_attempts_that_never_returned(store, path):
+    store.begin(C)
+    store.close()
+
+    reopened = StateStore(path)
+    assert reopened.resume([A, B, C]) == [A, B, C]
+    # 上次运行遗留的尝试不再阻止课程回到 pending
+    reopened.finish(reopened.begin(C), C, False)
+    assert reopened.statuses()["c"] == PENDING
+    reopened.close()
+
+
+def test_track_records_outcome_and_cookies(store):
+    cookies = iter(["JSESSIONID=2"])
+    send = store.track(lambda course: Outcome.SUCCESS, lambda: next(cookies))
+    assert send(C) is Outcome.SUCCESS
+    assert store.statuses()["c"] == SUCCEEDED
+    assert store.cookies() == "JSESSIONID=2"
+
+
+def test_track_records_failure_when_send_raises(store):
+    def send(course):
+        raise ConnectionError
+
+    tracked = store.track(send, lambda: "")
+    with pytest.raises(ConnectionError):
+        tracked(C)
+    assert store.statuses()["c"] == PENDING
+    assert store.unsuccessful([A, B, C]) == [A, B, C]
+
+
+def test_complete_clears_courses_and_cookies(store):
+    store.save_cookies("JSESSIONID=3")
+    store.complete()
+    assert store.statuses() == {}
+    assert store.cookies() is None
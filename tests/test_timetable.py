@@ -0,0 +1,47 @@
+from timetable import Timetable, parse_numbers, parse_timetable, slot_bit
+
+
+def course(course_id: str, information: str, group: str | None = None) -> dict:
+    result = {"id": course_id, "name": course_id, "information": information}
+    if group is not None:
+        result["group"] = group
+    return result
+
+
+def test_parse_numbers_ignores_out_of_range():
+    assert parse_numbers("1-3,5，21", 20) == [1, 2, 3, 5]
+
+
+def test_parse_timetable_weeks_day_and_periods():
+    slots = parse_timetable("[1-16周] 星期一 第1-2节")
+    assert bin(slots).count("1") == 16 * 2
+    assert slots & slot_bit(16, 1, 2)
+    assert not slots & slot_bit(17, 1, 1)
+    assert not slots & slot_bit(1, 2, 1)
+
+
+def test_parse_timetable_parity_and_multiple_sessions():
+    slots = parse_timetable("[1-8单周] 星期三 第3-4节\n[2-8双周] 周五 第5节")
+    assert slots & slot_bit(1, 3, 3) and not slots & slot_bit(2, 3, 3)
+    assert slots & slot_bit(2, 5, 5) and not slots & slot_bit(1, 5, 5)
+
+
+def test_parse_timetable_defaults_to_all_weeks_and_ignores_unknown_text():
+    assert bin(parse_timetable("星期日 第1节")).count("1") == 20
+    assert parse_timetable("时间待定") == 0
+
+
+def test_conflicts_lists_overlapping_courses():
+    monday = course("a", "[1-16周] 星期一 第1-2节")
+    tuesday = course("b", "[1-16周] 星期二 第1-2节")
+    timetable = Timetable([monday, tuesday])
+    assert timetable.conflicts(course("c", "[9-10周] 星期一 第2节")) == [monday]
+    assert timetable.conflicts(course("d", "[17-18周] 星期一 第1节")) == []
+
+
+def test_conflicts_ignores_same_course_and_alternates():
+    selected = course("a", "[1-16周] 星期一 第1-2节", group="pe")
+    timetable = Timetable([selected])
+    assert timetable.conflicts(selected) == []
+    assert timetable.conflicts(course("b", "[1-16周] 星期一 第1节", "pe")) == []
+    assert timetable.conflicts(course("c", "[1-16周] 星期一 第1节", "x")) == [selected]
@@ -0,0 +1,136 @@
+import json
+
+import pytest
+
+from mock_server import ACADEMIC_YEAR, TERM
+from tools import (
+    Outcome,
+    add_course,
+    classify_response,
+    get_courses,
+    iter_json_array,
+    query_courses,
+)
+
+DOCUMENT = {"kxrwList": {"list": [{"id": "1", "kcmc": "高等数学"}, {"id": "2"}]}}
+
+
+def chunked(data: bytes, size: int) -> list[bytes]:
+    return [data[i : i + size] for i in range(0, len(data), size)]
+
+
+@pytest.mark.parametrize("size", [1, 3, 7, 1024])
+def test_iter_json_array_across_chunk_boundaries(size):
+    data = json.dumps(DOCUMENT, ensure_ascii=False).encode("utf-8")
+    # 大小为 1 的块会把多字节的汉字拆开
+    elements = iter_json_array(chunked(data, size), "list")
+    assert list(elements) == DOCUMENT["kxrwList"]["list"]
+
+
+def test_iter_json_array_returns_document_without_array():
+    elements = iter_json_array(
+        [b'{"message": "', b'\xe9\x94\x99\xe8\xaf\xaf"}'], "list"
+    )
+    with pytest.raises(StopIteration) as stop:
+        next(elements)
+    assert stop.value.value == {"message": "错误"}
+
+
+def test_iter_json_array_rejects_truncated_array():
+    data = json.dumps(DOCUMENT).encode("utf-8")
+    elements = iter_json_array(chunked(data[:-10], 8), "list")
+    assert next(elements) == {"id": "1", "kcmc": "高等数学"}
+    with pytest.raises(ValueError):
+        list(elements)
+
+
+def drain(generator) -> tuple[list, object]:
+    """读完生成器，返回产生的元素与其返回值"""
+    items = []
+    while True:
+        try:
+            items.append(next(generator))
+        except StopIteration as stop:
+            return items, stop.value
+
+
+def test_iter_courses_reports_complete_stream(session, time_info):
+    category = {"code": "ty", "name": "体育"}
+    courses, complete = drain(get_courses(category, time_info, session, "", True))
+    assert complete is True
+    assert len(courses) == 20
+    assert courses[0]["information"].startswith("[1-16周] 星期一")
+
+
+def test_iter_courses_reports_server_error(session, time_info):
+    category = {"code": "missing", "name": "不存在"}
+    courses, complete = drain(get_courses(category, time_info, session, "", True))
+    assert courses == []
+    assert complete is False
+
+
+def test_query_courses_pages_and_failures(session, time_info):
+    category = {"code": "ty", "name": "体育"}
+    page = query_courses(category, time_info, session, "", 2, 8)
+    assert page is not None
+    courses, total = page
+    assert [course["id"] for course in courses] == [f"ty{i:04d}" for i in range(8, 16)]
+    assert total == 20
+    missing = {"code": "missing", "name": "不存在"}
+    assert query_courses(missing, time_info, session, "") is None
+
+
+@pytest.mark.parametrize(
+    ("status_code", "message", "outcome"),
+    [
+        (200, "操作成功", Outcome.SUCCESS),
+        (200, "该课程已在已选课程中", Outcome.SUCCESS),
+        (200, "请求过于频繁，请稍后再试", Outcome.THROTTLED),
+        (200, "系统繁忙", Outcome.THROTTLED),
+        (200, "选课尚未开始", Outcome.TRANSIENT),
+        (200, "课容量已满", Outcome.TRANSIENT),
+        (200, "学分已满", Outcome.PERMANENT),
+        (200, "所选课程与已选课程上课时间冲突", Outcome.PERMANENT),
+        (200, "未知的提示", Outcome.TRANSIENT),
+        (429, "", Outcome.THROTTLED),
+        (503, "", Outcome.THROTTLED),
+        (500, "", Outcome.TRANSIENT),
+    ],
+)
+def test_classify_response(status_code, message, outcome):
+    assert classify_response(status_code, message) is outcome
+
+
+def mock_course(course_id: str) -> dict[str, str]:
+    return {
+        "id": course_id,
+        "name": course_id,
+        "information": "",
+        "code": course_id[:2],
+        "academic_year": ACADEMIC_YEAR,
+        "term": TERM,
+    }
+
+
+def test_add_course_outcomes(mock, session):
+    mock.state.config.conflicts = 1
+    assert add_course(mock_course("ty0000"), session) is Outcome.PERMANENT
+    assert add_course(mock_course("ty0001"), session) is Outcome.SUCCESS
+    assert add_course(mock_course("ty0001"), session) is Outcome.SUCCESS
+    assert add_course(mock_course("ty9999"), session) is Outcome.PERMANENT
+
+
+def test_add_course_reports_throttling(mock, session):
+    mock.state.config.throttle_interval = 60
+    throttled = []
+    add_course(mock_course("ty0001"), session, on_response=throttled.append)
+    outcome = add_course(mock_course("ty0002"), session, on_response=throttled.append)
+    assert outcome is Outcome.THROTTLED
+    assert throttled == [False, True]
+
+
+def test_add_course_relogins_when_cookie_expires(mock, session):
+    mock.state.sessions.clear()
+    expired = session.cookies_string
+    assert add_course(mock_course("ty0001"), session) is Outcome.SUCCESS
+    assert session.cookies_string != expired
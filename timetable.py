@@ -0,0 +1,112 @@
+import re
+from collections.abc import Iterable
+from functools import lru_cache
+
+MAX_WEEKS = 20
+DAYS_PER_WEEK = 7
+PERIODS_PER_DAY = 14
+WEEKDAYS = "一二三四五六日"
+
+# 依次匹配周次（如 [1-8,10-16单周]）、星期（如 星期一、周三）与节次（如 第3-4节）
+TOKEN_PATTERN = re.compile(
+    r"(?P<weeks>\d[\d,，、\-]*)(?P<parity>[单双])?\s*(?=周)"
+    r"|(?:星期|周)(?P<day>[一二三四五六日天])"
+    r"|第(?P<periods>\d[\d,，、\-\s]*)节"
+)
+
+
+def parse_numbers(spec: str, limit: int) -> list[int]:
+    """解析 1-8,10,12-16 形式的编号列表，超出 [1, limit] 的编号会被忽略"""
+    numbers = []
+    for part in re.split(r"[,，、\s]+", spec.strip()):
+        start, _, end = part.partition("-")
+        if not start.isdigit():
+            continue
+        last = int(end) if end.isdigit() else int(start)
+        numbers += [n for n in range(int(start), last + 1) if 1 <= n <= limit]
+    return numbers
+
+
+def slot_bit(week: int, day: int, period: int) -> int:
+    """返回第 week 周星期 day 第 period 节在位集中的位"""
+    return 1 << (
+        ((week - 1) * DAYS_PER_WEEK + (day - 1)) * PERIODS_PER_DAY + (period - 1)
+    )
+
+
+@lru_cache(maxsize=None)
+def parse_timetable(information: str) -> int:
+    """把课程信息中的上课时间解析为 周 × 星期 × 节次 的位集
+
+    依次读取周次、星期与节次，每遇到一个节次就把当前的周次与星期
+    对应的时间段加入位集；没有写明周次时视为所有周。
+    同一段文本只解析一次。
+
+    Args:
+        information (str): get_courses 返回的课程信息
+
+    Returns:
+        int: 每一位表示一节课的位集，无法识别上课时间时返回 0
+    """
+    slots = 0
+    weeks = list(range(1, MAX_WEEKS + 1))
+    day = None
+    for match in TOKEN_PATTERN.finditer(information):
+        if match["weeks"] is not None:
+            weeks = parse_numbers(match["weeks"], MAX_WEEKS)
+            if match["parity"]:
+                parity = 1 if match["parity"] == "单" else 0
+                weeks = [week for week in weeks if week % 2 == parity]
+        elif match["day"] is not None:
+            day = WEEKDAYS.index(match["day"].replace("天", "日")) + 1
+        elif day is not None:
+            for period in parse_numbers(match["periods"], PERIODS_PER_DAY):
+                for week in weeks:
+                    slots |= slot_bit(week, day, period)
+    return slots
+
+
+class Timetable:
+    """已选课程的课表，用于检查新课程是否与其冲突
+
+    所有已选课程的时间段合并在一个位集中，不冲突时只需一次按位与；
+    有冲突时才逐门查找与之冲突的课程。
+
+    Attributes:
+        slots (int): 所有已选课程占用的时间段
+    """
+
+    def __init__(self, courses: Iterable[dict[str, str]] = ()):
+        self.slots = 0
+        self._courses: list[tuple[int, dict[str, str]]] = []
+        for course in courses:
+            self.add(course)
+
+    def add(self, course: dict[str, str]) -> None:
+        """把一门课程加入课表"""
+        slots = parse_timetable(course["information"])
+        self.slots |= slots
+        self._courses.append((slots, course))
+
+    def conflicts(self, course: dict[str, str]) -> list[dict[str, str]]:
+        """返回与 course 上课时间冲突的已选课程
+
+        同一门课程以及与其同组的备选课程不算冲突。
+
+        Args:
+            course (dict[str, str]): 要检查的课程
+
+        Returns:
+            list[dict[str, str]]: 冲突的已选课程，没有冲突时为空列表
+        """
+        slots = parse_timetable(course["information"])
+        if not slots & self.slots:
+            return []
+        group = course.get("group")
+        return [
+            selected
+            for selected_slots, selected in self._courses
+            if slots & selected_slots
+            and selected["id"] != course["id"]
+            and (group is None or selected.get("group") != group)
+        ]
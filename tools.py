@@ -1,20 +1,41 @@
+import codecs
 import json
 import os
 import random
+import re
 import sys
 import time
 from base64 import b64encode
+from collections.abc import Callable, Generator, Iterable, Iterator
 from datetime import datetime
+from enum import Enum
+from urllib.parse import urlparse
 
 import requests
 from colorama import Fore
-from Crypto.Cipher import AES
-from Crypto.Util.Padding import pad
 from dotenv import dotenv_values
-from selectolax.parser import HTMLParser
+
+import console
+from client import HunterSession
+from timetable import Timetable, parse_numbers
 
 MAX_RETRIES = 3
+# 可通过环境变量指向本地的模拟服务器（见 mock_server.py）
+JW_BASE_URL = os.environ.get("JW_BASE_URL", "http://jw.hitsz.edu.cn")
+IDS_BASE_URL = os.environ.get("IDS_BASE_URL", "https://ids.hit.edu.cn")
+LOGIN_URL = f"{IDS_BASE_URL}/authserver/login"
+CAS_SERVICE_URL = f"{JW_BASE_URL}/casLogin"
+LOGIN_FORM_FIELDS = ("_eventId", "cllt", "dllt", "lt", "pwdEncryptSalt", "execution")
+SPIN_THRESHOLD = 0.02
+# addGouwuche 表示限流的状态码与提示信息关键词
+THROTTLE_STATUS_CODES = (429, 503)
+THROTTLE_KEYWORDS = ("频繁", "稍后再试", "繁忙")
+# addGouwuche 表示选课尚未开放的提示信息关键词
+NOT_OPEN_KEYWORDS = ("尚未开始", "未开始", "未开放", "不在选课时间")
+SUCCESS_MESSAGE = "操作成功"
 AES_CHARS = "ABCDEFGHJKMNPQRSTWXYZabcdefhijkmnprstwxyz2345678"
+# 流式读取 queryKxrw 响应时每次读取的字节数
+STREAM_CHUNK_SIZE = 64 * 1024
 
 
 def random_string(length: int) -> str:
@@ -45,6 +66,10 @@ def get_aes_string(data: str, key: str, iv: str) -> str:
     Returns:
         str: Base64 编码的密文。
     """
+    # 只有登录时才需要加密，延迟导入以加快启动
+    from Crypto.Cipher import AES
+    from Crypto.Util.Padding import pad
+
     key_bytes = key.encode("utf-8")
     iv_bytes = iv.encode("utf-8")
     data_bytes = data.encode("utf-8")
@@ -111,40 +136,143 @@ def display_categories(categories: list[dict[str, str]]) -> None:
 
 
 def handle_course_selection(
-    courses: list[dict[str, str]], selected_courses: list[dict[str, str]]
+    courses: Iterable[dict[str, str]],
+    selected_courses: list[dict[str, str]],
+    hide_conflicts: bool = False,
 ) -> bool:
     """处理用户的课程选择过程
 
     遍历课程列表，让用户对每门课程进行选择：
     - y: 添加到选课列表
+    - a: 作为上一门已选课程的备选添加，两者任意一门选上即可
     - n: 跳过当前课程
     - q: 退出选课过程
 
+    courses 可以是边下载边解析的迭代器，此时收到第一门课程就开始询问，
+    全部课程遍历完后才能知道课程总数。
+    与已选课程上课时间冲突的课程会在询问前给出提示。
+
     Args:
-        courses (list[dict[str, str]]): 可选课程列表
+        courses (Iterable[dict[str, str]]): 可选课程列表或迭代器
         selected_courses (list[dict[str, str]]): 已选课程列表
+        hide_conflicts (bool): 是否直接跳过与已选课程时间冲突的课程
 
     Returns:
         bool: 如果用户选择退出返回 True，否则返回 False
     """
-    if len(courses) == 0:
-        print(Fore.YELLOW + "未找到课程。" + Fore.RESET)
-        return False
+    if isinstance(courses, list):
+        if len(courses) == 0:
+            print(Fore.YELLOW + "未找到课程。" + Fore.RESET)
+            return False
+        print(Fore.GREEN + f"共找到 {len(courses)} 门课程。" + Fore.RESET)
 
-    print(Fore.GREEN + f"共找到 {len(courses)} 门课程。" + Fore.RESET)
+    timetable = Timetable(selected_courses)
+    count = 0
+    hidden = 0
     for course in courses:
+        count += 1
+        conflicts = timetable.conflicts(course)
+        if conflicts and hide_conflicts:
+            hidden += 1
+            continue
         name = course["name"]
         information = course["information"]
         print(Fore.CYAN + f"\n课程名称：{name}\n{information}" + Fore.RESET)
-        opt = input(Fore.WHITE + "是否选择该课程？(y/n/q) : " + Fore.RESET)
+        if conflicts:
+            names = "、".join(selected["name"] for selected in conflicts)
+            print(Fore.YELLOW + f"与已选课程时间冲突：{names}" + Fore.RESET)
+        opt = input(Fore.WHITE + "是否选择该课程？(y/a/n/q) : " + Fore.RESET)
         if opt == "y":
             selected_courses.append(course)
+            timetable.add(course)
             print(Fore.GREEN + "已添加到选课列表" + Fore.RESET)
+        elif opt == "a":
+            alternate = add_alternate(course, selected_courses)
+            if alternate is not None:
+                timetable.add(alternate)
         elif opt == "q":
             return True
+    if hidden:
+        print(Fore.YELLOW + f"已隐藏 {hidden} 门时间冲突的课程。" + Fore.RESET)
+    if not isinstance(courses, list):
+        if count == 0:
+            print(Fore.YELLOW + "未找到课程。" + Fore.RESET)
+        else:
+            print(Fore.GREEN + f"共 {count} 门课程。" + Fore.RESET)
     return False
 
 
+def add_alternate(
+    course: dict[str, str], selected_courses: list[dict[str, str]]
+) -> dict[str, str] | None:
+    """把课程作为上一门已选课程的备选加入已选课程列表
+
+    Args:
+        course (dict[str, str]): 要添加的课程
+        selected_courses (list[dict[str, str]]): 已选课程列表
+
+    Returns:
+        dict[str, str] | None: 加入列表的备选课程，还没有已选课程时返回 None
+    """
+    if not selected_courses:
+        print(Fore.YELLOW + "还没有已选课程，无法添加备选" + Fore.RESET)
+        return None
+    primary = selected_courses[-1]
+    group = primary.setdefault("group", primary["id"])
+    alternate = {**course, "group": group}
+    if "priority" in primary:
+        alternate["priority"] = primary["priority"]
+    selected_courses.append(alternate)
+    print(Fore.GREEN + f"已作为`{primary['name']}`的备选添加" + Fore.RESET)
+    return alternate
+
+
+def select_courses(
+    courses: list[dict[str, str]], selected_courses: list[dict[str, str]]
+) -> None:
+    """列出带编号的搜索结果，一次选择其中的多门课程
+
+    输入编号或范围（如 1,3,5-7）添加到选课列表，编号前加 a（如 a2）
+    则作为上一门已选课程的备选添加，直接回车不选择。
+
+    Args:
+        courses (list[dict[str, str]]): 按相关度排列的搜索结果
+        selected_courses (list[dict[str, str]]): 已选课程列表
+    """
+    if not courses:
+        print(Fore.YELLOW + "未找到课程。" + Fore.RESET)
+        return
+    timetable = Timetable(selected_courses)
+    for number, course in enumerate(courses, 1):
+        information = " ".join(course["information"].split())
+        conflict = "（时间冲突）" if timetable.conflicts(course) else ""
+        print(
+            Fore.CYAN
+            + f"{number:>3}. {course['name']}"
+            + Fore.RESET
+            + f"  {information}"
+            + Fore.YELLOW
+            + conflict
+            + Fore.RESET
+        )
+    opt = input(
+        Fore.WHITE
+        + "输入要选择的课程编号，如 1,3,5-7，编号前加 a 作为备选 (直接回车跳过) : "
+        + Fore.RESET
+    )
+    for token in re.split(r"[,，\s]+", opt.strip()):
+        alternate = token.startswith("a")
+        for number in parse_numbers(token.removeprefix("a"), len(courses)):
+            course = courses[number - 1]
+            if any(c["id"] == course["id"] for c in selected_courses):
+                print(Fore.YELLOW + f"`{course['name']}`已在选课列表中" + Fore.RESET)
+            elif alternate:
+                add_alternate(course, selected_courses)
+            else:
+                selected_courses.append(course)
+                print(Fore.GREEN + f"已添加`{course['name']}`" + Fore.RESET)
+
+
 def validate_time_format(time_str: str) -> bool:
     """验证时间字符串格式
 
@@ -163,13 +291,16 @@ def validate_time_format(time_str: str) -> bool:
         return False
 
 
-def load_config() -> dict[str, str]:
+def load_config(login: bool = True) -> dict[str, str]:
     """加载和验证配置信息
 
     从 .env 文件中加载配置信息，包括 Cookie 和开始时间等关键参数。
     如果 Cookie 不存在或为空，会自动调用 get_cookies() 获取新的 Cookie。
     会对 START_TIME 的格式进行验证，确保其符合 HH:MM:SS 格式。
 
+    Args:
+        login (bool): Cookie 不存在时是否登录，为 False 时由调用方负责获取 Cookie
+
     Returns:
         dict[str, str]: 包含配置信息的字典
 
@@ -183,7 +314,7 @@ def load_config() -> dict[str, str]:
     if start_time and not validate_time_format(start_time):
         raise ValueError("时间格式不正确，请检查 START_TIME 的值（格式：HH:MM:SS）")
 
-    if not cookies:
+    if not cookies and login:
         cookies = get_cookies()
         config["COOKIES"] = cookies
 
@@ -214,26 +345,8 @@ def load_courses() -> list[dict[str, str]]:
         raise FileNotFoundError("找不到文件 courses.json。请先运行 prepare.py。")
 
 
-def get_headers(cookies: str) -> dict[str, str]:
-    """生成 HTTP 请求头
-
-    根据提供的 Cookie 构造 HTTP 请求头字典。
-    使用预设的 User-Agent 确保请求行为与浏览器一致。
-
-    Args:
-        cookies (str): 用于身份验证的Cookie字符串
-
-    Returns:
-        dict[str, str]: 包含 User-Agent 和 Cookie 的请求头字典:
-    """
-    return {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36 Edg/131.0.0.0",
-        "Cookie": cookies,
-    }
-
-
 def save_results(
-    config: dict[str, str], headers: dict[str, str], courses: list[dict[str, str]]
+    config: dict[str, str], session: HunterSession, courses: list[dict[str, str]]
 ) -> None:
     """保存更新后的配置和课程信息
 
@@ -242,147 +355,241 @@ def save_results(
 
     Args:
         config (dict[str, str]): 配置信息字典
-        headers (dict[str, str]): 包含 Cookie 的请求头字典
+        session (HunterSession): 包含 Cookie 的 HTTP 会话
         courses (list[dict[str, str]]): 课程信息列表
     """
-    config["COOKIES"] = headers["Cookie"]
-    with open(".env", mode="w") as f:
+    config["COOKIES"] = session.cookies_string
+    # 先写入临时文件再替换，写到一半时退出也不会损坏原文件
+    with open(".env.tmp", mode="w") as f:
         for key, value in config.items():
             f.write(f'{key}="{value}"\n')
+    os.replace(".env.tmp", ".env")
 
-    with open("courses.json", "w") as f:
+    with open("courses.json.tmp", "w") as f:
         json.dump(courses, f, ensure_ascii=False, indent=4)
+    os.replace("courses.json.tmp", "courses.json")
 
 
-def wait_until_start(start_time: str) -> None:
-    """倒计时等待至指定时间
-
-    实现精确的定时等待功能，直到达到指定的开始时间。
-    会显示倒计时信息，每 0.1 秒更新一次。
-    如果当前时间已经超过目标时间，则立即开始执行。
+def get_start_timestamp(start_time: str) -> float:
+    """返回今天 start_time 时刻的时间戳
 
     Args:
-        start_time (str): 目标开始时间，格式为 "HH:MM:SS"
+        start_time (str): 时间字符串，格式为 "HH:MM:SS"
+
+    Returns:
+        float: 与 time.time 同一基准的时间戳
     """
-    now = datetime.now()
     time_parts = start_time.strip().split(":")
-    target_time = now.replace(
+    target_time = datetime.now().replace(
         hour=int(time_parts[0]),
         minute=int(time_parts[1]),
         second=int(time_parts[2]),
         microsecond=0,
     )
+    return target_time.timestamp()
+
 
-    time_delta = (target_time - now).total_seconds()
+def wait_until_start(
+    start_time: str,
+    clock_offset: float = 0.0,
+    lead_time: float = 0.0,
+    on_ready: Callable[[], None] | None = None,
+    ready_time: float = 0.0,
+    message: str = "开始抢课！",
+) -> None:
+    """倒计时等待至指定时间
 
-    if time_delta < 0:
+    实现精确的定时等待功能，直到达到指定的开始时间。
+    START_TIME 按服务器时间解释，通过 clock_offset 换算为本地时间，
+    并提前 lead_time 秒返回，使第一个请求恰好在目标时刻到达服务器。
+    距离目标较远时每 0.1 秒休眠并刷新倒计时，最后 SPIN_THRESHOLD 秒
+    改为忙等待，以获得亚毫秒级的唤醒精度。
+    距离目标不足 ready_time 秒时会调用一次 on_ready 完成开始前的准备。
+    如果当前时间已经超过目标时间，则立即开始执行。
+
+    Args:
+        start_time (str): 目标开始时间（服务器时间），格式为 "HH:MM:SS"
+        clock_offset (float): 服务器时间减去本地时间（秒）
+        lead_time (float): 提前返回的时间（秒）
+        on_ready (Callable[[], None] | None): 开始前的准备工作
+        ready_time (float): 提前多少秒执行 on_ready
+        message (str): 到达目标时刻前输出的提示
+    """
+    deadline = get_start_timestamp(start_time) - clock_offset - lead_time
+
+    if deadline - time.time() < 0:
         print(Fore.YELLOW + "目标时间已过，直接开始抢课！" + Fore.RESET)
         return
 
     while True:
-        remaining = (target_time - datetime.now()).total_seconds()
-        if remaining <= 0:
+        remaining = deadline - time.time()
+        if remaining <= SPIN_THRESHOLD:
             break
-        print(
-            Fore.CYAN + f"\r距离开始还有 {int(remaining)} 秒..." + Fore.RESET,
-            end="",
-            flush=True,
-        )
-        time.sleep(0.1)
+        if on_ready is not None and remaining <= ready_time:
+            on_ready()
+            on_ready = None
+            continue
+        console.countdown(remaining)
+        time.sleep(min(0.1, remaining - SPIN_THRESHOLD))
+
+    # perf_counter 精度远高于 time.time，忙等待时使用它计时
+    spin_deadline = time.perf_counter() + (deadline - time.time())
+    # 在忙等待之前输出，开始时刻之后不再进行任何终端输出
+    if not console.is_quiet():
+        print("\r" + " " * 50 + "\r", end="")  # 清除倒计时行
+        print(Fore.GREEN + message + Fore.RESET, flush=True)
+    while time.perf_counter() < spin_deadline:
+        pass
+
+
+class LoginForm:
+    """已解析、可直接提交的统一身份认证登录表单
+
+    Attributes:
+        session (requests.Session): 获取登录页面时使用的会话，保存了认证服务器的 Cookie
+        data (dict[str, str]): 登录表单数据，密码已使用页面中的盐值加密
+        fetched_at (float): 获取登录页面时的时间（time.monotonic）
+    """
 
-    print("\r" + " " * 50 + "\r", end="")  # 清除倒计时行
-    print(Fore.GREEN + "开始抢课！" + Fore.RESET)
+    def __init__(self, session: requests.Session, data: dict[str, str]):
+        self.session = session
+        self.data = data
+        self.fetched_at = time.monotonic()
 
 
-def get_cookies() -> str:
+def load_credentials() -> tuple[str, str]:
+    """从 .env 文件中读取统一身份认证用户名和密码
+
+    Returns:
+        tuple[str, str]: 用户名和密码
+    """
     config = dotenv_values(".env")
     username = config.get("USERNAME")
     password = config.get("PASSWORD")
     if username is None or password is None:
         print(Fore.RED + "请在 .env 文件中填写用户名和密码。" + Fore.RESET)
         sys.exit(1)
+    return username, password
 
-    session = requests.Session()
-    response = session.get(
-        "https://ids.hit.edu.cn/authserver/login",
-        params={"service": "http://jw.hitsz.edu.cn/casLogin"},
-    )
+
+def parse_login_form(html: str) -> dict[str, str]:
+    """解析统一身份认证登录页面中的表单字段
+
+    只遍历一次密码登录表单中的 input 元素，按 id 收集 LOGIN_FORM_FIELDS 中的字段。
+
+    Args:
+        html (str): 登录页面 HTML
+
+    Returns:
+        dict[str, str]: 字段 id 到 value 的映射
+
+    Raises:
+        ValueError: 找不到登录表单或缺少必要字段时抛出
+    """
     from selectolax.parser import HTMLParser
 
-    tree = HTMLParser(response.text)
+    tree = HTMLParser(html)
 
     selector = "div#pwdLoginDiv"
     node = tree.css_first(selector)
     if node is None:
         raise ValueError(f"找不到匹配选择器 '{selector}' 的元素")
 
-    event_id_selector = "input#_eventId"
-    event_id_node = node.css_first(event_id_selector)
-    if event_id_node is None:
-        raise ValueError(f"找不到匹配选择器 '{event_id_selector}' 的元素")
-
-    cllt_selector = "input#cllt"
-    cllt_node = node.css_first(cllt_selector)
-    if cllt_node is None:
-        raise ValueError(f"找不到匹配选择器 '{cllt_selector}' 的元素")
-
-    dllt_selector = "input#dllt"
-    dllt_node = node.css_first(dllt_selector)
-    if dllt_node is None:
-        raise ValueError(f"找不到匹配选择器 '{dllt_selector}' 的元素")
-
-    lt_selector = "input#lt"
-    lt_node = node.css_first(lt_selector)
-    if lt_node is None:
-        raise ValueError(f"找不到匹配选择器 '{lt_selector}' 的元素")
-
-    salt_selector = "input#pwdEncryptSalt"
-    salt_node = node.css_first(salt_selector)
-    if salt_node is None:
-        raise ValueError(f"找不到匹配选择器 '{salt_selector}' 的元素")
-
-    execution_selector = "input#execution"
-    execution_node = node.css_first(execution_selector)
-    if execution_node is None:
-        raise ValueError(f"找不到匹配选择器 '{execution_selector}' 的元素")
-
-    event_id = event_id_node.attributes["value"]
-    cllt = cllt_node.attributes["value"]
-    dllt = dllt_node.attributes["value"]
-    lt = lt_node.attributes["value"]
-    salt = salt_node.attributes["value"]
-    if salt is None:
+    fields = {}
+    for input_node in node.css("input"):
+        field_id = input_node.attributes.get("id")
+        if field_id in LOGIN_FORM_FIELDS:
+            fields[field_id] = input_node.attributes.get("value")
+
+    for field_id in LOGIN_FORM_FIELDS:
+        if field_id not in fields:
+            raise ValueError(f"找不到匹配选择器 'input#{field_id}' 的元素")
+    if fields["pwdEncryptSalt"] is None:
         raise ValueError("元素中没有 'value' 属性的值")
+    return fields
+
 
-    execution = execution_node.attributes["value"]
+def fetch_login_form(username: str, password: str) -> LoginForm:
+    """获取并解析登录页面，预先加密密码
 
-    encrypted_password = encrypt_password(password, salt)
-    session.post(
-        "https://ids.hit.edu.cn/authserver/login",
-        params={"service": "http://jw.hitsz.edu.cn/casLogin"},
-        data={
+    Args:
+        username (str): 统一身份认证用户名
+        password (str): 统一身份认证密码
+
+    Returns:
+        LoginForm: 可直接通过 submit_login_form 提交的登录表单
+    """
+    session = requests.Session()
+    response = session.get(LOGIN_URL, params={"service": CAS_SERVICE_URL})
+    fields = parse_login_form(response.text)
+    return LoginForm(
+        session,
+        {
             "username": username,
-            "password": encrypted_password,
+            "password": encrypt_password(password, fields["pwdEncryptSalt"]),
             "captcha": "",
-            "_eventId": event_id,
-            "cllt": cllt,
-            "dllt": dllt,
-            "lt": lt,
-            "execution": execution,
+            "_eventId": fields["_eventId"],
+            "cllt": fields["cllt"],
+            "dllt": fields["dllt"],
+            "lt": fields["lt"],
+            "execution": fields["execution"],
         },
     )
-    cookies = session.cookies.get_dict(domain="jw.hitsz.edu.cn")
+
+
+def submit_login_form(form: LoginForm) -> str:
+    """提交登录表单，获取教务系统 Cookie
+
+    Args:
+        form (LoginForm): 由 fetch_login_form 获取的登录表单
+
+    Returns:
+        str: 教务系统 Cookie 字符串
+    """
+    form.session.post(LOGIN_URL, params={"service": CAS_SERVICE_URL}, data=form.data)
+    cookies = form.session.cookies.get_dict(domain=urlparse(JW_BASE_URL).hostname)
     return f"route={cookies['route']}; JSESSIONID={cookies['JSESSIONID']}"
 
 
-def get_time_info(headers: dict[str, str], retry_count: int = 0) -> dict[str, str]:
+def get_cookies() -> str:
+    """登录统一身份认证，获取教务系统 Cookie
+
+    Returns:
+        str: 教务系统 Cookie 字符串
+    """
+    username, password = load_credentials()
+    return submit_login_form(fetch_login_form(username, password))
+
+
+def refresh_cookies(session: HunterSession, expired_cookies: str | None = None) -> None:
+    """为会话重新获取 Cookie
+
+    如果会话设置了 relogin（例如后台预取登录表单的 Reauthenticator），
+    优先使用它，否则执行完整的登录流程。
+    重新登录在会话的 refresh_lock 中进行；获得锁时如果会话的 Cookie
+    已经不是 expired_cookies，说明其他线程刚刚重新登录过，直接使用新的 Cookie，
+    因此多个请求同时发现 Cookie 过期时只会重新登录一次。
+
+    Args:
+        session (HunterSession): 需要更新 Cookie 的 HTTP 会话
+        expired_cookies (str | None): 发出过期请求时使用的 Cookie，
+            为 None 时总是重新登录
+    """
+    with session.refresh_lock:
+        if expired_cookies is not None and session.cookies_string != expired_cookies:
+            return
+        relogin = session.relogin if session.relogin is not None else get_cookies
+        session.cookies_string = relogin()
+
+
+def get_time_info(session: HunterSession, retry_count: int = 0) -> dict[str, str]:
     """获取当前及选课学年学期信息
 
     从教务系统获取当前的学年学期以及选课所属的学年学期信息。
     如果 Cookie 过期会自动重新获取。
 
     Args:
-        headers (dict[str, str]): 包含 Cookie 的 HTTP 请求头
+        session (HunterSession): 包含 Cookie 的 HTTP 会话
         retry_count (int): 当前重试次数
 
     Returns:
@@ -397,9 +604,14 @@ def get_time_info(headers: dict[str, str], retry_count: int = 0) -> dict[str, st
         MaxRetriesExceededError: 当重试次数超过最大限制时抛出
     """
     print(Fore.CYAN + "正在获取时间信息..." + Fore.RESET)
-    url = "http://jw.hitsz.edu.cn/Xsxk/queryXkdqXnxq"
+    url = f"{JW_BASE_URL}/Xsxk/queryXkdqXnxq"
     data = {"mxpylx": "1"}
-    response = requests.post(url, headers=headers, data=data)
+    cookies = session.cookies_string
+    try:
+        response = session.post(url, data=data)
+    except requests.RequestException as e:
+        print(Fore.RED + f"请求异常：{e}" + Fore.RESET)
+        return {}
     if response.status_code == 200:
         if "application/json" in response.headers["Content-Type"]:
             response_json: dict = response.json()
@@ -424,8 +636,8 @@ def get_time_info(headers: dict[str, str], retry_count: int = 0) -> dict[str, st
             if retry_count >= MAX_RETRIES:
                 raise MaxRetriesExceededError(MAX_RETRIES)
 
-            headers["Cookie"] = get_cookies()
-            return get_time_info(headers, retry_count + 1)
+            refresh_cookies(session, cookies)
+            return get_time_info(session, retry_count + 1)
         else:
             print(Fore.RED + "响应内容不是有效的 JSON 格式" + Fore.RESET)
     else:
@@ -434,13 +646,13 @@ def get_time_info(headers: dict[str, str], retry_count: int = 0) -> dict[str, st
 
 
 def get_course_categories(
-    time_info: dict[str, str], headers: dict[str, str], retry_count: int = 0
+    time_info: dict[str, str], session: HunterSession, retry_count: int = 0
 ) -> list[dict[str, str]]:
     """获取课程类别列表
 
     Args:
         time_info (dict[str, str]): 学年学期信息字典
-        headers (dict[str, str]): HTTP 请求头字典
+        session (HunterSession): 包含 Cookie 的 HTTP 会话
         retry_count (int): 当前重试次数
 
     Returns:
@@ -450,12 +662,17 @@ def get_course_categories(
         MaxRetriesExceededError: 当重试次数超过最大限制时抛出
     """
     print(Fore.CYAN + "正在获取课程类别..." + Fore.RESET)
-    url = "http://jw.hitsz.edu.cn/Xsxk/queryYxkc"
+    url = f"{JW_BASE_URL}/Xsxk/queryYxkc"
     data = {
         "p_xn": time_info["academic_year"],
         "p_xq": time_info["term"],
     }
-    response = requests.post(url=url, headers=headers, data=data)
+    cookies = session.cookies_string
+    try:
+        response = session.post(url, data=data)
+    except requests.RequestException as e:
+        print(Fore.RED + f"请求异常：{e}" + Fore.RESET)
+        return []
     if response.status_code == 200:
         if "application/json" in response.headers["Content-Type"]:
             response_json: dict = response.json()
@@ -474,8 +691,8 @@ def get_course_categories(
             if retry_count >= MAX_RETRIES:
                 raise MaxRetriesExceededError(MAX_RETRIES)
 
-            headers["Cookie"] = get_cookies()
-            return get_course_categories(time_info, headers, retry_count + 1)
+            refresh_cookies(session, cookies)
+            return get_course_categories(time_info, session, retry_count + 1)
         else:
             print(Fore.RED + "响应内容不是有效的 JSON 格式" + Fore.RESET)
     else:
@@ -486,9 +703,10 @@ def get_course_categories(
 def get_courses(
     category: dict[str, str],
     time_info: dict[str, str],
-    headers: dict[str, str],
+    session: HunterSession,
     keyword: str,
-) -> list[dict[str, str]]:
+    stream: bool = False,
+) -> list[dict[str, str]] | Generator[dict[str, str], None, bool]:
     """根据类别和关键词搜索课程
 
     获取指定类别下符合关键词的可选课程列表。
@@ -497,20 +715,19 @@ def get_courses(
     Args:
         category (dict[str, str]): 包含课程类别代码和名称的字典
         time_info (dict[str, str]): 学年学期信息字典
-        headers (dict[str, str]): HTTP 请求头字典
+        session (HunterSession): 包含 Cookie 的 HTTP 会话
         keyword (str): 搜索关键词，可以为空字符串
+        stream (bool): 是否返回边下载边解析的迭代器，见 iter_courses
 
     Returns:
-        list[dict[str, str]]: 课程列表，每个课程包含:
+        list[dict[str, str]] | Generator[dict[str, str], None, bool]: 课程列表或迭代器，
+            每个课程包含:
             - id (str): 课程唯一标识
             - name (str): 课程名称（包含体育项目名称）
             - information (str): 课程详细信息（包括上课时间、地点、教师等）
             - code (str): 课程类别代码
             - academic_year (str): 学年
             - term (str): 学期
-
-    Raises:
-        ValueError: 当服务器响应不是有效的 JSON 格式时抛出
     """
     if keyword == "":
         print(Fore.CYAN + f"正在获取`{category['name']}`类别下所有课程..." + Fore.RESET)
@@ -520,7 +737,163 @@ def get_courses(
             + f"正在获取`{category['name']}`类别下关键词为`{keyword}`的课程..."
             + Fore.RESET
         )
-    url = "http://jw.hitsz.edu.cn/Xsxk/queryKxrw"
+    if stream:
+        return iter_courses(category, time_info, session, keyword)
+    page = query_courses(category, time_info, session, keyword)
+    return page[0] if page is not None else []
+
+
+def iter_json_array(chunks: Iterable[bytes], key: str) -> Iterator:
+    """从分块到达的 JSON 文本中逐个解析第一个名为 key 的数组中的元素
+
+    只保留尚未解析的文本，解析出一个元素就立即返回，无需等待整个响应体。
+
+    Args:
+        chunks (Iterable[bytes]): 按顺序到达的 UTF-8 字节块
+        key (str): 数组对应的键名
+
+    Yields:
+        数组中的元素
+
+    Returns:
+        文档中没有该数组时返回解析后的整个文档，否则返回 None
+
+    Raises:
+        ValueError: 当内容不是有效的 JSON 或在数组结束前中断时抛出
+    """
+    decoder = json.JSONDecoder()
+    text = codecs.getincrementaldecoder("utf-8")()
+    start = re.compile(rf'"{re.escape(key)}"\s*:\s*\[')
+    chunks = iter(chunks)
+    buffer = ""
+    for chunk in chunks:
+        buffer += text.decode(chunk)
+        match = start.search(buffer)
+        if match is not None:
+            buffer = buffer[match.end() :]
+            break
+    else:
+        return json.loads(buffer + text.decode(b"", final=True))
+
+    position = 0
+    while True:
+        while position < len(buffer) and buffer[position] in " \t\r\n,":
+            position += 1
+        if position < len(buffer):
+            if buffer[position] == "]":
+                return None
+            try:
+                element, position = decoder.raw_decode(buffer, position)
+                yield element
+                continue
+            except json.JSONDecodeError:
+                pass  # 元素还没有完整到达
+        chunk = next(chunks, None)
+        if chunk is None:
+            raise ValueError("响应在课程列表结束前中断")
+        buffer = buffer[position:] + text.decode(chunk)
+        position = 0
+
+
+def iter_courses(
+    category: dict[str, str],
+    time_info: dict[str, str],
+    session: HunterSession,
+    keyword: str,
+) -> Generator[dict[str, str], None, bool]:
+    """流式请求 queryKxrw 接口，每解析出一门课程就立即返回
+
+    响应体按块读取并增量解析，内存中只保留尚未解析的部分，
+    课程详细信息也只在返回该课程前才解析。提前停止迭代时不会读取剩余的响应。
+    生成器的返回值（StopIteration.value）表示响应是否完整读取，
+    请求失败或响应被截断时已经返回的课程并不是完整的列表。
+
+    Args:
+        category (dict[str, str]): 包含课程类别代码和名称的字典
+        time_info (dict[str, str]): 学年学期信息字典
+        session (HunterSession): 包含 Cookie 的 HTTP 会话
+        keyword (str): 搜索关键词，可以为空字符串
+
+    Yields:
+        dict[str, str]: 课程信息字典，格式见 get_courses
+
+    Returns:
+        bool: 完整读取了课程列表返回 True，否则返回 False
+    """
+    url = f"{JW_BASE_URL}/Xsxk/queryKxrw"
+    data = get_query_data(category["code"], time_info, keyword)
+    try:
+        response = session.post(url, data=data, stream=True)
+    except requests.RequestException as e:
+        print(Fore.RED + f"请求异常：{e}" + Fore.RESET)
+        return False
+    with response:
+        if response.status_code != 200:
+            print(Fore.RED + f"请求失败，状态码：{response.status_code}" + Fore.RESET)
+            return False
+        elements = iter_json_array(response.iter_content(STREAM_CHUNK_SIZE), "list")
+        while True:
+            try:
+                element = next(elements)
+            except StopIteration as stop:
+                document = stop.value
+                break
+            except (ValueError, requests.RequestException):
+                print(Fore.RED + "响应内容不是有效的 JSON 格式" + Fore.RESET)
+                return False
+            yield parse_course(element, category, time_info)
+    if isinstance(document, dict) and "message" in document:
+        print(Fore.RED + f"错误：{document['message']}" + Fore.RESET)
+        return False
+    return True
+
+
+def parse_course(
+    element: dict[str, str], category: dict[str, str], time_info: dict[str, str]
+) -> dict[str, str]:
+    """将 queryKxrw 返回的课程条目转换为课程信息字典
+
+    Args:
+        element (dict[str, str]): kxrwList.list 中的一个元素
+        category (dict[str, str]): 包含课程类别代码和名称的字典
+        time_info (dict[str, str]): 学年学期信息字典
+
+    Returns:
+        dict[str, str]: 课程信息字典，格式见 get_courses
+    """
+    from selectolax.parser import HTMLParser
+
+    tree = HTMLParser(element["kcxx"])
+    information = tree.text(separator="\n")
+    return {
+        "id": element["id"],
+        "name": element["kcmc"].strip() + element["tyxmmc"].strip(),
+        "information": information.strip(),
+        "code": category["code"],
+        "academic_year": time_info["academic_year"],
+        "term": time_info["term"],
+    }
+
+
+def get_query_data(
+    code: str,
+    time_info: dict[str, str],
+    keyword: str,
+    page_num: int | None = None,
+    page_size: int | None = None,
+) -> dict[str, str]:
+    """构造 queryKxrw 接口的表单数据
+
+    Args:
+        code (str): 课程类别代码
+        time_info (dict[str, str]): 学年学期信息字典
+        keyword (str): 搜索关键词，可以为空字符串
+        page_num (int | None): 页码，从 1 开始，为 None 时不分页
+        page_size (int | None): 每页课程数
+
+    Returns:
+        dict[str, str]: 表单数据
+    """
     data = {
         "p_pylx": "1",
         "p_gjz": keyword,
@@ -528,30 +901,57 @@ def get_courses(
         "p_xq": time_info["term"],
         "p_dqxn": time_info["current_academic_year"],
         "p_dqxq": time_info["current_term"],
-        "p_xkfsdm": category["code"],
+        "p_xkfsdm": code,
     }
+    # 分页参数名是推测的，尚未在真实的选课系统上验证
+    if page_num is not None and page_size is not None:
+        data["pageNum"] = str(page_num)
+        data["pageSize"] = str(page_size)
+    return data
+
+
+def query_courses(
+    category: dict[str, str],
+    time_info: dict[str, str],
+    session: HunterSession,
+    keyword: str,
+    page_num: int | None = None,
+    page_size: int | None = None,
+) -> tuple[list[dict[str, str]], int] | None:
+    """请求 queryKxrw 接口并解析课程列表
+
+    与 get_courses 相同，但不输出进度信息，并且支持分页。
 
-    response = requests.post(url, data=data, headers=headers)
+    Args:
+        category (dict[str, str]): 包含课程类别代码和名称的字典
+        time_info (dict[str, str]): 学年学期信息字典
+        session (HunterSession): 包含 Cookie 的 HTTP 会话
+        keyword (str): 搜索关键词，可以为空字符串
+        page_num (int | None): 页码，从 1 开始，为 None 时不分页
+        page_size (int | None): 每页课程数
+
+    Returns:
+        tuple[list[dict[str, str]], int] | None: 本页的课程列表，以及服务器报告的
+            课程总数（响应中没有总数时为本页课程数），请求失败时返回 None
+    """
+    url = f"{JW_BASE_URL}/Xsxk/queryKxrw"
+    data = get_query_data(category["code"], time_info, keyword, page_num, page_size)
+
+    try:
+        response = session.post(url, data=data)
+    except requests.RequestException as e:
+        print(Fore.RED + f"请求异常：{e}" + Fore.RESET)
+        return None
     if response.status_code == 200:
         try:
             response_json: dict = response.json()
             try:
                 elements: list[dict[str, str]] = response_json["kxrwList"]["list"]
-                courses = []
-                for course in elements:
-                    tree = HTMLParser(course["kcxx"])
-                    information = tree.text(separator="\n")
-                    courses.append(
-                        {
-                            "id": course["id"],
-                            "name": course["kcmc"].strip() + course["tyxmmc"].strip(),
-                            "information": information.strip(),
-                            "code": category["code"],
-                            "academic_year": time_info["academic_year"],
-                            "term": time_info["term"],
-                        }
-                    )
-                return courses
+                courses = [
+                    parse_course(element, category, time_info) for element in elements
+                ]
+                total = int(response_json["kxrwList"].get("total", len(courses)))
+                return courses, total
             except KeyError:
                 message = response_json["message"]
                 print(Fore.RED + f"错误：{message}" + Fore.RESET)
@@ -559,59 +959,143 @@ def get_courses(
             print(Fore.RED + "响应内容不是有效的 JSON 格式" + Fore.RESET)
     else:
         print(Fore.RED + f"请求失败，状态码：{response.status_code}" + Fore.RESET)
-    return []
+    return None
+
+
+class Outcome(Enum):
+    """一次选课请求的结果类别
+
+    - SUCCESS: 选上了，或该课程本来就在已选课程中
+    - TRANSIENT: 名额已满、尚未开放、请求失败等，之后重试仍可能选上
+    - THROTTLED: 被服务器限流，服务器没有处理这次选课
+    - PERMANENT: 时间冲突、学分超限等，本次运行中重试也不会选上
+    """
+
+    SUCCESS = "success"
+    TRANSIENT = "transient"
+    THROTTLED = "throttled"
+    PERMANENT = "permanent"
+
+
+# addGouwuche 提示信息关键词与结果类别，按顺序匹配第一条，都不匹配时视为 TRANSIENT；
+# “学分已满”之类的提示同时包含两类关键词，因此学分限制排在名额已满之前
+OUTCOME_KEYWORDS: tuple[tuple[tuple[str, ...], Outcome], ...] = (
+    (("已在已选课程中", "已选过该课程", "不能重复选"), Outcome.SUCCESS),
+    (THROTTLE_KEYWORDS, Outcome.THROTTLED),
+    (NOT_OPEN_KEYWORDS, Outcome.TRANSIENT),
+    (("学分",), Outcome.PERMANENT),
+    (("已满", "余量", "容量", "人数"), Outcome.TRANSIENT),
+    (
+        ("冲突", "课程不存在", "已修", "不允许", "不能选", "无权", "不符合", "超过"),
+        Outcome.PERMANENT,
+    ),
+)
+
+
+def classify_response(status_code: int, message: str = "") -> Outcome:
+    """按状态码与 message 判断一次 addGouwuche 响应的结果类别
+
+    Args:
+        status_code (int): 响应状态码
+        message (str): 响应中的 message 字段，没有时为空字符串
+
+    Returns:
+        Outcome: 结果类别
+    """
+    if status_code in THROTTLE_STATUS_CODES:
+        return Outcome.THROTTLED
+    if status_code != 200:
+        return Outcome.TRANSIENT
+    if message == SUCCESS_MESSAGE:
+        return Outcome.SUCCESS
+    for keywords, outcome in OUTCOME_KEYWORDS:
+        if any(keyword in message for keyword in keywords):
+            return outcome
+    return Outcome.TRANSIENT
+
+
+def describe_outcome(outcome: Outcome, message: str) -> tuple[str, str]:
+    """返回在控制台中显示一次选课结果的文本与颜色"""
+    if message == SUCCESS_MESSAGE:
+        return "选课成功", Fore.GREEN
+    if outcome is Outcome.SUCCESS:
+        return f"已选上：{message}", Fore.GREEN
+    if outcome is Outcome.PERMANENT:
+        return f"选课失败，不再重试：{message}", Fore.RED
+    return f"选课失败：{message}", Fore.RED
+
+
+def get_add_data(course: dict[str, str]) -> dict[str, str]:
+    """构造 addGouwuche 接口的表单数据"""
+    return {
+        "p_xktjz": "rwtjzyx",
+        "p_xn": course["academic_year"],
+        "p_xq": course["term"],
+        "p_xkfsdm": course["code"],
+        "p_id": course["id"],
+    }
+
+
+def is_not_open(message: str) -> bool:
+    """判断一次 addGouwuche 响应的 message 是否表示选课尚未开放"""
+    return any(keyword in message for keyword in NOT_OPEN_KEYWORDS)
 
 
 def add_course(
-    course: dict[str, str], headers: dict[str, str], retry_count: int = 0
-) -> bool:
+    course: dict[str, str],
+    session: HunterSession,
+    retry_count: int = 0,
+    on_response: Callable[[bool], None] | None = None,
+) -> Outcome:
     """将课程添加到选课列表
 
     尝试选择一门课程，如果 Cookie 过期会自动重新登录。
-    选课结果会通过控制台输出反馈。
+    选课结果会通过控制台输出反馈，并按 classify_response 分类返回。
 
     Args:
         course (dict[str, str]): 课程信息字典
-        headers (dict[str, str]): 包含 Cookie 的 HTTP 请求头
+        session (HunterSession): 包含 Cookie 的 HTTP 会话
         retry_count (int): 当前重试次数
+        on_response (Callable[[bool], None] | None): 收到服务器响应时的回调，
+            参数表示该响应是否为限流响应
 
     Returns:
-        bool: 选课成功返回 True，失败返回 False
+        Outcome: 选课结果类别
 
     Raises:
         MaxRetriesExceededError: 当重试次数超过最大限制时抛出
     """
-    name = course["name"]
-    information = course["information"]
-    print(Fore.CYAN + f"\n正在添加课程：{name}\n{information}" + Fore.RESET)
-    url = "http://jw.hitsz.edu.cn/Xsxk/addGouwuche"
-    data = {
-        "p_xktjz": "rwtjzyx",
-        "p_xn": course["academic_year"],
-        "p_xq": course["term"],
-        "p_xkfsdm": course["code"],
-        "p_id": course["id"],
-    }
-    response = requests.post(url, data=data, headers=headers)
+    console.sending(course)
+    url = f"{JW_BASE_URL}/Xsxk/addGouwuche"
+    cookies = session.cookies_string
+    try:
+        response = session.post(url, data=get_add_data(course))
+    except requests.RequestException as e:
+        console.result(course, f"请求异常：{e}", Fore.RED)
+        return Outcome.TRANSIENT
     if response.status_code == 200:
         if "application/json" in response.headers["Content-Type"]:
             response_json = response.json()
             message = response_json["message"]
-            if message == "操作成功":
-                print(Fore.GREEN + "选课成功" + Fore.RESET)
-                return True
-            else:
-                print(Fore.RED + f"选课失败：{message}" + Fore.RESET)
+            outcome = classify_response(response.status_code, message)
+            if on_response is not None:
+                on_response(outcome is Outcome.THROTTLED)
+            console.result(course, *describe_outcome(outcome, message))
+            return outcome
         elif "text/html" in response.headers["Content-Type"]:
-            print(Fore.YELLOW + "Cookie 已过期，尝试重新获取..." + Fore.RESET)
+            console.result(course, "Cookie 已过期，尝试重新获取...", Fore.YELLOW)
 
             if retry_count >= MAX_RETRIES:
                 raise MaxRetriesExceededError(MAX_RETRIES)
 
-            headers["Cookie"] = get_cookies()
-            return add_course(course, headers)
+            refresh_cookies(session, cookies)
+            return add_course(course, session, retry_count + 1, on_response)
         else:
-            print(Fore.RED + "响应内容不是有效的 JSON 格式" + Fore.RESET)
+            console.result(course, "响应内容不是有效的 JSON 格式", Fore.RED)
     else:
-        print(Fore.RED + f"请求失败，状态码：{response.status_code}" + Fore.RESET)
-    return False
+        outcome = classify_response(response.status_code)
+        if on_response is not None:
+            on_response(outcome is Outcome.THROTTLED)
+        console.result(course, f"请求失败，状态码：{response.status_code}", Fore.RED)
+        return outcome
+    return Outcome.TRANSIENT
@@ -0,0 +1,291 @@
+import json
+import statistics
+import threading
+import time
+from urllib.parse import parse_qs, urlparse
+
+import colorama
+import requests
+import typer
+from colorama import Fore
+from requests.adapters import HTTPAdapter
+from typing_extensions import Annotated
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from client import HunterSession
+from tools import get_cookies
+
+_local = threading.local()
+
+
+def _record_connect(start: float) -> None:
+    _local.connect_time = getattr(_local, "connect_time", 0.0) + (
+        time.perf_counter() - start
+    )
+
+
+class TimedHTTPConnection(HTTPConnection):
+    """记录建立连接耗时的 HTTP 连接"""
+
+    def connect(self) -> None:
+        start = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            _record_connect(start)
+
+
+class TimedHTTPSConnection(HTTPSConnection):
+    """记录建立连接（含 TLS 握手）耗时的 HTTPS 连接"""
+
+    def connect(self) -> None:
+        start = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            _record_connect(start)
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class Tracer:
+    """把每次 HTTP 交互写入 JSONL 文件
+
+    每行是一个 JSON 对象，event 字段表示事件类型：
+    - http: 一次 HTTP 交互，包含 endpoint、course_id、sent_at、connect、ttfb、
+      total、status、message、cookie_expired 等字段，时间单位为秒
+    - relogin: 一次重新登录，包含 sent_at 与 total
+    - start: 抢课开始的时刻
+    - pace: 自适应限速调整速率，包含 time、rate 与 reason
+    - hedge: 一次对冲，包含 course_id、time（发出对冲请求的时刻）、delay、
+      winner（采用了哪个请求的结果，primary 或 hedge）与 status
+    - open: 检测选课开放的结果，包含 time（检测到开放的时刻）、expected_at、
+      probes 与 opened
+    """
+
+    def __init__(self, path: str):
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def record(self, event: str, **fields) -> None:
+        """写入一个事件"""
+        line = json.dumps({"event": event, **fields}, ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def record_exchange(
+        self,
+        url: str,
+        body: str | bytes | None,
+        sent_at: float,
+        connect: float,
+        ttfb: float | None,
+        total: float,
+        status: int | None,
+        content_type: str,
+        payload: bytes | None,
+        via: str,
+    ) -> None:
+        """记录一次 HTTP 交互
+
+        Args:
+            url (str): 请求地址
+            body (str | bytes | None): 表单形式的请求体，用于提取课程 id
+            sent_at (float): 发送时刻（time.time）
+            connect (float): 建立连接耗时，复用连接时为 0
+            ttfb (float | None): 从发送到收到响应头的耗时
+            total (float): 从发送到读完响应体的耗时
+            status (int | None): 状态码，请求异常时为 None
+            content_type (str): 响应的 Content-Type
+            payload (bytes | None): 响应体
+            via (str): 发送通道
+        """
+        if isinstance(body, bytes):
+            body = body.decode("utf-8", errors="replace")
+        form = parse_qs(body or "")
+        message = None
+        if payload and "application/json" in content_type:
+            try:
+                message = json.loads(payload).get("message")
+            except (ValueError, AttributeError):
+                pass
+        endpoint = urlparse(url).path
+        self.record(
+            "http",
+            endpoint=endpoint,
+            course_id=form.get("p_id", [None])[0],
+            sent_at=sent_at,
+            connect=connect,
+            ttfb=ttfb,
+            total=total,
+            status=status,
+            message=message,
+            # 教务接口在 Cookie 过期时返回登录页面
+            cookie_expired=endpoint.startswith("/Xsxk/")
+            and "text/html" in content_type,
+            via=via,
+        )
+
+    def install(self, session: HunterSession) -> None:
+        """为会话挂载带追踪的连接池，并记录重新登录事件"""
+        adapter = TracingAdapter(
+            self, pool_connections=session.pool_size, pool_maxsize=session.pool_size
+        )
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+
+        relogin = session.relogin if session.relogin is not None else get_cookies
+
+        def traced_relogin() -> str:
+            sent_at = time.time()
+            start = time.perf_counter()
+            try:
+                return relogin()
+            finally:
+                self.record(
+                    "relogin", sent_at=sent_at, total=time.perf_counter() - start
+                )
+
+        session.relogin = traced_relogin
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+class TracingAdapter(HTTPAdapter):
+    """记录每次请求连接、首字节与总耗时的 HTTPAdapter"""
+
+    def __init__(self, tracer: Tracer, **kwargs):
+        self.tracer = tracer
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs) -> None:
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": TimedHTTPConnectionPool,
+            "https": TimedHTTPSConnectionPool,
+        }
+
+    def send(self, request: requests.PreparedRequest, *args, **kwargs):
+        _local.connect_time = 0.0
+        sent_at = time.time()
+        start = time.perf_counter()
+        try:
+            response = super().send(request, *args, **kwargs)
+        except requests.RequestException:
+            self.tracer.record_exchange(
+                request.url or "",
+                request.body,
+                sent_at,
+                _local.connect_time,
+                None,
+                time.perf_counter() - start,
+                None,
+                "",
+                None,
+                "requests",
+            )
+            raise
+        # 此时只读完了响应头，响应体由下面访问 content 时读取
+        ttfb = time.perf_counter() - start
+        payload = None if kwargs.get("stream") else response.content
+        self.tracer.record_exchange(
+            request.url or "",
+            request.body,
+            sent_at,
+            _local.connect_time,
+            ttfb,
+            time.perf_counter() - start,
+            response.status_code,
+            response.headers.get("Content-Type", ""),
+            payload,
+            "requests",
+        )
+        return response
+
+
+def percentile(values: list[float], q: int) -> float:
+    """返回 values 的第 q 百分位数"""
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[q - 1]
+
+
+def summary(
+    path: Annotated[str, typer.Argument(help="--trace 生成的 JSONL 文件")],
+    seconds: Annotated[int, typer.Option(help="时间线覆盖开始后的秒数")] = 5,
+    bucket: Annotated[float, typer.Option(help="时间线的分桶宽度（秒）")] = 0.5,
+) -> None:
+    """汇总追踪文件：按接口统计延迟分位数，并输出开始后的请求时间线"""
+    colorama.init()
+    events = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                events.append(json.loads(line))
+
+    exchanges = [e for e in events if e["event"] == "http"]
+    print(Fore.CYAN + f"共 {len(exchanges)} 次 HTTP 交互" + Fore.RESET)
+    endpoints = sorted({e["endpoint"] for e in exchanges})
+    print(f"{'接口':<24}{'次数':>6}  {'指标':<8}{'p50':>10}{'p90':>10}{'p99':>10}")
+    for endpoint in endpoints:
+        group = [e for e in exchanges if e["endpoint"] == endpoint]
+        for metric in ("connect", "ttfb", "total"):
+            values = sorted(e[metric] for e in group if e[metric] is not None)
+            if not values:
+                continue
+            row = "".join(
+                f"{percentile(values, q) * 1000:>8.1f}ms" for q in (50, 90, 99)
+            )
+            print(f"{endpoint:<24}{len(group):>6}  {metric:<8}{row}")
+
+    relogins = [e for e in events if e["event"] == "relogin"]
+    if relogins:
+        total = sum(e["total"] for e in relogins)
+        print(f"重新登录 {len(relogins)} 次，共耗时 {total * 1000:.1f} ms")
+
+    hedges = [e for e in events if e["event"] == "hedge"]
+    if hedges:
+        won = sum(1 for e in hedges if e["winner"] == "hedge")
+        print(f"对冲 {len(hedges)} 次，其中 {won} 次采用了对冲请求的结果")
+
+    for opening in (e for e in events if e["event"] == "open"):
+        if not opening["opened"]:
+            print(f"探测 {opening['probes']} 次未检测到开放")
+            continue
+        print(f"探测 {opening['probes']} 次后检测到开放", end="")
+        if opening["expected_at"] is not None:
+            offset = opening["time"] - opening["expected_at"]
+            print(f"，比预计时间{'晚' if offset >= 0 else '早'} {abs(offset):.3f} 秒")
+        else:
+            print()
+
+    starts = [e for e in events if e["event"] == "start"]
+    if not starts:
+        return
+    start = starts[-1]["time"]
+    print(Fore.CYAN + "\n开始后的时间线（按发送时刻分桶）" + Fore.RESET)
+    buckets = int(seconds / bucket)
+    for i in range(buckets):
+        low, high = start + i * bucket, start + (i + 1) * bucket
+        group = [e for e in exchanges if low <= e["sent_at"] < high]
+        successes = sum(1 for e in group if e["message"] == "操作成功")
+        expired = sum(1 for e in group if e["cookie_expired"])
+        bar = "#" * len(group)
+        print(
+            f"+{i * bucket:5.1f}s  请求 {len(group):>3}  成功 {successes:>3}  "
+            f"Cookie 过期 {expired:>3}  {bar}"
+        )
+
+
+if __name__ == "__main__":
+    typer.run(summary)
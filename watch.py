@@ -0,0 +1,267 @@
+import random
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from colorama import Fore
+
+import console
+from client import HunterSession
+from engine import CourseGroup, group_courses
+from fastpath import FastSender
+from tools import (
+    JW_BASE_URL,
+    Outcome,
+    get_query_data,
+    get_time_info,
+    refresh_cookies,
+)
+
+DEFAULT_WATCH_INTERVAL = 10.0
+DEFAULT_WATCH_MIN_INTERVAL = 2.0
+DEFAULT_WATCH_MAX_INTERVAL = 60.0
+WATCH_PAGE_SIZE = 500
+# queryKxrw 课程条目中的课容量与剩余名额字段
+# 这些字段名是按照常见的命名推测的，尚未在真实的选课系统上验证，
+# 字段缺失时 query_remaining 会输出一次警告
+CAPACITY_FIELD = "rl"
+REMAINING_FIELD = "syrs"
+ENROLLED_FIELD = "yxrs"
+
+_missing_fields_warned = False
+
+
+def get_remaining(element: dict) -> int | None:
+    """从 queryKxrw 课程条目中读取剩余名额
+
+    优先使用剩余名额字段，没有时用课容量减去已选人数。
+
+    Args:
+        element (dict): kxrwList.list 中的一个元素
+
+    Returns:
+        int | None: 剩余名额，条目中没有相关字段时返回 None
+    """
+    try:
+        if element.get(REMAINING_FIELD) is not None:
+            return int(element[REMAINING_FIELD])
+        return int(element[CAPACITY_FIELD]) - int(element[ENROLLED_FIELD])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def warn_missing_fields(element: dict) -> None:
+    """课程条目中读不到剩余名额时输出一次警告，说明缺少的字段
+
+    Args:
+        element (dict): 读不到剩余名额的课程条目
+    """
+    global _missing_fields_warned
+    if _missing_fields_warned:
+        return
+    _missing_fields_warned = True
+    fields = ", ".join(
+        f"{field}={element.get(field)!r}"
+        for field in (REMAINING_FIELD, CAPACITY_FIELD, ENROLLED_FIELD)
+    )
+    console.notice(
+        f"无法从课程条目中读取剩余名额（{fields}），监视将无法发现空位；"
+        + f"条目包含的字段：{', '.join(sorted(element))}",
+        Fore.YELLOW,
+    )
+
+
+def query_remaining(
+    code: str,
+    time_info: dict[str, str],
+    session: HunterSession,
+    course_ids: set[str],
+    page_size: int = WATCH_PAGE_SIZE,
+) -> dict[str, int] | None:
+    """查询一个类别中目标课程的剩余名额
+
+    只读取课程 id 与名额字段，不解析课程详细信息，找齐所有目标课程后不再请求后续分页。
+    分页参数与名额字段都是推测的，目标课程读不到名额时会输出一次警告。
+
+    Args:
+        code (str): 课程类别代码
+        time_info (dict[str, str]): 学年学期信息字典
+        session (HunterSession): 包含 Cookie 的 HTTP 会话
+        course_ids (set[str]): 目标课程 id
+        page_size (int): 每页课程数
+
+    Returns:
+        dict[str, int] | None: 课程 id 到剩余名额的映射，Cookie 过期时返回 None，
+            请求失败时返回已获取到的部分
+    """
+    url = f"{JW_BASE_URL}/Xsxk/queryKxrw"
+    remaining: dict[str, int] = {}
+    page_num = 1
+    while True:
+        data = get_query_data(code, time_info, "", page_num, page_size)
+        try:
+            response = session.post(url, data=data)
+        except requests.RequestException as e:
+            console.notice(f"请求异常：{e}", Fore.RED)
+            return remaining
+        if response.status_code != 200:
+            console.notice(f"请求失败，状态码：{response.status_code}", Fore.RED)
+            return remaining
+        if "text/html" in response.headers.get("Content-Type", ""):
+            return None
+        try:
+            courses = response.json()["kxrwList"]
+        except (ValueError, KeyError):
+            console.notice("响应内容不是有效的课程列表", Fore.RED)
+            return remaining
+        for element in courses["list"]:
+            if element["id"] in course_ids:
+                seats = get_remaining(element)
+                if seats is not None:
+                    remaining[element["id"]] = seats
+                else:
+                    warn_missing_fields(element)
+        total = int(courses.get("total", 0))
+        if len(remaining) == len(course_ids) or page_num * page_size >= total:
+            return remaining
+        page_num += 1
+
+
+def watch_seats(
+    courses: list[dict[str, str]],
+    session: HunterSession,
+    send: Callable[[dict[str, str]], Outcome],
+    interval: float = DEFAULT_WATCH_INTERVAL,
+    min_interval: float = DEFAULT_WATCH_MIN_INTERVAL,
+    max_interval: float = DEFAULT_WATCH_MAX_INTERVAL,
+    duration: float = 0.0,
+    sender: FastSender | None = None,
+) -> list[dict[str, str]]:
+    """持续监视目标课程的剩余名额，出现空位时立即选课
+
+    每轮按类别批量查询所有未满足组中课程的剩余名额，每个类别通常只需一个请求。
+    某门课程的剩余名额大于 0 时立刻发送选课请求，每组一次只选择最靠前的有空位课程。
+    返回无法选上的结果（如时间冲突）的课程不再监视，之后出现空位也不再发送请求。
+    名额有变化或抢课失败时轮询间隔减半，没有变化时逐渐放大，
+    并加入少量随机抖动，避免与其他客户端同步。
+
+    Args:
+        courses (list[dict[str, str]]): 要监视的课程列表
+        session (HunterSession): 共享的 HTTP 会话
+        send (Callable[[dict[str, str]], Outcome]): 发送一次选课请求的函数
+        interval (float): 初始轮询间隔（秒）
+        min_interval (float): 最短轮询间隔（秒）
+        max_interval (float): 最长轮询间隔（秒）
+        duration (float): 最长监视时间（秒），0 表示一直监视直到全部选上或手动退出
+        sender (FastSender | None): 快速发送通道，Cookie 更新后需要重新序列化，
+            每轮查询后保持其连接活跃
+
+    Returns:
+        list[dict[str, str]]: 未被满足的组中的全部课程
+    """
+    groups = group_courses(courses)
+    time_info = get_time_info(session)
+    if not time_info:
+        console.notice("获取时间信息失败，无法监视余量", Fore.RED)
+        return courses
+
+    console.notice(f"开始监视 {len(courses)} 门课程的剩余名额...")
+    deadline = time.monotonic() + duration if duration > 0 else float("inf")
+    last_seen: dict[str, int] = {}
+    dropped: set[str] = set()
+    polls = 0
+    try:
+        while groups and time.monotonic() < deadline:
+            pending = [
+                course
+                for group in groups
+                for course in group.courses
+                if course["id"] not in dropped
+            ]
+            if not pending:
+                console.notice("剩余的课程都无法选上，停止监视", Fore.YELLOW)
+                break
+            codes = {course["code"] for course in pending}
+            ids = {course["id"] for course in pending}
+            remaining: dict[str, int] = {}
+            for code in codes:
+                cookies = session.cookies_string
+                result = query_remaining(code, time_info, session, ids)
+                if result is None:
+                    console.notice("Cookie 已过期，尝试重新获取...", Fore.YELLOW)
+                    refresh_cookies(session, cookies)
+                    if sender is not None:
+                        sender.prepare(pending)
+                    result = query_remaining(code, time_info, session, ids) or {}
+                remaining.update(result)
+            polls += 1
+
+            targets = []
+            for group in groups:
+                for course in group.courses:
+                    if course["id"] in dropped:
+                        continue
+                    if remaining.get(course["id"], 0) > 0:
+                        targets.append((group, course))
+                        break
+            changed = any(
+                last_seen.get(course_id) != seats
+                for course_id, seats in remaining.items()
+            )
+            last_seen.update(remaining)
+
+            if targets:
+                outcomes = fire(targets, send)
+                satisfied = {
+                    group
+                    for (group, _), outcome in zip(targets, outcomes)
+                    if outcome is Outcome.SUCCESS
+                }
+                dropped.update(
+                    course["id"]
+                    for (_, course), outcome in zip(targets, outcomes)
+                    if outcome is Outcome.PERMANENT
+                )
+                groups = [group for group in groups if group not in satisfied]
+                if not groups:
+                    break
+                if len(satisfied) < len(targets):
+                    changed = True
+            if changed and polls > 1:
+                interval = max(min_interval, interval / 2)
+            else:
+                interval = min(max_interval, interval * 1.5)
+
+            if sender is not None:
+                sender.warm_up()
+            console.status(
+                f"已查询 {polls} 轮，剩余 {len(groups)} 组，"
+                + f"{interval:.1f} 秒后再次查询"
+            )
+            time.sleep(interval * random.uniform(0.9, 1.1))
+    except KeyboardInterrupt:
+        console.notice("停止监视", Fore.YELLOW)
+    console.end_status()
+    return [course for group in groups for course in group.courses]
+
+
+def fire(
+    targets: list[tuple[CourseGroup, dict[str, str]]],
+    send: Callable[[dict[str, str]], Outcome],
+) -> list[Outcome]:
+    """对出现空位的课程同时发送选课请求
+
+    Args:
+        targets (list[tuple[CourseGroup, dict[str, str]]]): 课程组与其中有空位的课程
+        send (Callable[[dict[str, str]], Outcome]): 发送一次选课请求的函数
+
+    Returns:
+        list[Outcome]: 与 targets 一一对应的选课结果
+    """
+    for _, course in targets:
+        console.notice(f"发现空位：{course['name']}", Fore.GREEN)
+    if len(targets) == 1:
+        return [send(targets[0][1])]
+    with ThreadPoolExecutor(max_workers=len(targets)) as executor:
+        return list(executor.map(send, [course for _, course in targets]))